@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+"""Micro-benchmarks for the markdown rendering pipeline
+
+Usage:
+    python bench_render.py            # run every benchmark
+    python bench_render.py footnotes sidenotes # run selected benchmarks
+"""
+
+import sys
+import time
+
+import mistletoe as mst
+from pathlib import Path
+
+# Add the current directory to path so we can import bloggy
+sys.path.insert(0, str(Path(__file__).parent))
+
+from monsterui.all import apply_classes
+from bloggy.core import (
+    preprocess_markdown, extract_footnotes, _render_md_html,
+    ContentRenderer, CONTENT_CLASS_MAP, YoutubeEmbed, InlineCodeAttr, Strikethrough,
+    FootnoteRef, Superscript, Subscript, _content_tokens,
+)
+
+SECTION = """## Section {i}
+
+Some prose with a footnote[^n{i}] and x^2^ plus H~2~O, costing \\$5.
+A second line of the same paragraph with `inline code` and **bold** text.
+
+```python
+def f(x):
+    return x ** 2  # ^not^ superscript
+```
+
+:::tabs
+::tab{{title="One"}}
+First tab for section {i}.
+::tab{{title="Two"}}
+Second tab for section {i}.
+:::
+
+[^n{i}]: Footnote body for section {i}.
+
+"""
+
+
+def make_post(size_bytes):
+    """Build a synthetic post of roughly `size_bytes` exercising every preprocessing feature"""
+    parts, total, i = [], 0, 0
+    while total < size_bytes:
+        section = SECTION.format(i=i)
+        parts.append(section)
+        total += len(section)
+        i += 1
+    return "".join(parts)
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_preprocess():
+    """Single-pass preprocessing and full uncached render should both scale linearly with size"""
+    print("preprocess_markdown / full render vs post size")
+    print(f"  {'size':>8} {'preprocess':>12} {'ms/100KB':>9} {'render':>10} {'ms/100KB':>9}")
+    for kb in (128, 256, 512, 1024):
+        post = make_post(kb * 1024)
+        pre_ms = timed(preprocess_markdown, post)
+        render_ms = timed(_render_md_html, post, None, "bench/post", repeat=1)
+        print(f"  {kb:>6}KB {pre_ms:>10.1f}ms {pre_ms / kb * 100:>9.2f} {render_ms:>8.1f}ms {render_ms / kb * 100:>9.2f}")
+
+
+def make_footnote_post(count):
+    """Build a post with `count` footnote references and definitions"""
+    refs = "\n\n".join(f"Paragraph {i} cites a sidenote[^fn{i}] in passing." for i in range(count))
+    defs = "\n".join(f"[^fn{i}]: Sidenote {i} with a little *formatting*\n  and a continuation line." for i in range(count))
+    return f"{refs}\n\n{defs}\n"
+
+
+def bench_footnotes():
+    """Footnote extraction must stay linear in the number of definitions"""
+    print("footnote extraction vs footnote count")
+    print(f"  {'count':>8} {'extract':>10} {'us/note':>8} {'preprocess':>12} {'us/note':>8}")
+    for count in (1000, 2500, 5000):
+        post = make_footnote_post(count)
+        _, defs = extract_footnotes(post)
+        assert len(defs) == count
+        extract_ms = timed(extract_footnotes, post)
+        pre_ms = timed(preprocess_markdown, post)
+        print(f"  {count:>8} {extract_ms:>8.1f}ms {extract_ms / count * 1000:>8.2f} {pre_ms:>10.1f}ms {pre_ms / count * 1000:>8.2f}")
+
+
+def bench_sidenotes():
+    """Full render of sidenote-dense posts; per-note cost should stay flat"""
+    print("render vs sidenote count")
+    print(f"  {'count':>8} {'render':>10} {'us/note':>8}")
+    for count in (100, 300, 600):
+        post = make_footnote_post(count)
+        render_ms = timed(_render_md_html, post, None, "bench/post")
+        print(f"  {count:>8} {render_ms:>8.1f}ms {render_ms / count * 1000:>8.1f}")
+
+
+def bench_tabs():
+    """Full render of documentation pages with many :::tabs groups"""
+    print("render vs tab group count")
+    print(f"  {'groups':>8} {'render':>10} {'us/group':>9}")
+    for count in (25, 100, 400):
+        post = "".join(SECTION.format(i=i) for i in range(count))
+        render_ms = timed(_render_md_html, post, None, "bench/post")
+        print(f"  {count:>8} {render_ms:>8.1f}ms {render_ms / count * 1000:>9.1f}")
+
+
+def render_with_apply_classes(content):
+    """The previous pipeline: render bare tags, then add classes with an lxml round trip"""
+    content, footnotes, tab_data_store = preprocess_markdown(content)
+    with ContentRenderer(YoutubeEmbed, InlineCodeAttr, Strikethrough, FootnoteRef, Superscript, Subscript,
+                         footnotes=footnotes, current_path="bench/post", class_map={}, tab_data_store=tab_data_store) as renderer:
+        html = renderer.render(mst.Document(content))
+    return apply_classes(html, class_map=CONTENT_CLASS_MAP)
+
+
+def bench_classes():
+    """Classes written by the renderer vs the apply_classes post-pass"""
+    print("inline classes vs apply_classes post-pass")
+    print(f"  {'size':>8} {'inline':>10} {'post-pass':>11} {'saved':>7}")
+    for kb in (64, 256, 1024):
+        post = make_post(kb * 1024)
+        inline_ms = timed(_render_md_html, post, None, "bench/post", repeat=1)
+        legacy_ms = timed(render_with_apply_classes, post, repeat=1)
+        print(f"  {kb:>6}KB {inline_ms:>8.1f}ms {legacy_ms:>9.1f}ms {1 - inline_ms / legacy_ms:>7.0%}")
+
+
+def bench_links():
+    """Index pages full of relative links; resolution must not touch the filesystem"""
+    print("render vs relative link count")
+    print(f"  {'links':>8} {'render':>10} {'us/link':>8}")
+    for count in (250, 1000):
+        post = "\n".join(f"- [Chapter {i}](../chapters/chapter-{i % 50:02d}.md) and [notes](./notes/{i % 7}/)" for i in range(count // 2))
+        render_ms = timed(_render_md_html, post, None, "books/flat-land/index")
+        print(f"  {count:>8} {render_ms:>8.1f}ms {render_ms / count * 1000:>8.1f}")
+
+
+CODE_SECTION = """Step {i} wires the handler:
+
+```python
+def handler_{i}(request):
+    items = [x for x in request.items if x.ready]
+    return {{"count": len(items), "ok": True}}
+```
+
+```mermaid
+graph TD
+    A{i}[Request] --> B{i}[Handler]
+```
+
+"""
+
+
+def bench_codeblocks():
+    """Payload size and render time of code-heavy pages"""
+    print("code-heavy page payload")
+    print(f"  {'blocks':>8} {'html':>10} {'bytes/block':>12} {'render':>10}")
+    for count in (50, 200):
+        post = "".join(CODE_SECTION.format(i=i) for i in range(count))
+        html, _ = _render_md_html(post, None, "bench/post")
+        render_ms = timed(_render_md_html, post, None, "bench/post")
+        print(f"  {count:>8} {len(html) / 1024:>8.1f}KB {len(html) / count:>12.0f} {render_ms:>8.1f}ms")
+
+
+def bench_highlight():
+    """Cost of server-side Pygments highlighting, cold and with the highlight cache warm"""
+    import bloggy.core as core
+    from bloggy import highlight
+    print("server-side highlighting vs plain escaping (200 code sections)")
+    print(f"  {'mode':>10} {'render':>10}")
+    post = "".join(CODE_SECTION.format(i=i) for i in range(200))
+    saved = core.SERVER_HIGHLIGHTING
+    try:
+        core.SERVER_HIGHLIGHTING = False
+        print(f"  {'plain':>10} {timed(_render_md_html, post, None, 'bench/post'):>8.1f}ms")
+        core.SERVER_HIGHLIGHTING = True
+        cold = []
+        for _ in range(3):
+            highlight._highlight_cache.clear()
+            cold.append(timed(_render_md_html, post, None, "bench/post", repeat=1))
+        print(f"  {'cold':>10} {min(cold):>8.1f}ms")
+        print(f"  {'cached':>10} {timed(_render_md_html, post, None, 'bench/post'):>8.1f}ms")
+    finally:
+        core.SERVER_HIGHLIGHTING = saved
+
+
+MATH_SECTION = """Identity {i}: $e^{{i\\pi}} + {i} = {i} - 1$ and $\\sum_{{k=1}}^{{n}} k^2 = \\frac{{n(n+1)(2n+1)}}{{6}}$.
+
+$$
+\\int_0^{{{i}}} x^2\\,dx = \\frac{{{i}^3}}{{3}}
+$$
+
+"""
+
+
+def bench_math():
+    """Server-side MathML conversion, cold and with the per-expression cache warm"""
+    import bloggy.core as core
+    from bloggy.mathml import latex_to_mathml
+    print("server-side math vs client-side KaTeX markup (300 sections, 900 expressions)")
+    print(f"  {'mode':>10} {'render':>10}")
+    post = "".join(MATH_SECTION.format(i=i) for i in range(300))
+    saved = core.SERVER_MATH
+    try:
+        core.SERVER_MATH = False
+        print(f"  {'katex':>10} {timed(_render_md_html, post, None, 'bench/post'):>8.1f}ms")
+        core.SERVER_MATH = True
+        cold = []
+        for _ in range(3):
+            latex_to_mathml.cache_clear()
+            cold.append(timed(_render_md_html, post, None, "bench/post", repeat=1))
+        print(f"  {'cold':>10} {min(cold):>8.1f}ms")
+        print(f"  {'cached':>10} {timed(_render_md_html, post, None, 'bench/post'):>8.1f}ms")
+    finally:
+        core.SERVER_MATH = saved
+
+
+def bench_incremental():
+    """Re-render after a one-paragraph edit, with and without the block cache"""
+    from bloggy.render_cache import RenderCache
+    print("re-render after editing one paragraph")
+    print(f"  {'lines':>8} {'full':>10} {'blocks':>10} {'speedup':>8}")
+    for sections in (250, 1000):
+        post = "".join(SECTION.format(i=i) for i in range(sections))
+        cache = RenderCache(256 * 1024 * 1024)
+        _render_md_html(post, None, "bench/post", block_cache=cache)
+        edited = post.replace(f"Some prose with a footnote[^n{sections // 2}]", f"Edited prose with a footnote[^n{sections // 2}]")
+        assert edited != post
+        full_ms = timed(_render_md_html, edited, None, "bench/post", repeat=1)
+        block_ms = timed(_render_md_html, edited, None, "bench/post", cache)
+        assert _render_md_html(edited, None, "bench/post", block_cache=cache) == _render_md_html(edited, None, "bench/post")
+        print(f"  {post.count(chr(10)):>8} {full_ms:>8.1f}ms {block_ms:>8.1f}ms {full_ms / block_ms:>7.1f}x")
+
+
+def bench_engines():
+    """Each installed markdown engine on the same corpus: the demo posts and synthetic posts"""
+    from bloggy.engines import engine_names, get_engine
+    from bloggy.helpers import parse_frontmatter
+    demo = Path(__file__).parent / "demo"
+    corpus = [(path.relative_to(demo).with_suffix("").as_posix(), parse_frontmatter(path)[1]) for path in sorted(demo.rglob("*.md"))]
+    posts = [("demo", corpus)] + [(f"{kb}KB", [("bench/post", make_post(kb * 1024))]) for kb in (64, 256)]
+    print("render time per markdown engine (python check_engines.py checks their output)")
+    print(f"  {'engine':>12}" + "".join(f" {name:>10}" for name, _ in posts))
+    for name in engine_names():
+        engine = get_engine(name)
+        if engine is None:
+            print(f"  {name:>12} not installed")
+            continue
+        times = [timed(lambda: [_render_md_html(text, None, rel, engine=engine) for rel, text in batch]) for _, batch in posts]
+        print(f"  {name:>12}" + "".join(f" {ms:>8.1f}ms" for ms in times))
+
+
+def render_with_new_renderer(content):
+    """The previous setup: build a renderer, registering its tokens, for every document"""
+    content, footnotes, tab_data_store = preprocess_markdown(content)
+    with ContentRenderer(*_content_tokens(), footnotes=footnotes, current_path="bench/post", tab_data_store=tab_data_store) as renderer:
+        return renderer.render(mst.Document(content))
+
+
+LINK_REF_POST = """# Post {i}
+
+See [the reference][ref] and [another][other-{i}].
+
+[ref]: /posts/ref-{i}
+[other-{i}]: https://example.com/{i}
+"""
+
+
+def bench_renderers():
+    """Per-render setup cost, and pooled renderers rendering on several threads at once"""
+    from concurrent.futures import ThreadPoolExecutor
+    print("small documents: new renderer per render vs pooled renderer")
+    print(f"  {'document':>10} {'new':>10} {'pooled':>10} {'saved':>7}")
+    documents = [("paragraph", "A *short* note with a [link](other.md).\n")]
+    documents += [(f"{n} sections", "".join(SECTION.format(i=i) for i in range(n))) for n in (1, 4)]
+    for label, post in documents:
+        assert render_with_new_renderer(post) == _render_md_html(post, None, "bench/post")[0]
+        new_ms = timed(lambda: [render_with_new_renderer(post) for _ in range(200)]) / 200
+        pooled_ms = timed(lambda: [_render_md_html(post, None, "bench/post") for _ in range(200)]) / 200
+        print(f"  {label:>10} {new_ms * 1000:>8.0f}us {pooled_ms * 1000:>8.0f}us {1 - pooled_ms / new_ms:>7.0%}")
+    # Link reference definitions are resolved through mistletoe's module-level root node
+    posts = [LINK_REF_POST.format(i=i) + SECTION.format(i=i) for i in range(400)]
+    expected = [_render_md_html(post, None, "bench/post") for post in posts]
+    with ThreadPoolExecutor(8) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda post: _render_md_html(post, None, "bench/post"), posts))
+        threaded_ms = (time.perf_counter() - start) * 1000
+    wrong = sum(result != want for result, want in zip(results, expected))
+    print(f"  8 threads, {len(posts)} posts: {threaded_ms:.1f}ms, {wrong} differ from sequential renders")
+
+
+BENCHMARKS = {
+    "preprocess": bench_preprocess,
+    "footnotes": bench_footnotes,
+    "sidenotes": bench_sidenotes,
+    "tabs": bench_tabs,
+    "classes": bench_classes,
+    "links": bench_links,
+    "codeblocks": bench_codeblocks,
+    "highlight": bench_highlight,
+    "math": bench_math,
+    "incremental": bench_incremental,
+    "engines": bench_engines,
+    "renderers": bench_renderers,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name} (choose from {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        BENCHMARKS[name]()
+        print()
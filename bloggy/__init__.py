@@ -1,5 +1,12 @@
 __version__ = "0.2.14"
 
-from .core import app, rt, get_root_folder, get_blog_title
+__all__ = ['app', 'rt', 'get_root_folder', 'get_blog_title', '__version__']
 
-__all__ = ['app', 'rt', 'get_root_folder', 'get_blog_title', '__version__']
\ No newline at end of file
+
+def __getattr__(name):
+    # The app is built on first use, so CLI commands such as `bloggy render`
+    # can set up output before the server's startup logging runs
+    if name in ('app', 'rt', 'get_root_folder', 'get_blog_title'):
+        from . import core
+        return getattr(core, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,100 @@
+"""Batch rendering of markdown documents for editors and external pipelines.
+
+`POST /_render` and `bloggy render` take many documents at once and return
+each one's body HTML and table of contents, exactly as its post page renders
+them but without the page layout. Documents go through `from_md_with_toc()`,
+so they share the render cache with the pages being served.
+
+Documents arrive as NDJSON (one JSON value per line) or as one JSON array. A
+document is an object with
+
+    markdown  the markdown source; YAML frontmatter is stripped, as for posts
+    path      optional post path such as "guides/setup", against which
+              relative links, images and embeds resolve
+    id        optional; echoed back to match results to documents
+
+or just a string of markdown. Each result holds the document's `id` (its
+position when it has none), `html` and `toc`, a list of [level, text, anchor]
+entries. A document that can't be rendered gets an `error` instead.
+"""
+
+from __future__ import annotations
+
+import json
+import posixpath
+from functools import partial
+
+import frontmatter
+
+
+def parse_documents(text: str) -> list:
+    """Documents in `text`, given as a JSON array, a `{"documents": [...]}` object or NDJSON
+
+    Raises ValueError when `text` is none of these. A malformed NDJSON line
+    becomes a document with an `error`, so the rest of the batch still renders.
+    """
+    try:
+        value = json.loads(text)
+    except ValueError:
+        pass
+    else:
+        if isinstance(value, dict) and isinstance(value.get('documents'), list):
+            return value['documents']
+        return value if isinstance(value, list) else [value]
+    documents = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            documents.append(json.loads(line))
+        except ValueError as e:
+            documents.append({'error': f'line {number}: {e}'})
+    if not documents:
+        raise ValueError('expected documents as NDJSON or a JSON array')
+    return documents
+
+
+def _post_path(path):
+    if not path:
+        return None
+    path = posixpath.normpath(str(path).strip('/')).removesuffix('.md')
+    if path.startswith('..') or path == '.':
+        raise ValueError(f'path outside the blog: {path}')
+    return path
+
+
+def load_renderer():
+    """`from_md_with_toc`, importing `bloggy.core` on first use"""
+    from .core import from_md_with_toc
+    return from_md_with_toc
+
+
+def render_document(index: int, document, persist: bool = True) -> dict:
+    """Result for `document`, the `index`-th of its batch; `persist` as for `render_markdown`"""
+    from fasthtml.common import to_xml
+
+    if isinstance(document, str):
+        document = {'markdown': document}
+    doc_id = document.get('id', index) if isinstance(document, dict) else index
+    try:
+        if not isinstance(document, dict):
+            raise ValueError('a document must be an object or a string')
+        if 'error' in document:
+            raise ValueError(document['error'])
+        markdown = document.get('markdown')
+        if not isinstance(markdown, str):
+            raise ValueError('"markdown" must be a string')
+        content = frontmatter.loads(markdown).content
+        body, toc = load_renderer()(content, current_path=_post_path(document.get('path')), persist=persist)
+        return {'id': doc_id, 'html': to_xml(body), 'toc': [list(entry) for entry in toc]}
+    except Exception as e:
+        return {'id': doc_id, 'error': str(e)}
+
+
+def render_documents(documents, map_fn=map, persist: bool = True):
+    """Results of `documents` in order; `map_fn` (e.g. an executor's `map`) may render them in parallel"""
+    return map_fn(partial(render_document, persist=persist), range(len(documents)), documents)
+
+
+def ndjson_line(result: dict) -> str:
+    return json.dumps(result, ensure_ascii=False) + '\n'
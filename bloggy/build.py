@@ -11,12 +11,14 @@ import mistletoe as mst
 from fasthtml.common import *
 from monsterui.all import *
 from .core import (
-    parse_frontmatter, get_post_title, slug_to_title, 
-    from_md, extract_toc, build_toc_items, text_to_anchor,
+    parse_frontmatter, slug_to_title, 
+    from_md_with_toc, build_toc_items, text_to_anchor,
     build_post_tree, ContentRenderer, extract_footnotes,
     preprocess_super_sub, preprocess_tabs,
-    get_bloggy_config, order_bloggy_entries, _effective_abbreviations, find_folder_note_file
+    order_bloggy_entries, _effective_abbreviations,
+    SERVER_HIGHLIGHTING, SERVER_MATH, highlight_css
 )
+from .helpers import get_post_title, get_bloggy_config, find_folder_note_file
 from .config import get_config, reload_config
 
 
@@ -295,6 +297,21 @@ def generate_static_html(title, body_content, blog_title, favicon_href):
     </script>
     """
     
+    # Code arrives pre-highlighted in server mode, so only its token colors are needed
+    if SERVER_HIGHLIGHTING:
+        highlight_head = f"<style>\n{highlight_css()}\n    </style>"
+    else:
+        highlight_head = """<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/styles/atom-one-dark.min.css">
+    <script src="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js"></script>"""
+
+    # Server-rendered math is MathML; scripts.js loads KaTeX itself for any fallbacks
+    if SERVER_MATH:
+        math_head = ""
+    else:
+        math_head = """<link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.css">
+    <script src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.js"></script>
+    <script src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/contrib/auto-render.min.js"></script>"""
+
     html = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -314,13 +331,10 @@ def generate_static_html(title, body_content, blog_title, favicon_href):
     <link href="https://fonts.googleapis.com/css2?family=IBM+Plex+Sans:wght@400;500;600;700&family=IBM+Plex+Mono&display=swap" rel="stylesheet">
     
     <!-- Syntax Highlighting -->
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/styles/atom-one-dark.min.css">
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js"></script>
+    {highlight_head}
     
     <!-- Math Rendering -->
-    <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.css">
-    <script src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.js"></script>
-    <script src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/contrib/auto-render.min.js"></script>
+    {math_head}
     
     <!-- Hyperscript for interactions -->
     <script src="https://unpkg.com/hyperscript.org@0.9.12"></script>
@@ -584,12 +598,11 @@ def build_static_site(input_dir=None, output_dir=None):
         post_title = metadata.get('title', get_post_title(md_file, abbreviations=abbreviations))
         
         # Render markdown to HTML
-        content_div = from_md(raw_content)
+        content_div, toc_headings = from_md_with_toc(raw_content)
         title_html = f'<h1 class="text-4xl font-bold mb-8">{post_title}</h1>'
         content_html = title_html + to_xml(content_div)
         
-        # Extract TOC
-        toc_headings = extract_toc(raw_content)
+        # TOC headings are collected while rendering
         toc_items = build_toc_items(toc_headings)
         
         # Generate full page
@@ -9,6 +9,7 @@ Priority: .bloggy file > environment variables > defaults
 """
 
 import os
+import sys
 import tomllib
 from pathlib import Path
 from typing import Optional
@@ -54,9 +55,9 @@ class BloggyConfig:
             try:
                 with open(config_file, 'rb') as f:
                     self._config = tomllib.load(f)
-                print(f"✓ Loaded configuration from: {config_file}")
+                print(f"✓ Loaded configuration from: {config_file}", file=sys.stderr)
             except Exception as e:
-                print(f"Warning: Failed to load {config_file}: {e}")
+                print(f"Warning: Failed to load {config_file}: {e}", file=sys.stderr)
                 self._config = {}
     
     def get(self, key: str, env_var: str, default: any = None) -> any:
@@ -121,6 +122,151 @@ class BloggyConfig:
             return value.lower() in ('true', '1', 'yes', 'on')
         return bool(value)
 
+    def get_render_cache_max_bytes(self) -> int:
+        """Get the in-memory render cache budget in bytes (0 disables the cache)."""
+        value = self.get('render_cache_mb', 'BLOGGY_RENDER_CACHE_MB', 64)
+        try:
+            return max(0, int(float(value) * 1024 * 1024))
+        except (TypeError, ValueError):
+            return 64 * 1024 * 1024
+
+    def get_render_block_cache_max_bytes(self) -> int:
+        """Get the budget in bytes for cached top-level blocks of rendered posts (0 disables it)."""
+        value = self.get('render_block_cache_mb', 'BLOGGY_RENDER_BLOCK_CACHE_MB', 32)
+        try:
+            return max(0, int(float(value) * 1024 * 1024))
+        except (TypeError, ValueError):
+            return 32 * 1024 * 1024
+
+    def get_stream_min_bytes(self) -> int:
+        """Get the post size in bytes from which full page loads are streamed (0 disables streaming)."""
+        value = self.get('stream_min_kb', 'BLOGGY_STREAM_MIN_KB', 1024)
+        try:
+            return max(0, int(float(value) * 1024))
+        except (TypeError, ValueError):
+            return 1024 * 1024
+
+    def get_progressive_min_bytes(self) -> int:
+        """Get the post size in bytes from which posts load section by section while scrolling (0 disables it)."""
+        value = self.get('progressive_min_kb', 'BLOGGY_PROGRESSIVE_MIN_KB', 0)
+        try:
+            return max(0, int(float(value) * 1024))
+        except (TypeError, ValueError):
+            return 0
+
+    def get_progressive_sections(self) -> int:
+        """Get how many sections of a progressively loaded post each response carries."""
+        value = self.get('progressive_sections', 'BLOGGY_PROGRESSIVE_SECTIONS', 20)
+        try:
+            return max(1, int(value))
+        except (TypeError, ValueError):
+            return 20
+
+    def get_render_cache_dir(self) -> Optional[Path]:
+        """Get the on-disk render cache directory, or None when disabled.
+
+        Relative paths are resolved against the blog root.
+        """
+        value = self.get('render_cache_dir', 'BLOGGY_RENDER_CACHE_DIR', None)
+        if not value:
+            return None
+        path = Path(str(value)).expanduser()
+        if not path.is_absolute():
+            path = self.get_root_folder() / path
+        return path
+
+    def get_render_cache_dir_max_bytes(self) -> int:
+        """Get the budget in bytes for the on-disk render cache (0 for no limit)."""
+        value = self.get('render_cache_dir_mb', 'BLOGGY_RENDER_CACHE_DIR_MB', 512)
+        try:
+            return max(0, int(float(value) * 1024 * 1024))
+        except (TypeError, ValueError):
+            return 512 * 1024 * 1024
+
+    def get_responsive_images(self) -> bool:
+        """Get whether post images get resized variants in a srcset (needs Pillow)."""
+        value = self.get('responsive_images', 'BLOGGY_RESPONSIVE_IMAGES', True)
+        if isinstance(value, str):
+            return value.lower() in ('true', '1', 'yes', 'on')
+        return bool(value)
+
+    def get_image_widths(self) -> tuple:
+        """Get the widths in pixels that resized image variants are offered at."""
+        from .images import DEFAULT_WIDTHS
+        value = self.get('image_widths', 'BLOGGY_IMAGE_WIDTHS', DEFAULT_WIDTHS)
+        try:
+            if isinstance(value, str):
+                value = value.replace(',', ' ').split()
+            widths = tuple(sorted({int(width) for width in value if int(width) > 0}))
+            return widths or DEFAULT_WIDTHS
+        except (TypeError, ValueError):
+            return DEFAULT_WIDTHS
+
+    def get_image_cache_dir(self) -> Path:
+        """Get the directory resized image variants are written to.
+
+        Defaults to `images` inside `render_cache_dir` when that is set, else to
+        a directory under the system temp dir. Relative paths are resolved
+        against the blog root.
+        """
+        value = self.get('image_cache_dir', 'BLOGGY_IMAGE_CACHE_DIR', None)
+        if not value:
+            render_cache_dir = self.get_render_cache_dir()
+            if render_cache_dir:
+                return render_cache_dir / 'images'
+            import hashlib
+            import tempfile
+            root_digest = hashlib.blake2b(str(self.get_root_folder()).encode('utf-8'), digest_size=8).hexdigest()
+            return Path(tempfile.gettempdir()) / 'bloggy-images' / root_digest
+        path = Path(str(value)).expanduser()
+        if not path.is_absolute():
+            path = self.get_root_folder() / path
+        return path
+
+    def get_pdf_preview(self) -> bool:
+        """Get whether PDF pages show a first-page preview and load the viewer on demand."""
+        value = self.get('pdf_preview', 'BLOGGY_PDF_PREVIEW', True)
+        if isinstance(value, str):
+            return value.lower() in ('true', '1', 'yes', 'on')
+        return bool(value)
+
+    def get_render_api(self) -> bool:
+        """Get whether the batch render endpoint (`POST /_render`) is enabled."""
+        value = self.get('render_api', 'BLOGGY_RENDER_API', False)
+        if isinstance(value, str):
+            return value.lower() in ('true', '1', 'yes', 'on')
+        return bool(value)
+
+    def get_render_api_max_bytes(self) -> int:
+        """Get the largest request body in bytes the batch render endpoint accepts."""
+        value = self.get('render_api_max_kb', 'BLOGGY_RENDER_API_MAX_KB', 4096)
+        try:
+            return max(1, int(float(value) * 1024))
+        except (TypeError, ValueError):
+            return 4096 * 1024
+
+    def get_render_api_max_documents(self) -> int:
+        """Get the most documents one batch render request may hold."""
+        value = self.get('render_api_max_documents', 'BLOGGY_RENDER_API_MAX_DOCUMENTS', 500)
+        try:
+            return max(1, int(value))
+        except (TypeError, ValueError):
+            return 500
+
+    def get_code_highlighting(self) -> str:
+        """Get where code blocks are syntax highlighted: "client" (highlight.js) or "server" (Pygments)."""
+        value = str(self.get('code_highlighting', 'BLOGGY_CODE_HIGHLIGHTING', 'client')).strip().lower()
+        return value if value in ('client', 'server') else 'client'
+
+    def get_math_rendering(self) -> str:
+        """Get where math is typeset: "client" (KaTeX) or "server" (MathML)."""
+        value = str(self.get('math_rendering', 'BLOGGY_MATH_RENDERING', 'client')).strip().lower()
+        return value if value in ('client', 'server') else 'client'
+
+    def get_markdown_engine(self) -> str:
+        """Get the name of the markdown engine posts are rendered with (default "mistletoe")."""
+        return str(self.get('markdown_engine', 'BLOGGY_MARKDOWN_ENGINE', 'mistletoe')).strip().lower()
+
 
 
 # Global config instance
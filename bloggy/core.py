@@ -1,11 +1,12 @@
-import re, mistletoe as mst, pathlib, os
-from itertools import chain
-from urllib.parse import quote_plus
-from functools import partial
+import re, mistletoe as mst, pathlib, os, hashlib, asyncio, threading, concurrent.futures
+from abc import ABC, abstractmethod
+from contextlib import aclosing, contextmanager
+from urllib.parse import quote, quote_plus, unquote
 from functools import lru_cache
 from pathlib import Path
 from fasthtml.common import *
 from fasthtml.common import Beforeware
+from fasthtml.core import _xt_cts
 from fasthtml.jupyter import *
 from monsterui.all import *
 from starlette.staticfiles import StaticFiles
@@ -17,22 +18,37 @@ from .helpers import (
     text_to_anchor,
     _unique_anchor,
     parse_frontmatter,
-    get_post_title,
-    get_bloggy_config,
     order_bloggy_entries,
     _effective_abbreviations,
-    find_folder_note_file,
 )
 from .layout_helpers import (
     _resolve_layout_config,
     _width_class_and_style,
     _style_attr,
 )
+from .render_cache import RenderCache, DiskRenderCache, render_cache_key
+from collections import namedtuple
+from types import SimpleNamespace
+from mistletoe import block_tokenizer, token as mst_token
+from .highlight import highlight_code, highlight_css, pygments_available, CSS_CLASS as HIGHLIGHT_CSS_CLASS
+from .mathml import latex_to_mathml, mathml_available
+from .images import (
+    IMAGE_SIZES, MEDIA_TYPES, ImageVariants, image_info, image_sources, variant_widths, negotiate_format,
+    pillow_available,
+)
+from .batch import parse_documents, render_documents, ndjson_line
+from .pdf_preview import PdfPreviews, pdf_info, format_size, preview_available as pdf_preview_available
+from .site_index import get_site_index
+from .engines import MarkdownEngine, DEFAULT_ENGINE, register_engine, get_engine, engine_names
+from .transclusion import (
+    EmbedGraph, EMBED_LINE_RE, EMBED_PLACEHOLDER_RE, MAX_EMBED_DEPTH,
+    embed_placeholder, split_target, resolve_note, extract_section,
+)
 from loguru import logger
 
-# disable debug level logs to stdout
+# disable debug level logs on stderr, leaving stdout to `bloggy render` output
 logger.remove()
-logger.add(sys.stdout, level="INFO")
+logger.add(sys.stderr, level="INFO")
 logfile = Path("/tmp/bloggy_core.log")
 logger.add(logfile, rotation="10 MB", retention="10 days", level="DEBUG")
 
@@ -114,6 +130,21 @@ class Strikethrough(mst.span_token.SpanToken):
     def __init__(self, match):
         self.children = []
 
+# Math: $$display$$ and $inline$, registered only when math is rendered server-side.
+# Inline math follows Pandoc: no space just inside the dollars and no digit right
+# after the closing one, so "$100-$200" stays text
+_MATH_PATTERN = r'\$\$(.+?)\$\$|\$(?![\s$])((?:[^$\\\n]|\\.)+?)(?<!\s)\$(?!\d)'
+
+class MathExpression(mst.span_token.SpanToken):
+    pattern = re.compile(_MATH_PATTERN, re.DOTALL)
+    parse_inner = False
+    parse_group = 0
+    precedence = 8
+    def __init__(self, match):
+        self.display = match.group(1) is not None
+        self.latex = match.group(1) if self.display else match.group(2)
+        self.children = []
+
 def preprocess_super_sub(content):
     """Convert superscript and subscript syntax to HTML before markdown rendering"""
     # Handle superscript ^text^
@@ -122,17 +153,111 @@ def preprocess_super_sub(content):
     content = re.sub(r'(?<!~)~([^~\n]+?)~(?!~)', r'<sub>\1</sub>', content)
     return content
 
+_FOOTNOTE_HEAD_RE = re.compile(r'^\[\^([^\]]+)\]:', re.MULTILINE)
+_FOOTNOTE_END_RE = re.compile(r'\n(?:\[\^|\n)')
+_WHITESPACE_RE = re.compile(r'\s*')
+
 def extract_footnotes(content):
-    pat = re.compile(r'^\[\^([^\]]+)\]:\s*(.+?)(?=(?:^|\n)\[\^|\n\n|\Z)', re.MULTILINE | re.DOTALL)
-    defs = {m.group(1): m.group(2).strip() for m in pat.finditer(content)}
-    for m in pat.finditer(content): content = content.replace(m.group(0), '', 1)
-    return content.strip(), defs
+    """Strip `[^label]: text` definitions, returning (content, {label: text})
+
+    A definition runs until a blank line, the next line starting with `[^`, or
+    the end of the document. Works in a single forward pass, so the cost stays
+    linear in the document size regardless of how many footnotes it holds.
+    """
+    defs, kept, pos, size = {}, [], 0, len(content)
+    while True:
+        head = _FOOTNOTE_HEAD_RE.search(content, pos)
+        if head is None:
+            break
+        body_start = _WHITESPACE_RE.match(content, head.end()).end()
+        if body_start == size:
+            if body_start == head.end():
+                break  # A bare marker at the very end is not a definition
+            end = size
+        else:
+            tail = _FOOTNOTE_END_RE.search(content, body_start)
+            end = tail.start() if tail else size
+        defs[head.group(1)] = content[body_start:end].strip()
+        kept.append(content[pos:head.start()])
+        pos = end
+    kept.append(content[pos:])
+    return ''.join(kept).strip(), defs
+
+_TAB_PLACEHOLDER_RE = re.compile(r'<div class="tab-placeholder" data-tab-id="([^"]+)"></div>')
+
+def _tab_placeholder(tab_id):
+    return f'<div class="tab-placeholder" data-tab-id="{tab_id}"></div>'
+
+def _parse_tabs_block(block, tabs_content):
+    """Parse the body of one :::tabs block into (tab_id, [(title, content), ...])
+
+    `block` is the full source of the block (used to derive a stable id) and
+    `tabs_content` is the text between the opening and closing markers.
+    Returns None when the block contains no titled tabs.
+    """
+    # Pattern to match ::tab{title="..." ...}
+    tab_pattern = re.compile(r'^::tab\{([^\}]+)\}\s*\n(.*?)(?=^::tab\{|\Z)', re.MULTILINE | re.DOTALL)
+
+    def parse_attrs(raw_attrs):
+        attrs = {}
+        for key, value in re.findall(r'([a-zA-Z0-9_-]+)\s*=\s*"([^"]*)"', raw_attrs):
+            attrs[key] = value
+        return attrs
+
+    tabs = []
+    for tab_match in tab_pattern.finditer(tabs_content):
+        raw_attrs = tab_match.group(1)
+        tab_content = tab_match.group(2).strip()
+        attrs = parse_attrs(raw_attrs)
+        title = attrs.get('title')
+        if not title:
+            continue
+        tabs.append({'title': title, 'content': tab_content, 'attrs': attrs})
+
+    if not tabs:
+        return None
+
+    title_map = {tab['title']: tab for tab in tabs}
+    index_map = {str(i): tab for i, tab in enumerate(tabs)}
+
+    def fence_wrap(content):
+        backtick_runs = re.findall(r'`+', content)
+        max_run = max((len(run) for run in backtick_runs), default=0)
+        fence_len = max(4, max_run + 1)
+        fence = '`' * fence_len
+        return f'{fence}\n{content}\n{fence}'
+
+    def resolve_tab_content(tab, stack=None):
+        stack = stack or set()
+        copy_from = tab.get('attrs', {}).get('copy-from')
+        if not copy_from:
+            return tab['content']
+        if copy_from in stack:
+            return tab['content']
+        source_tab = None
+        if copy_from.startswith('index:'):
+            index_key = copy_from.split(':', 1)[1].strip()
+            source_tab = index_map.get(index_key)
+        elif copy_from.isdigit():
+            source_tab = index_map.get(copy_from)
+        else:
+            source_tab = title_map.get(copy_from)
+        if not source_tab:
+            return tab['content']
+        stack.add(copy_from)
+        resolved = resolve_tab_content(source_tab, stack)
+        stack.remove(copy_from)
+        return fence_wrap(resolved)
+
+    for tab in tabs:
+        tab['content'] = resolve_tab_content(tab)
+
+    # Generate unique ID for this tab group
+    tab_id = hashlib.md5(block.encode()).hexdigest()[:8]
+    return tab_id, [(tab['title'], tab['content']) for tab in tabs]
 
 def preprocess_tabs(content):
     """Convert :::tabs syntax to placeholder tokens, store tab data for later processing"""
-    import hashlib
-    import base64
-    
     # Storage for tab data (will be processed after main markdown rendering)
     tab_data_store = {}
     
@@ -140,99 +265,387 @@ def preprocess_tabs(content):
     tabs_pattern = re.compile(r'^:::tabs\s*\n(.*?)^:::', re.MULTILINE | re.DOTALL)
     
     def replace_tabs_block(match):
-        tabs_content = match.group(1)
-        # Pattern to match ::tab{title="..." ...}
-        tab_pattern = re.compile(r'^::tab\{([^\}]+)\}\s*\n(.*?)(?=^::tab\{|\Z)', re.MULTILINE | re.DOTALL)
-
-        def parse_attrs(raw_attrs):
-            attrs = {}
-            for key, value in re.findall(r'([a-zA-Z0-9_-]+)\s*=\s*"([^"]*)"', raw_attrs):
-                attrs[key] = value
-            return attrs
-
-        tabs = []
-        for tab_match in tab_pattern.finditer(tabs_content):
-            raw_attrs = tab_match.group(1)
-            tab_content = tab_match.group(2).strip()
-            attrs = parse_attrs(raw_attrs)
-            title = attrs.get('title')
-            if not title:
-                continue
-            tabs.append({'title': title, 'content': tab_content, 'attrs': attrs})
-        
-        if not tabs:
+        parsed = _parse_tabs_block(match.group(0), match.group(1))
+        if parsed is None:
             return match.group(0)  # Return original if no tabs found
-
-        title_map = {tab['title']: tab for tab in tabs}
-        index_map = {str(i): tab for i, tab in enumerate(tabs)}
-
-        def fence_wrap(content):
-            backtick_runs = re.findall(r'`+', content)
-            max_run = max((len(run) for run in backtick_runs), default=0)
-            fence_len = max(4, max_run + 1)
-            fence = '`' * fence_len
-            return f'{fence}\n{content}\n{fence}'
-
-        def resolve_tab_content(tab, stack=None):
-            stack = stack or set()
-            copy_from = tab.get('attrs', {}).get('copy-from')
-            if not copy_from:
-                return tab['content']
-            if copy_from in stack:
-                return tab['content']
-            source_tab = None
-            if copy_from.startswith('index:'):
-                index_key = copy_from.split(':', 1)[1].strip()
-                source_tab = index_map.get(index_key)
-            elif copy_from.isdigit():
-                source_tab = index_map.get(copy_from)
-            else:
-                source_tab = title_map.get(copy_from)
-            if not source_tab:
-                return tab['content']
-            stack.add(copy_from)
-            resolved = resolve_tab_content(source_tab, stack)
-            stack.remove(copy_from)
-            return fence_wrap(resolved)
-
-        for tab in tabs:
-            tab['content'] = resolve_tab_content(tab)
-        
-        # Generate unique ID for this tab group
-        tab_id = hashlib.md5(match.group(0).encode()).hexdigest()[:8]
-        
+        tab_id, tabs = parsed
         # Store tab data for later processing
-        tab_data_store[tab_id] = [(tab['title'], tab['content']) for tab in tabs]
-        
+        tab_data_store[tab_id] = tabs
         # Return a placeholder that won't be processed by markdown
-        placeholder = f'<div class="tab-placeholder" data-tab-id="{tab_id}"></div>'
-        return placeholder
+        return _tab_placeholder(tab_id)
     
     processed_content = tabs_pattern.sub(replace_tabs_block, content)
     return processed_content, tab_data_store
 
-class ContentRenderer(FrankenRenderer):
-    def __init__(self, *extras, img_dir=None, footnotes=None, current_path=None, **kwargs):
-        super().__init__(*extras, img_dir=img_dir, **kwargs)
-        self.footnotes, self.fn_counter = footnotes or {}, 0
-        self.current_path = current_path  # Current post path for resolving relative links and images
+_FENCE_OPEN_RE = re.compile(r'^\s*(`{3,}|~{3,})')
+_FOOTNOTE_DEF_RE = re.compile(r'\[\^([^\]]+)\]:')
+_INLINE_CODE_RE = re.compile(r'(`+)[^`]*?\1')
+_ESCAPED_DOLLAR_RE = re.compile(r'(\\+)\$')
+_SUPERSCRIPT_RE = re.compile(r'\^([^\^\n]+?)\^')
+_SUBSCRIPT_RE = re.compile(r'(?<!~)~([^~\n]+?)~(?!~)')
+_INLINE_MATH_RE = re.compile(_MATH_PATTERN)
+# Stands in for escaped dollars until the page is rendered, so they are never read as math
+_DOLLAR_PLACEHOLDER = '@@BLOGGY_DOLLAR@@'
+
+def _replace_escaped_dollar(m):
+    # Remove one escaping backslash, keep the rest literal; KaTeX auto-render skips the placeholder
+    return '\\' * (len(m.group(1)) - 1) + _DOLLAR_PLACEHOLDER
+
+def _super_sub(text):
+    if '^' in text:
+        text = _SUPERSCRIPT_RE.sub(r'<sup>\1</sup>', text)
+    # ~text~ is subscript, ~~text~~ stays strikethrough
+    if '~' in text:
+        text = _SUBSCRIPT_RE.sub(r'<sub>\1</sub>', text)
+    return text
+
+def _protect_escaped_dollar(line):
+    """Replace escaped dollars outside inline code spans with a placeholder"""
+    if '`' not in line:
+        return _ESCAPED_DOLLAR_RE.sub(_replace_escaped_dollar, line)
+    parts, pos = [], 0
+    for m in _INLINE_CODE_RE.finditer(line):
+        parts.append(_ESCAPED_DOLLAR_RE.sub(_replace_escaped_dollar, line[pos:m.start()]))
+        parts.append(m.group(0))
+        pos = m.end()
+    parts.append(_ESCAPED_DOLLAR_RE.sub(_replace_escaped_dollar, line[pos:]))
+    return ''.join(parts)
+
+def _preprocess_line(line, super_sub=True):
+    """Protect escaped dollars and convert ^sup^/~sub~ in one line of prose"""
+    if '\\$' in line:
+        line = _protect_escaped_dollar(line)
+    if super_sub and ('^' in line or '~' in line):
+        if '$' not in line:
+            return _super_sub(line)
+        # Carets and tildes inside $math$ are TeX, not superscript/subscript
+        parts, pos = [], 0
+        for m in _INLINE_MATH_RE.finditer(line):
+            parts.append(_super_sub(line[pos:m.start()]))
+            parts.append(m.group(0))
+            pos = m.end()
+        parts.append(_super_sub(line[pos:]))
+        line = ''.join(parts)
+    return line
+
+def _closes_fence(line, fence):
+    stripped = line.strip()
+    return len(stripped) >= len(fence) and stripped == fence[0] * len(stripped)
+
+def preprocess_markdown(content):
+    """Prepare markdown for mistletoe in a single pass over its lines.
+
+    Tracks fenced code state once and, outside fences, protects escaped dollars,
+    extracts footnote definitions, converts ^sup^/~sub~ outside math, swaps :::tabs blocks and
+    `![[note]]` embeds for placeholders and turns single newlines into markdown line breaks.
+    Returns (content, footnotes, tab_data_store).
+    """
+    out = []            # (line, fenced) pairs; newlines after fenced lines are kept verbatim
+    footnotes = {}
+    tab_data_store = {}
+    fence = None        # opening marker while inside fenced code
+    tab_open = None     # opening line of the :::tabs block being collected
+    tab_lines = None    # (line, fenced) pairs inside that block
+    fn_label = None     # footnote definition being collected
+    fn_body = []
+    fn_pending = False  # definition marker seen, body not started yet
+    fn_start = None     # (target, index, line, swallowed blank lines) to undo an empty definition
+    display_math = False  # inside a paragraph opened by a bare `$$` line
+
+    for raw in content.split('\n'):
+        if fn_label is not None:
+            if fn_pending:
+                if not raw.strip():
+                    fn_start[3].append(raw)
+                    continue
+                fn_body.append(_preprocess_line(raw.lstrip(), super_sub=False))
+                fn_pending = False
+                continue
+            if raw and not raw.startswith('[^'):
+                fn_body.append(_preprocess_line(raw, super_sub=False))
+                continue
+            # A blank line or the next [^...] ends the definition
+            footnotes[fn_label] = '\n'.join(fn_body).strip()
+            fn_label = None
+
+        target = tab_lines if tab_lines is not None else out
+        if fence is not None:
+            if _closes_fence(raw, fence):
+                fence = None
+                target.append((raw, False))
+            else:
+                target.append((raw, True))
+            continue
+        fence_match = _FENCE_OPEN_RE.match(raw)
+        if fence_match:
+            fence = fence_match.group(1)
+            target.append((raw, True))
+            continue
+        if raw.startswith('[^'):
+            fn_match = _FOOTNOTE_DEF_RE.match(raw)
+            if fn_match:
+                fn_label = fn_match.group(1)
+                body = raw[fn_match.end():].strip()
+                fn_body = [_preprocess_line(body, super_sub=False)] if body else []
+                fn_pending = not body
+                fn_start = (target, len(target), raw, [])
+                # The whole definition collapses into one empty line
+                target.append(('', False))
+                continue
+
+        embed = EMBED_LINE_RE.match(raw) if '![[' in raw else None
+        if embed:
+            # An embed is a block of its own; the blank line keeps the next line out of its HTML block
+            target.append((embed_placeholder(embed.group(1).strip()), False))
+            target.append(('', False))
+            continue
+
+        stripped = raw.strip()
+        if stripped == '$$':
+            display_math = not display_math
+        elif not stripped:
+            display_math = False
+        # Lines of a $$ ... $$ block are TeX, so ^ and ~ are left alone
+        line = _preprocess_line(raw, super_sub=not display_math)
+        if tab_lines is not None:
+            if not line.startswith(':::'):
+                tab_lines.append((line, False))
+                continue
+            body = '\n'.join(l for l, _ in tab_lines)
+            parsed = _parse_tabs_block(f"{tab_open}\n{body}\n:::", f"{body}\n" if tab_lines else "")
+            if parsed is None:
+                out.append((tab_open, False))
+                out.extend(tab_lines)
+                out.append((line, False))
+            else:
+                tab_id, tabs = parsed
+                tab_data_store[tab_id] = tabs
+                out.append((_tab_placeholder(tab_id) + line[3:], False))
+            tab_open = tab_lines = None
+            continue
+        if line.startswith(':::tabs') and not line[7:].strip():
+            tab_open, tab_lines = line, []
+            continue
+        out.append((line, False))
+
+    if fn_label is not None:
+        target, index, raw, blanks = fn_start
+        if fn_pending and raw.endswith(']:') and not blanks:
+            # A bare marker at the very end of the document is not a definition
+            target[index] = (_preprocess_line(raw), False)
+        else:
+            footnotes[fn_label] = '\n'.join(fn_body).strip()
+    if tab_lines is not None:
+        # Unclosed :::tabs block renders as plain text
+        out.append((tab_open, False))
+        out.extend(tab_lines)
+
+    # Trim surrounding whitespace of the whole document
+    while out and not out[0][0].strip():
+        out.pop(0)
+    while out and not out[-1][0].strip():
+        out.pop()
+    if not out:
+        return '', footnotes, tab_data_store
+    out[0] = (out[0][0].lstrip(), out[0][1])
+    out[-1] = (out[-1][0].rstrip(), out[-1][1])
+
+    # Single newlines inside paragraphs become markdown line breaks ('  \n');
+    # blank lines and newlines inside fenced code are left alone
+    parts = []
+    last = len(out) - 1
+    for i, (line, fenced) in enumerate(out):
+        parts.append(line)
+        if i < last:
+            parts.append('\n' if fenced or not line or not out[i + 1][0] else '  \n')
+    return ''.join(parts), footnotes, tab_data_store
+
+@lru_cache(maxsize=4096)
+def _resolve_relative_href(root, current_path, href):
+    """Map a link relative to `current_path` onto its `/posts/...` URL
+
+    Uses pure path normalization, so rendering never touches the filesystem.
+    Returns None when the target falls outside `root`.
+    """
+    target = os.path.normpath(os.path.join(root, os.path.dirname(current_path), href))
+    if target == root:
+        return '/posts/.'
+    prefix = root.rstrip(os.sep) + os.sep
+    if not target.startswith(prefix):
+        return None
+    return f'/posts/{target[len(prefix):]}'
+
+# Code block and mermaid control markup repeats once per block, so its styling
+# lives in the `.code-copy-button` / `.mermaid-controls` rules in `hdrs`
+_MERMAID_CONTROLS_HTML = (
+    '<button type="button" data-mermaid-action="fullscreen" title="Fullscreen">⛶</button>'
+    '<button type="button" data-mermaid-action="reset" title="Reset zoom">Reset</button>'
+    '<button type="button" data-mermaid-action="zoom-in" title="Zoom in">+</button>'
+    '<button type="button" data-mermaid-action="zoom-out" title="Zoom out">−</button>'
+)
+
+def _content_id(content):
+    """Short digest of `content` for element IDs; unlike `hash()` it is the same in every process"""
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=4).hexdigest()
+
+@lru_cache(maxsize=1)
+def _copy_icon_html():
+    return to_xml(UkIcon("copy", cls="w-4 h-4"))
+
+# Sidenote markup is formatted directly rather than built from FT components,
+# which would cost more per note than rendering the note itself
+_SIDENOTE_STYLE = "text-sm leading-relaxed border-l-2 border-amber-400 dark:border-blue-400 pl-3 text-neutral-500 dark:text-neutral-400 transition-all duration-500 w-full my-2 xl:my-0"
+_SIDENOTE_TEMPLATE = (
+    '<span aria-hidden="true" class="hidden"> (</span>'
+    '<span role="doc-noteref" aria-label="Sidenote {n}" _="on click if window.innerWidth &gt;= 1280 then add .hl to #sn-{n} then wait 1s then remove .hl from #sn-{n} else toggle .open on me then toggle .show on #sn-{n}" id="snref-{n}" class="sidenote-ref cursor-pointer"></span>'
+    '<span role="doc-footnote" aria-labelledby="snref-{n}" id="sn-{n}" class="sidenote ' + _SIDENOTE_STYLE + '">{body}</span>'
+    '<span aria-hidden="true" class="hidden">)</span>'
+)
+
+# Classes written onto rendered tags: monsterui's prose defaults with Bloggy's overrides
+CONTENT_CLASS_MAP = {
+    **franken_class_map,
+    'pre': 'my-4', 'p': 'text-base leading-relaxed mb-6', 'li': 'text-base leading-relaxed',
+    'ul': 'uk-list uk-list-bullet space-y-2 mb-6 ml-6 text-base', 'ol': 'uk-list uk-list-decimal space-y-2 mb-6 ml-6 text-base',
+    'hr': 'border-t border-border my-8', 'h1': 'text-3xl font-bold mb-6 mt-8', 'h2': 'text-2xl font-semibold mb-4 mt-6',
+    'h3': 'text-xl font-semibold mb-3 mt-5', 'h4': 'text-lg font-semibold mb-2 mt-4',
+    'table': 'uk-table uk-table-striped uk-table-hover uk-table-divider uk-table-middle my-6',
+}
+
+class ContentMarkup(ABC):
+    """HTML for Bloggy's content elements, shared by every markdown engine
+
+    Subclasses parse the markdown and call these methods with what they parsed.
+    They provide `render_fragment` and set the per-document state used here:
+    `class_map`, `img_dir`, `current_path`, `footnotes`, `tab_data_store`,
+    `toc`, `_open_footnotes` and the counters from `reset_document_state`.
+    """
+    _link_root = None
+    _embed_stack = ()   # Paths of the notes being embedded, outermost first
+    anchor_prefix = ''  # Prepended to heading anchors, set while rendering an embedded note
+
+    def reset_document_state(self):
+        """Reset per-document counters so the renderer can be reused for another document"""
+        self.fn_counter = 0
         self.heading_counts = {}
         self.mermaid_counter = 0
-    
-    def render_list_item(self, token):
-        """Render list items with task list checkbox support"""
-        inner = self.render_inner(token)
-        
+        self.embed_counts = {}  # Times each embed target has rendered so far
+
+    def document_state(self):
+        """The counters a following section of the document continues from, as plain tuples"""
+        return self.fn_counter, self.mermaid_counter, tuple(self.heading_counts.items()), tuple(self.embed_counts.items())
+
+    def restore_document_state(self, state):
+        """Continue from a `document_state`, as if the sections before it had just rendered"""
+        self.fn_counter, self.mermaid_counter, counts, embeds = state
+        self.heading_counts = dict(counts)
+        self.embed_counts = dict(embeds)
+
+    @abstractmethod
+    def render_fragment(self, content):
+        """Render markdown `content` in place, continuing the current document's state"""
+
+    def render_subdocument(self, content):
+        """Render `content` as its own markdown document (e.g. a tab panel) inside the current one
+
+        Sidenote and diagram counters start fresh for the subdocument and are
+        restored afterwards. Heading anchors stay unique across the whole page
+        and its headings are recorded in `toc`.
+        """
+        saved = self.fn_counter, self.mermaid_counter
+        self.fn_counter = self.mermaid_counter = 0
+        try:
+            return self.render_fragment(content)
+        finally:
+            self.fn_counter, self.mermaid_counter = saved
+
+    def block_placeholders_html(self, content):
+        """Raw HTML with any tab group and embed placeholders replaced by what they stand for"""
+        if self.tab_data_store and 'tab-placeholder' in content:
+            content = _TAB_PLACEHOLDER_RE.sub(self._render_tab_placeholder, content)
+        if 'embed-placeholder' in content:
+            content = EMBED_PLACEHOLDER_RE.sub(lambda m: self.embed_html(m.group(1)), content)
+        return content
+
+    def embed_html(self, target):
+        """Render the note (or the section of it) that `![[target]]` embeds
+
+        The note renders with its own footnotes, tabs and relative links, and
+        its headings stay out of the TOC. Sidenote and diagram numbering carry
+        on, so their IDs stay unique on the page, and each embed of the same
+        target prefixes its heading anchors differently. A note that embeds itself,
+        directly or not, or sits deeper than `MAX_EMBED_DEPTH`, is linked
+        instead of rendered.
+        """
+        import html
+        note, heading = split_target(target)
+        host = self._embed_stack[-1] if self._embed_stack else self.current_path
+        path = resolve_note(str(get_root_folder()), host, note)
+        if path is None:
+            return f'<div class="embed embed-missing my-6 text-sm text-slate-500 dark:text-slate-400">Missing note: {html.escape(target)}</div>'
+        href = f'/posts/{quote(path)}' + (f'#{text_to_anchor(heading)}' if heading else '')
+        link = f'<a href="{href}"{self.tag_class("a")}>{html.escape(target)}</a>'
+        stack = self._embed_stack or ((self.current_path,) if self.current_path else ())
+        if path in stack or len(stack) > MAX_EMBED_DEPTH:
+            return f'<div class="embed embed-skipped my-6 text-sm text-slate-500 dark:text-slate-400">{link}</div>'
+        _, source = parse_frontmatter(get_root_folder() / f'{path}.md')
+        if heading:
+            source = extract_section(source, heading)
+            if source is None:
+                return f'<div class="embed embed-missing my-6 text-sm text-slate-500 dark:text-slate-400">Missing section: {link}</div>'
+        body, footnotes, tab_data_store = preprocess_markdown(source)
+        saved = (self.footnotes, self.tab_data_store, self.current_path, self.img_dir,
+                 self.heading_counts, self.toc, self._open_footnotes, self.anchor_prefix, self._embed_stack)
+        self.footnotes, self.tab_data_store, self._open_footnotes = footnotes, tab_data_store, set()
+        self.current_path, self.img_dir = path, _post_img_dir(None, path)
+        self.heading_counts, self.toc = {}, []
+        occurrence = self.embed_counts.get(target, 0)
+        self.embed_counts[target] = occurrence + 1
+        self.anchor_prefix = f'{_content_id(f"{target}#{occurrence}" if occurrence else target)}-'
+        self._embed_stack = stack + (path,)
+        try:
+            inner = self.render_fragment(body)
+        finally:
+            (self.footnotes, self.tab_data_store, self.current_path, self.img_dir,
+             self.heading_counts, self.toc, self._open_footnotes, self.anchor_prefix, self._embed_stack) = saved
+        return (f'<div class="embed my-6 border-l-2 border-slate-200 dark:border-slate-700 pl-4" data-embed-src="/posts/{quote(path)}">'
+                f'<div class="embed-source mb-2 text-xs text-slate-500 dark:text-slate-400">{link}</div>{inner}</div>')
+
+    def _render_tab_placeholder(self, match):
+        tabs = self.tab_data_store.get(match.group(1))
+        if tabs is None:
+            return match.group(0)
+        return render_tab_group(match.group(1), tabs, self)
+
+    def tag_class(self, tag, existing=''):
+        """Class attribute for `tag`: `existing` classes followed by the class map entry"""
+        classes = f"{existing} {self.class_map.get(tag, '')}".strip()
+        return f' class="{classes}"' if classes else ''
+
+    def image_html(self, src, alt, title=None):
+        """Render an image, resolving a relative `src` against `img_dir`
+
+        Images are loaded lazily. Local images also get their intrinsic size and,
+        with responsive images on, a `srcset` of resized variants.
+        """
+        title = f' title="{title}"' if title is not None else ''
+        if self.img_dir and not src.startswith(('http://', 'https://', '/', 'attachment:', 'blob:', 'data:')):
+            src = f'{Path(self.img_dir)}/{src}'
+        return (f'<img src="{src}" alt="{alt}"{title}{_responsive_image_attrs(src)} loading="lazy" decoding="async"'
+                f'{self.tag_class("img", "max-w-full h-auto rounded-lg mb-6")}>')
+
+    def list_item_html(self, inner):
+        """Render a list item around its rendered `inner` HTML, with task list checkbox support"""
         # Check if this is a task list item: starts with [ ] or [x]
         # Try different patterns as the structure might vary
         task_pattern = re.match(r'^\s*\[([ xX])\]\s*(.*?)$', inner, re.DOTALL)
         if not task_pattern:
-            task_pattern = re.match(r'^<p>\s*\[([ xX])\]\s*(.*?)</p>$', inner, re.DOTALL)
-        
+            task_pattern = re.match(r'^<p[^>]*>\s*\[([ xX])\]\s*(.*?)</p>$', inner, re.DOTALL)
+
         if task_pattern:
             checked = task_pattern.group(1).lower() == 'x'
             content = task_pattern.group(2).strip()
-            
+
             # Custom styled checkbox
             if checked:
                 checkbox_style = 'background-color: #10b981; border-color: #10b981;'
@@ -240,40 +653,64 @@ class ContentRenderer(FrankenRenderer):
             else:
                 checkbox_style = 'background-color: #6b7280; border-color: #6b7280;'
                 checkmark = ''
-            
+
             checkbox = f'''<span class="inline-flex items-center justify-center mr-3 mt-0.5" style="width: 20px; height: 20px; border-radius: 6px; border: 2px solid; {checkbox_style} flex-shrink: 0;">
                 {checkmark}
             </span>'''
-            
-            return f'<li class="task-list-item flex items-start" style="list-style: none; margin: 0.5rem 0;">{checkbox}<span class="flex-1">{content}</span></li>\n'
-        
-        return f'<li>{inner}</li>\n'
 
-    
-    def render_youtube_embed(self, token):
-        video_id = token.video_id
-        caption = getattr(token, 'caption', None)
+            return f'<li{self.tag_class("li", "task-list-item flex items-start")} style="list-style: none; margin: 0.5rem 0;">{checkbox}<span class="flex-1">{content}</span></li>\n'
+
+        return f'<li{self.tag_class("li")}>{inner}</li>\n'
+
+    def youtube_html(self, video_id, caption=None):
+        """Render a YouTube video as a poster with a play button
 
+        The player iframe is only created when the poster is clicked (see
+        `scripts.js`), so a page loads none of YouTube's scripts until then.
+        Without JavaScript the poster links to the video on YouTube.
+        """
         iframe = f'''
-        <div class="relative w-full aspect-video my-6 rounded-lg overflow-hidden border border-slate-200 dark:border-slate-800">
-            <iframe
-                src="https://www.youtube.com/embed/{video_id}"
-                title="YouTube video"
-                frameborder="0"
-                allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture"
-                allowfullscreen
-                class="absolute inset-0 w-full h-full">
-            </iframe>
+        <div class="relative w-full aspect-video my-6 rounded-lg overflow-hidden border border-slate-200 dark:border-slate-800 bg-black">
+            <a href="https://www.youtube.com/watch?v={video_id}" data-youtube-id="{video_id}" target="_blank" rel="noopener"
+                aria-label="Play YouTube video" class="youtube-facade group absolute inset-0 flex items-center justify-center">
+                <img src="https://i.ytimg.com/vi/{video_id}/hqdefault.jpg" alt="" loading="lazy" decoding="async"
+                    class="absolute inset-0 m-0 w-full h-full object-cover">
+                <svg class="relative w-16 h-12 opacity-90 group-hover:opacity-100 transition-opacity" viewBox="0 0 68 48" aria-hidden="true">
+                    <path d="M66.5 7.7a8.6 8.6 0 0 0-6-6C55.2.2 34 .2 34 .2s-21.2 0-26.5 1.5a8.6 8.6 0 0 0-6 6C0 13 0 24 0 24s0 11 1.5 16.3a8.6 8.6 0 0 0 6 6C12.8 47.8 34 47.8 34 47.8s21.2 0 26.5-1.5a8.6 8.6 0 0 0 6-6C68 35 68 24 68 24s0-11-1.5-16.3z" fill="#f00"/>
+                    <path d="M45 24 27 14v20z" fill="#fff"/>
+                </svg>
+            </a>
         </div>
         '''
 
         if caption:
-            return iframe + f'<p class="text-sm text-slate-500 dark:text-slate-400 text-center mt-2">{caption}</p>'
+            return iframe + f'<p{self.tag_class("p", "text-sm text-slate-500 dark:text-slate-400 text-center mt-2")}>{caption}</p>'
         return iframe
-    
-    def render_footnote_ref(self, token):
+
+    def render_footnote_body(self, target, content):
+        """Render a sidenote body as part of the current document
+
+        The syntax registered for the post still applies while it renders,
+        so the body is parsed the same way and no per-note setup is needed.
+        """
+        import html
+        if target in self._open_footnotes:
+            return html.escape(content)  # A note that cites itself renders as plain text
+        self._open_footnotes.add(target)
+        toc_len = len(self.toc)
+        try:
+            rendered = self.render_fragment(content).strip()
+        finally:
+            self._open_footnotes.discard(target)
+            del self.toc[toc_len:]  # Headings inside sidenotes stay out of the TOC
+        p_open = f'<p{self.tag_class("p")}>'
+        if rendered.startswith(p_open) and rendered.endswith('</p>'): rendered = rendered[len(p_open):-4]
+        return rendered
+
+    def sidenote_html(self, target):
+        """Render the next sidenote, citing footnote definition `target`"""
         self.fn_counter += 1
-        n, target = self.fn_counter, token.target
+        n = self.fn_counter
         content = self.footnotes.get(target, f"[Missing footnote: {target}]")
         if "\n" in content:
             content = content.replace("\r\n", "\n")
@@ -281,48 +718,37 @@ class ContentRenderer(FrankenRenderer):
             content = content.replace("\n\n", f"\n{placeholder}\n")
             content = content.replace("\n", "<br>\n")
             content = content.replace(f"\n{placeholder}\n", "\n\n")
-        rendered = mst.markdown(content, partial(ContentRenderer, img_dir=self.img_dir, current_path=self.current_path)).strip()
-        if rendered.startswith('<p>') and rendered.endswith('</p>'): rendered = rendered[3:-4]
-        style = "text-sm leading-relaxed border-l-2 border-amber-400 dark:border-blue-400 pl-3 text-neutral-500 dark:text-neutral-400 transition-all duration-500 w-full my-2 xl:my-0"
-        toggle = f"on click if window.innerWidth >= 1280 then add .hl to #sn-{n} then wait 1s then remove .hl from #sn-{n} else toggle .open on me then toggle .show on #sn-{n}"
-        ref = Span(id=f"snref-{n}", role="doc-noteref", aria_label=f"Sidenote {n}", cls="sidenote-ref cursor-pointer", _=toggle)
-        note = Span(NotStr(rendered), id=f"sn-{n}", role="doc-footnote", aria_labelledby=f"snref-{n}", cls=f"sidenote {style}")
-        hide = lambda c: to_xml(Span(c, cls="hidden", aria_hidden="true"))
-        return hide(" (") + to_xml(ref) + to_xml(note) + hide(")")
-    
-    def render_heading(self, token):
-        """Render headings with anchor IDs for TOC linking"""
+        rendered = self.render_footnote_body(target, content)
+        return _SIDENOTE_TEMPLATE.format(n=n, body=rendered)
+
+    def heading_html(self, level, inner):
+        """Render a heading with an anchor ID for TOC linking and record it in `toc`"""
         import html
-        level = token.level
-        inner = self.render_inner(token)
         plain = _plain_text_from_html(inner)
-        anchor = _unique_anchor(text_to_anchor(plain), self.heading_counts)
-        return f'<h{level} id="{anchor}">{html.escape(plain)}</h{level}>'
-    
-    def render_superscript(self, token):
-        """Render superscript text"""
-        return f'<sup>{token.content}</sup>'
-    
-    def render_subscript(self, token):
-        """Render subscript text"""
-        return f'<sub>{token.content}</sub>'
-    
-    def render_strikethrough(self, token):
-        """Render strikethrough text"""
-        inner = self.render_inner(token)
-        return f'<del>{inner}</del>'
-    
-    def render_inline_code_attr(self, token):
+        anchor = self.anchor_prefix + _unique_anchor(text_to_anchor(plain), self.heading_counts)
+        self.toc.append((level, plain, anchor))
+        return f'<h{level} id="{anchor}"{self.tag_class(f"h{level}")}>{html.escape(plain)}</h{level}>'
+
+    def math_html(self, latex, display):
+        """Render $math$ / $$math$$ as MathML, leaving what can't be converted to KaTeX"""
+        mathml = latex_to_mathml(latex.strip(), display)
+        if mathml is not None:
+            return mathml
+        import html
+        # scripts.js loads KaTeX only for pages that contain these
+        return f'<span class="math-fallback" data-display="{str(display).lower()}">{html.escape(latex)}</span>'
+
+    def inline_code_attr_html(self, code, attrs):
         """Render inline code with Pandoc-style attributes"""
         import html
-        code = html.escape(token.code)
-        attrs = token.attrs.strip()
-        
+        code = html.escape(code)
+        attrs = attrs.strip()
+
         # Parse attributes: .class, #id, key=value
         classes = []
         id_attr = None
         other_attrs = []
-        
+
         for attr in re.findall(r'\.([^\s\.#]+)|#([^\s\.#]+)|([^\s\.#=]+)=([^\s\.#]+)', attrs):
             if attr[0]:  # .class
                 classes.append(attr[0])
@@ -330,7 +756,7 @@ class ContentRenderer(FrankenRenderer):
                 id_attr = attr[1]
             elif attr[2]:  # key=value
                 other_attrs.append(f'{attr[2]}="{attr[3]}"')
-        
+
         # Build HTML
         html_attrs = []
         if classes:
@@ -338,32 +764,33 @@ class ContentRenderer(FrankenRenderer):
         if id_attr:
             html_attrs.append(f'id="{id_attr}"')
         html_attrs.extend(other_attrs)
-        
+
         attr_str = ' ' + ' '.join(html_attrs) if html_attrs else ''
-        
+
         # Always use <span> for inline code with attributes - the presence of attributes
         # indicates styling/annotation intent rather than code semantics
         tag = 'span'
         return f'<{tag}{attr_str}>{code}</{tag}>'
 
-    def render_block_code(self, token):
-        lang = getattr(token, 'language', '')
-        code = self.render_raw_text(token)
+    def code_block_html(self, code, lang=''):
+        """Render a fenced code block from its raw source; `mermaid` blocks become diagrams"""
+        import html
         if lang == 'mermaid':
+            code = html.escape(code, quote=False)
             # Extract frontmatter from mermaid code block
             frontmatter_pattern = r'^---\s*\n(.*?)\n---\s*\n'
             frontmatter_match = re.match(frontmatter_pattern, code, re.DOTALL)
-            
+
             # Default configuration for mermaid diagrams
             height = 'auto'
             width = '65vw'  # Default to viewport width for better visibility
             min_height = '400px'
             gantt_width = None  # Custom Gantt width override
-            
+
             if frontmatter_match:
                 frontmatter_content = frontmatter_match.group(1)
                 code_without_frontmatter = code[frontmatter_match.end():]
-                
+
                 # Parse YAML-like frontmatter (simple key: value pairs)
                 try:
                     config = {}
@@ -371,14 +798,14 @@ class ContentRenderer(FrankenRenderer):
                         if ':' in line:
                             key, value = line.split(':', 1)
                             config[key.strip()] = value.strip()
-                    
+
                     # Extract height and width if specified
                     if 'height' in config:
                         height = config['height']
                         min_height = height
                     if 'width' in config:
                         width = config['width']
-                    
+
                     # Handle aspect_ratio for Gantt charts
                     if 'aspect_ratio' in config:
                         aspect_value = config['aspect_ratio'].strip()
@@ -390,81 +817,80 @@ class ContentRenderer(FrankenRenderer):
                             else:
                                 # Parse decimal notation (e.g., "1.78", "2.4")
                                 ratio = float(aspect_value)
-                            
+
                             # Calculate Gantt width based on aspect ratio
                             # Base width of 1200, scaled by ratio
                             gantt_width = int(1200 * ratio)
                         except (ValueError, ZeroDivisionError) as e:
-                            print(f"Invalid aspect_ratio format '{aspect_value}': {e}")
+                            logger.warning(f"Invalid aspect_ratio format '{aspect_value}': {e}")
                             gantt_width = None
-                            
+
                 except Exception as e:
-                    print(f"Error parsing mermaid frontmatter: {e}")
-                
+                    logger.warning(f"Error parsing mermaid frontmatter: {e}")
+
                 # Use code without frontmatter for rendering
                 code = code_without_frontmatter
-            
+
             self.mermaid_counter += 1
-            diagram_id = f"mermaid-{abs(hash(code)) & 0xFFFFFF}-{self.mermaid_counter}"
-            
+            diagram_id = f"mermaid-{_content_id(code)}-{self.mermaid_counter}"
+
             # Determine if we need to break out of normal content flow
             # This is required for viewport-based widths to properly center
             break_out = 'vw' in str(width).lower()
-            
+
             # Build container style with proper positioning for viewport widths
             if break_out:
                 container_style = f"width: {width}; position: relative; left: 50%; transform: translateX(-50%);"
             else:
                 container_style = f"width: {width};"
-            
-            # Escape the code for use in data attribute
-            escaped_code = code.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;').replace("'", '&#39;')
-            
+
             # Add custom Gantt width as data attribute if specified
             gantt_data_attr = f' data-gantt-width="{gantt_width}"' if gantt_width else ''
-            
-            return f'''<div class="mermaid-container relative border-4 rounded-md my-4 shadow-2xl" style="{container_style}">
-                <div class="mermaid-controls absolute top-2 right-2 z-10 flex gap-1 bg-white/80 dark:bg-slate-800/80 backdrop-blur-sm rounded">
-                    <button onclick="openMermaidFullscreen('{diagram_id}')" class="px-2 py-1 text-xs border rounded hover:bg-slate-100 dark:hover:bg-slate-700" title="Fullscreen">⛶</button>
-                    <button onclick="resetMermaidZoom('{diagram_id}')" class="px-2 py-1 text-xs border rounded hover:bg-slate-100 dark:hover:bg-slate-700" title="Reset zoom">Reset</button>
-                    <button onclick="zoomMermaidIn('{diagram_id}')" class="px-2 py-1 text-xs border rounded hover:bg-slate-100 dark:hover:bg-slate-700" title="Zoom in">+</button>
-                    <button onclick="zoomMermaidOut('{diagram_id}')" class="px-2 py-1 text-xs border rounded hover:bg-slate-100 dark:hover:bg-slate-700" title="Zoom out">−</button>
-                </div>
-                <div id="{diagram_id}" class="mermaid-wrapper p-4 overflow-hidden flex justify-center items-center" style="min-height: {min_height}; height: {height};" data-mermaid-code="{escaped_code}"{gantt_data_attr}><pre class="mermaid" style="width: 100%; height: 100%; display: flex; align-items: center; justify-content: center;">{code}</pre></div>
-            </div>'''
-        
-        # For other languages: escape HTML/XML for display, but NOT for markdown 
+
+            # Control buttons are handled by a delegated listener in scripts.js
+            return (
+                f'<div class="mermaid-container relative border-4 rounded-md my-4 shadow-2xl" style="{container_style}">'
+                f'<div class="mermaid-controls" data-mermaid-target="{diagram_id}">{_MERMAID_CONTROLS_HTML}</div>'
+                f'<div id="{diagram_id}" class="mermaid-wrapper p-4 overflow-hidden flex justify-center items-center" style="min-height: {min_height}; height: {height};"{gantt_data_attr}>'
+                f'<pre{self.tag_class("pre", "mermaid")} style="width: 100%; height: 100%; display: flex; align-items: center; justify-content: center;">{code}</pre></div>'
+                '</div>'
+            )
+
+        # For other languages: escape HTML/XML for display, but NOT for markdown
         # (markdown code blocks should show raw source)
-        import html
-        raw_code = code
-        code = html.unescape(code)
+        # The copy button reads the code back from <code>, so only unescaped blocks
+        # that may not read back verbatim carry their source separately
+        source_attr = ''
+        lang_class = f'language-{lang} ' if lang else ''
         if lang and lang.lower() != 'markdown':
-            code = html.escape(code)
-        lang_class = f' class="language-{lang}"' if lang else ''
-        icon_html = to_xml(UkIcon("copy", cls="w-4 h-4"))
-        code_id = f"codeblock-{abs(hash(raw_code)) & 0xFFFFFF}"
-        toast_id = f"{code_id}-toast"
-        textarea_id = f"{code_id}-clipboard"
-        escaped_raw = html.escape(raw_code)
+            highlighted = highlight_code(code, lang) if SERVER_HIGHLIGHTING else None
+            if highlighted is not None:
+                code = highlighted
+                lang_class += f'{HIGHLIGHT_CSS_CLASS} '
+            else:
+                code = html.escape(code)
+        elif '<' in code or '&' in code:
+            source_attr = f' data-code="{html.escape(code)}"'
+        # Code inside <pre> takes both the `code` and `pre code` classes
+        code_class = self.tag_class('pre code', lang_class + self.class_map.get('code', ''))
         return (
-            '<div class="code-block relative my-4">'
-            f'<button type="button" class="code-copy-button absolute top-2 right-2 '
-            'inline-flex items-center justify-center rounded border border-slate-200 '
-            'dark:border-slate-700 bg-white/80 dark:bg-slate-900/70 '
-            'text-slate-600 dark:text-slate-300 hover:text-slate-900 '
-            'dark:hover:text-white hover:border-slate-300 dark:hover:border-slate-500 '
-            f'transition-colors" aria-label="Copy code" '
-            f'onclick="(function(){{const el=document.getElementById(\'{textarea_id}\');const toast=document.getElementById(\'{toast_id}\');if(!el){{return;}}el.focus();el.select();const text=el.value;const done=()=>{{if(!toast){{return;}}toast.classList.remove(\'opacity-0\');toast.classList.add(\'opacity-100\');setTimeout(()=>{{toast.classList.remove(\'opacity-100\');toast.classList.add(\'opacity-0\');}},1400);}};if(navigator.clipboard&&window.isSecureContext){{navigator.clipboard.writeText(text).then(done).catch(()=>{{document.execCommand(\'copy\');done();}});}}else{{document.execCommand(\'copy\');done();}}}})()"'
-            '>'
-            f'{icon_html}<span class="sr-only">Copy code</span></button>'
-            f'<div id="{toast_id}" class="absolute top-2 right-10 text-xs bg-slate-900 text-white px-2 py-1 rounded opacity-0 transition-opacity duration-300">Copied</div>'
-            f'<textarea id="{textarea_id}" class="absolute left-[-9999px] top-0 opacity-0 pointer-events-none">{escaped_raw}</textarea>'
-            f'<pre><code{lang_class}>{code}</code></pre>'
+            f'<div class="code-block relative my-4"{source_attr}>'
+            '<button type="button" class="code-copy-button" aria-label="Copy code">'
+            f'{_copy_icon_html()}<span class="sr-only">Copy code</span></button>'
+            f'<pre{self.tag_class("pre")}><code{code_class}>{code}</code></pre>'
             '</div>'
         )
-    
-    def render_link(self, token):
-        href, inner, title = token.target, self.render_inner(token), f' title="{token.title}"' if token.title else ''
+
+    @property
+    def link_root(self):
+        """Blog root used for resolving relative links, looked up once per renderer"""
+        if self._link_root is None:
+            self._link_root = str(get_root_folder())
+        return self._link_root
+
+    def link_open_html(self, href, title=None):
+        """Opening <a> tag for a markdown link, resolving relative links to post URLs"""
+        title = f' title="{title}"' if title else ''
         # ...existing code...
         is_hash = href.startswith('#')
         is_external = href.startswith(('http://', 'https://', 'mailto:', 'tel:', '//'))
@@ -475,29 +901,15 @@ class ContentRenderer(FrankenRenderer):
                 "text-amber-600 dark:text-amber-400 underline underline-offset-2 "
                 "hover:text-amber-800 dark:hover:text-amber-200 font-medium transition-colors"
             )
-            return f'<a href="{href}" class="{link_class}"{title}>{inner}</a>'
+            return f'<a href="{href}"{self.tag_class("a", link_class)}{title}>'
         if is_relative:
-            from pathlib import Path
-            original_href = href
             if href.endswith('.md'):
                 href = href[:-3]
-            if self.current_path:
-                root = get_root_folder().resolve()
-                current_file_full = root / self.current_path
-                current_dir = current_file_full.parent
-                resolved = (current_dir / href).resolve()
-                logger.debug(f"DEBUG: original_href={original_href}, current_path={self.current_path}, current_dir={current_dir}, resolved={resolved}, root={root}")
-                try:
-                    rel_path = resolved.relative_to(root)
-                    href = f'/posts/{rel_path}'
-                    is_absolute_internal = True
-                    logger.debug(f"DEBUG: SUCCESS - rel_path={rel_path}, final href={href}")
-                except ValueError as e:
-                    is_external = True
-                    logger.debug(f"DEBUG: FAILED - ValueError: {e}")
-            else:
+            resolved = _resolve_relative_href(self.link_root, self.current_path, href) if self.current_path else None
+            if resolved is None:
                 is_external = True
-                logger.debug(f"DEBUG: No current_path, treating as external")
+            else:
+                href, is_absolute_internal = resolved, True
         is_internal = is_absolute_internal and '.' not in href.split('/')[-1]
         hx = f' hx-get="{href}" hx-target="#main-content" hx-push-url="true" hx-swap="innerHTML show:window:top"' if is_internal else ''
         ext = '' if (is_internal or is_absolute_internal or is_hash) else ' target="_blank" rel="noopener noreferrer"'
@@ -506,119 +918,696 @@ class ContentRenderer(FrankenRenderer):
             "text-amber-600 dark:text-amber-400 underline underline-offset-2 "
             "hover:text-amber-800 dark:hover:text-amber-200 font-medium transition-colors"
         )
-        return f'<a href="{href}"{hx}{ext} class="{link_class}"{title}>{inner}</a>'
+        return f'<a href="{href}"{hx}{ext}{self.tag_class("a", link_class)}{title}>'
+
+
+class ContentRenderer(ContentMarkup, FrankenRenderer):
+    """Mistletoe renderer producing Bloggy's content HTML"""
+    def __init__(self, *extras, img_dir=None, footnotes=None, current_path=None, class_map=None, tab_data_store=None, **kwargs):
+        super().__init__(*extras, img_dir=img_dir, **kwargs)
+        self.class_map = CONTENT_CLASS_MAP if class_map is None else class_map
+        self.begin_document(img_dir, footnotes, current_path, tab_data_store)
+
+    def begin_document(self, img_dir=None, footnotes=None, current_path=None, tab_data_store=None):
+        """Set the renderer up for a new document, so one instance can render many (see `pooled_renderer`)"""
+        self.img_dir = img_dir
+        self.footnotes = footnotes or {}
+        self.tab_data_store = tab_data_store or {}  # Tab groups to render in place of their placeholders
+        self._open_footnotes = set()  # Sidenotes currently being rendered, guards self-references
+        self.current_path = current_path  # Current post path for resolving relative links and images
+        self.toc = []  # (level, text, anchor) for every heading rendered, in document order
+        self._suppress_ptag_stack = [False]
+        self._link_root = None
+        self.reset_document_state()
+
+    def render_fragment(self, content):
+        return self.render(_parse_document(content))
+
+    def render_html_block(self, token):
+        return self.block_placeholders_html(token.content)
+
+    def render_paragraph(self, token):
+        if self._suppress_ptag_stack[-1]:
+            return self.render_inner(token)
+        return f'<p{self.tag_class("p")}>{self.render_inner(token)}</p>'
+
+    def render_quote(self, token):
+        elements = [f'<blockquote{self.tag_class("blockquote")}>']
+        self._suppress_ptag_stack.append(False)
+        elements.extend([self.render(child) for child in token.children])
+        self._suppress_ptag_stack.pop()
+        elements.append('</blockquote>')
+        return '\n'.join(elements)
+
+    def render_list(self, token):
+        if token.start is not None:
+            tag = 'ol'
+            attr = f' start="{token.start}"' if token.start != 1 else ''
+        else:
+            tag, attr = 'ul', ''
+        self._suppress_ptag_stack.append(not token.loose)
+        inner = '\n'.join([self.render(child) for child in token.children])
+        self._suppress_ptag_stack.pop()
+        return f'<{tag}{attr}{self.tag_class(tag)}>\n{inner}\n</{tag}>'
+
+    def render_table(self, token):
+        head = f'<thead>\n{self.render_table_row(token.header, is_header=True)}</thead>\n' if hasattr(token, 'header') else ''
+        return f'<table{self.tag_class("table")}>\n{head}<tbody>\n{self.render_inner(token)}</tbody>\n</table>'
+
+    def render_table_cell(self, token, in_header=False):
+        tag = 'th' if in_header else 'td'
+        align = {None: 'left', 0: 'center', 1: 'right'}[token.align]
+        return f'<{tag} align="{align}"{self.tag_class(tag)}>{self.render_inner(token)}</{tag}>\n'
+
+    def render_thematic_break(self, token):
+        return f'<hr{self.tag_class("hr")}>'
+
+    def render_inline_code(self, token):
+        return f'<code{self.tag_class("code")}>{self.escape_html_text(token.children[0].content)}</code>'
+
+    def render_image(self, token):
+        """Render images, resolving relative paths against `img_dir`"""
+        alt = token.children[0].content if token.children else ''
+        return self.image_html(token.src, alt, token.title if hasattr(token, 'title') else None)
+
+    def render_auto_link(self, token):
+        target = f'mailto:{token.target}' if token.mailto else self.escape_url(token.target)
+        return f'<a href="{target}"{self.tag_class("a")}>{self.render_inner(token)}</a>'
+
+    def render_list_item(self, token):
+        """Render list items with task list checkbox support"""
+        return self.list_item_html(self.render_inner(token))
+
+    def render_youtube_embed(self, token):
+        return self.youtube_html(token.video_id, getattr(token, 'caption', None))
+
+    def render_footnote_ref(self, token):
+        return self.sidenote_html(token.target)
+
+    def render_heading(self, token):
+        """Render headings with anchor IDs for TOC linking"""
+        return self.heading_html(token.level, self.render_inner(token))
+
+    def render_superscript(self, token):
+        """Render superscript text"""
+        return f'<sup>{token.content}</sup>'
+
+    def render_subscript(self, token):
+        """Render subscript text"""
+        return f'<sub>{token.content}</sub>'
+
+    def render_math_expression(self, token):
+        return self.math_html(token.latex, token.display)
+
+    def render_strikethrough(self, token):
+        """Render strikethrough text"""
+        inner = self.render_inner(token)
+        return f'<del>{inner}</del>'
+
+    def render_inline_code_attr(self, token):
+        return self.inline_code_attr_html(token.code, token.attrs)
+
+    def render_block_code(self, token):
+        return self.code_block_html(token.content, getattr(token, 'language', ''))
+
+    def render_link(self, token):
+        return f'{self.link_open_html(token.target, token.title)}{self.render_inner(token)}</a>'
 
 
-def postprocess_tabs(html, tab_data_store, img_dir, current_path, footnotes):
-    """Replace tab placeholders with fully rendered tab HTML"""
-    import hashlib
+def render_tab_group(tab_id, tabs, renderer):
+    """Build the HTML for one tab group, rendering each panel with `renderer`"""
+    html_parts = [f'<div class="tabs-container" data-tabs-id="{tab_id}">']
     
-    for tab_id, tabs in tab_data_store.items():
-        # Build HTML for this tab group
-        html_parts = [f'<div class="tabs-container" data-tabs-id="{tab_id}">']
-        
-        # Tab buttons
-        html_parts.append('<div class="tabs-header">')
-        for i, (title, _) in enumerate(tabs):
-            active = 'active' if i == 0 else ''
-            html_parts.append(f'<button class="tab-button {active}" onclick="switchTab(\'{tab_id}\', {i})">{title}</button>')
-        html_parts.append('</div>')
-        
-        # Tab content panels
-        html_parts.append('<div class="tabs-content">')
-        for i, (_, tab_content) in enumerate(tabs):
-            active = 'active' if i == 0 else ''
-            # Render each tab's content as fresh markdown
-            with ContentRenderer(YoutubeEmbed, InlineCodeAttr, Strikethrough, FootnoteRef, Superscript, Subscript, img_dir=img_dir, footnotes=footnotes, current_path=current_path) as renderer:
-                doc = mst.Document(tab_content)
-                rendered = renderer.render(doc)
-            html_parts.append(f'<div class="tab-panel {active}" data-tab-index="{i}">{rendered}</div>')
-        html_parts.append('</div>')
-        
-        html_parts.append('</div>')
-        tab_html = '\n'.join(html_parts)
-        
-        # Replace placeholder with rendered tab HTML
-        placeholder = f'<div class="tab-placeholder" data-tab-id="{tab_id}"></div>'
-        html = html.replace(placeholder, tab_html)
+    # Tab buttons
+    html_parts.append('<div class="tabs-header">')
+    for i, (title, _) in enumerate(tabs):
+        active = 'active' if i == 0 else ''
+        html_parts.append(f'<button class="tab-button {active}" onclick="switchTab(\'{tab_id}\', {i})">{title}</button>')
+    html_parts.append('</div>')
     
-    return html
+    # Tab content panels
+    html_parts.append('<div class="tabs-content">')
+    for i, (_, tab_content) in enumerate(tabs):
+        active = 'active' if i == 0 else ''
+        # Each panel is rendered as a fresh markdown document
+        rendered = renderer.render_subdocument(tab_content)
+        html_parts.append(f'<div class="tab-panel {active}" data-tab-index="{i}">{rendered}</div>')
+    html_parts.append('</div>')
+    
+    html_parts.append('</div>')
+    return '\n'.join(html_parts)
+
+def _use_server_highlighting():
+    if get_config().get_code_highlighting() != 'server':
+        return False
+    if not pygments_available():
+        logger.warning("code_highlighting = 'server' needs Pygments (pip install pygments); using highlight.js")
+        return False
+    return True
+
+def _use_server_math():
+    if get_config().get_math_rendering() != 'server':
+        return False
+    if not mathml_available():
+        logger.warning("math_rendering = 'server' needs latex2mathml (pip install latex2mathml); using KaTeX")
+        return False
+    return True
+
+def _use_responsive_images():
+    return get_config().get_responsive_images() and pillow_available()
+
+# Decided once at import, like `hdrs`, which drops highlight.js / KaTeX in server mode
+SERVER_HIGHLIGHTING = _use_server_highlighting()
+SERVER_MATH = _use_server_math()
+RESPONSIVE_IMAGES = _use_responsive_images()
+
+def _local_image_file(src):
+    """File under the blog root served at the `/posts/...` URL `src`, or None"""
+    if not src.startswith('/posts/'):
+        return None
+    rel = os.path.normpath(unquote(src[len('/posts/'):].split('?', 1)[0].split('#', 1)[0]))
+    if rel.startswith(('..', '/')) or rel == '.':
+        return None
+    return get_root_folder() / rel
+
+def _responsive_image_attrs(src):
+    """`width`/`height` and, for large images, `srcset`/`sizes` attributes of the local image at `src`"""
+    if not RESPONSIVE_IMAGES:
+        return ''
+    path = _local_image_file(src)
+    info = image_info(path) if path is not None else None
+    if info is None:
+        return ''
+    attrs = f' width="{info.width}" height="{info.height}"'
+    widths = variant_widths(info.width, get_config().get_image_widths())
+    if len(widths) > 1:
+        # Versioned like the raw markdown, so variants of an unchanged image can be cached
+        base = src.split('?', 1)[0]
+        srcset = ', '.join(f'{base}?w={width}&amp;v={info.mtime_ns} {width}w' for width in widths)
+        attrs += f' srcset="{srcset}" sizes="{IMAGE_SIZES}"'
+    return attrs
+
+_image_variants = None
+
+def get_image_variants():
+    """Process-wide store of resized post images (see `bloggy.images`)"""
+    global _image_variants
+    if _image_variants is None:
+        _image_variants = ImageVariants(get_config().get_image_cache_dir())
+    return _image_variants
+
+_pdf_previews = None
+
+def get_pdf_previews():
+    """Process-wide store of rendered PDF first pages (see `bloggy.pdf_preview`)"""
+    global _pdf_previews
+    if _pdf_previews is None:
+        _pdf_previews = PdfPreviews(get_config().get_image_cache_dir() / 'pdf')
+    return _pdf_previews
+
+_render_cache = None
+
+def get_render_cache():
+    """Process-wide cache of rendered post HTML (see `bloggy.render_cache`)"""
+    global _render_cache
+    if _render_cache is None:
+        config = get_config()
+        cache_dir = config.get_render_cache_dir()
+        disk = DiskRenderCache(cache_dir, config.get_render_cache_dir_max_bytes()) if cache_dir else None
+        _render_cache = RenderCache(config.get_render_cache_max_bytes(), disk=disk)
+    return _render_cache
+
+_block_cache = None
+
+def get_block_cache():
+    """Process-wide cache of rendered top-level blocks, or None when disabled"""
+    global _block_cache
+    if _block_cache is None:
+        max_bytes = get_config().get_render_block_cache_max_bytes()
+        _block_cache = RenderCache(max_bytes) if max_bytes else False
+    # An empty RenderCache is falsy, so test for the disabled marker itself
+    return None if _block_cache is False else _block_cache
+
+def _render_variant():
+    """Name of the render options in effect that change the HTML, for cache keys"""
+    engine = get_markdown_engine().name
+    options = ((engine, engine != DEFAULT_ENGINE), ('pygments', SERVER_HIGHLIGHTING), ('mathml', SERVER_MATH),
+               ('srcset', RESPONSIVE_IMAGES))
+    return '+'.join(name for name, on in options if on)
+
+_embed_graph = None
+
+def get_embed_graph():
+    """Process-wide graph of which posts embed which (see `bloggy.transclusion`)"""
+    global _embed_graph
+    root = get_root_folder()
+    if _embed_graph is None or _embed_graph.root != root:
+        _embed_graph = EmbedGraph(root)
+    return _embed_graph
+
+def _image_files(sources, img_dir):
+    """{path: mtime_ns} of the local image files `sources` point at, resolved like `image_html` does
+
+    Missing files count with mtime 0, so adding one changes the stamp.
+    """
+    files = {}
+    for src in sources:
+        if img_dir and not src.startswith(('http://', 'https://', '/', 'attachment:', 'blob:', 'data:')):
+            src = f'{Path(img_dir)}/{src}'
+        path = _local_image_file(src)
+        if path is None:
+            continue
+        try:
+            files[str(path)] = path.stat().st_mtime_ns
+        except OSError:
+            files[str(path)] = 0
+    return files
+
+def _image_stamp(content, current_path, img_dir, embeds=False):
+    """Digest of the image files `content` shows (and, with `embeds`, the notes it embeds show), or ''
+
+    With responsive images on, HTML carries each local image's size and a
+    `srcset` versioned by its mtime, so it changes when an image file does.
+    """
+    if not RESPONSIVE_IMAGES:
+        return ''
+    files = _image_files(image_sources(content), img_dir)
+    if embeds:
+        graph = get_embed_graph()
+        for path, _ in graph.dependencies(content, current_path):
+            if not path.startswith('?'):
+                files.update(_image_files(graph.images(path), _post_img_dir(None, path)))
+    if not files:
+        return ''
+    return hashlib.blake2b(repr(sorted(files.items())).encode('utf-8'), digest_size=8).hexdigest()
+
+def _post_variant(content, current_path, img_dir):
+    """`_render_variant()` plus stamps of the notes `content` embeds and the images it shows, whose edits change its HTML"""
+    variant = _render_variant()
+    embeds = '![[' in content
+    if embeds:
+        stamp = get_embed_graph().stamp(content, current_path)
+        if stamp:
+            variant = f'{variant}+embeds-{stamp}'
+    images = _image_stamp(content, current_path, img_dir, embeds=embeds)
+    return f'{variant}+images-{images}' if images else variant
+
+def _md_div(html):
+    return Div(Link(rel="stylesheet", href="/static/sidenote.css"), NotStr(html), cls="w-full")
 
 def from_md(content, img_dir=None, current_path=None):
-    # Resolve img_dir from current_path if not explicitly provided
+    html, _ = render_markdown(content, img_dir=img_dir, current_path=current_path)
+    return _md_div(html)
+
+def from_md_with_toc(content, img_dir=None, current_path=None, persist=True):
+    """Like `from_md`, but also return the (level, text, anchor) headings for the TOC"""
+    html, toc = render_markdown(content, img_dir=img_dir, current_path=current_path, persist=persist)
+    return _md_div(html), toc
+
+def _post_img_dir(img_dir, current_path):
+    """Resolve img_dir from current_path if not explicitly provided"""
     if img_dir is None and current_path:
         # Convert current_path to URL path for images (e.g., demo/books/flat-land/chapter-01 -> /posts/demo/books/flat-land)
-        from pathlib import Path
         path_parts = Path(current_path).parts
         if len(path_parts) > 1:
             img_dir = '/posts/' + '/'.join(path_parts[:-1])
         else:
             img_dir = '/posts'
+    return img_dir
+
+def render_markdown(content, img_dir=None, current_path=None, persist=True):
+    """Render markdown to (html, toc), going through the render cache
+
+    With `persist` off, a new render is kept in memory only, not in the disk tier.
+    """
+    img_dir = _post_img_dir(img_dir, current_path)
+
+    # Rendered HTML only depends on the source, the post location and the renderer itself
+    cache = get_render_cache()
+    key = render_cache_key(content, current_path, img_dir, variant=_post_variant(content, current_path, img_dir))
+    cached = cache.get(key)
+    if cached is None:
+        # An edited post only re-renders the blocks that changed
+        html, toc = _render_md_html(content, img_dir, current_path, block_cache=get_block_cache())
+        cache.set(key, (html, tuple(toc)), persist=persist)
+        return html, toc
+    logger.debug(f"[DEBUG] from_md CACHE HIT for {current_path}")
+    html, toc = cached
+    # Entries read back from the disk cache come as JSON lists
+    return html, [tuple(heading) for heading in toc]
+
+def iter_render_markdown(content, img_dir=None, current_path=None):
+    """Yield the HTML of `content` in top-level chunks as they render, for streaming
+
+    A cached render comes back as a single chunk; otherwise the joined chunks are
+    cached like `render_markdown` caches them.
+    """
+    img_dir = _post_img_dir(img_dir, current_path)
+    cache = get_render_cache()
+    key = render_cache_key(content, current_path, img_dir, variant=_post_variant(content, current_path, img_dir))
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached[0]
+        return
+    parts, toc = [], []
+    for html, headings in _iter_md_html(content, img_dir, current_path):
+        parts.append(html)
+        toc.extend(headings)
+        yield html
+    cache.set(key, (''.join(parts), tuple(toc)))
+
+def _section_plan(content, engine, key):
+    """(sections, footnotes, tab_data_store) of `content`, kept in the block cache under `key`"""
+    block_cache = get_block_cache()
+    plan = block_cache.get(key) if block_cache is not None else None
+    if plan is None:
+        body, footnotes, tab_data_store = preprocess_markdown(content)
+        plan = (tuple(engine.split_sections(body)), footnotes, tab_data_store)
+        if block_cache is not None:
+            block_cache.set(key, plan)
+    return plan
+
+def render_sections(content, start, stop, img_dir=None, current_path=None):
+    """Return the HTML of sections `start` to `stop` of `content` and its number of sections
+
+    Joined, every section of a post equals `render_markdown`'s HTML. Each
+    section is cached in the render cache with the document state it ends
+    in, so a section renders without re-rendering the ones before it.
+    """
+    img_dir = _post_img_dir(img_dir, current_path)
+    engine = get_markdown_engine()
+    # The source is hashed once; section i is cached under this key plus i
+    base_key = render_cache_key(content, current_path, img_dir, variant=f'{_post_variant(content, current_path, img_dir)}/sections')
+    def key(i):
+        return (*base_key, i)
+    sections, footnotes, tab_data_store = _section_plan(content, engine, base_key)
+    stop = min(stop, len(sections))
+    cache = get_render_cache()
+
+    # Continue from the closest earlier section that is cached
+    first, state = start, None
+    while first > 0:
+        entry = cache.get(key(first - 1))
+        if entry is not None:
+            state = entry[1]
+            break
+        first -= 1
+    parts = []
+    while first < stop and (entry := cache.get(key(first))) is not None:
+        html, state = entry
+        if first >= start:
+            parts.append(html)
+        first += 1
+    if first < stop:
+        rendered = engine.render_sections(sections[first:stop], footnotes, tab_data_store, state=state,
+                                          img_dir=img_dir, current_path=current_path)
+        for i, (html, state) in enumerate(rendered, first):
+            if SERVER_MATH:
+                html = html.replace(_DOLLAR_PLACEHOLDER, '$')
+            cache.set(key(i), (html, state))
+            if i >= start:
+                parts.append(html)
+    return ''.join(parts), len(sections)
+
+def split_blocks(content):
+    """Split preprocessed markdown into its top-level blocks, each with its trailing blank lines
+
+    Uses mistletoe's block-level pass (no inline parsing), so it must run while a
+    renderer's tokens are registered. Documents with link reference definitions,
+    which resolve across the whole document, come back as a single block.
+    """
+    blocks = _typed_blocks(content)
+    return [block for _, block in blocks] if blocks else [content]
+
+def _typed_blocks(content):
+    """(block token type, source) for each top-level block, as `split_blocks` splits them, or None"""
+    lines = [line if line.endswith('\n') else f'{line}\n' for line in content.splitlines(keepends=True)]
+    root = SimpleNamespace(footnotes={})  # Stands in for the Document that collects link references
+    with _parse_lock:
+        mst_token._root_node = root
+        try:
+            parsed = block_tokenizer.tokenize_block(lines, mst.block_token._token_types)
+        finally:
+            mst_token._root_node = None
+    if root.footnotes or len(parsed) < 2:
+        return None
+    starts = [line_number - 1 for _, _, line_number in parsed]
+    starts[0] = 0
+    return [(token_type, ''.join(lines[a:b])) for (token_type, _, _), a, b in zip(parsed, starts, starts[1:] + [len(lines)])]
+
+def split_sections(content):
+    """Group the top-level blocks of preprocessed markdown into sections for progressive loading
+
+    A section ends before a level 1 or 2 heading once it holds `_SECTION_MIN_BYTES`
+    of source, or before any block once it holds `_CHUNK_SOURCE_BYTES`, so posts
+    without headings split too. Like `split_blocks`, it needs the tokens registered.
+    """
+    blocks = _typed_blocks(content)
+    if not blocks:
+        return [content]
+    sections, group, size = [], [], 0
+    for token_type, block in blocks:
+        heading = token_type is mst.block_token.SetextHeading or (
+            token_type is mst.block_token.Heading and not block.lstrip().startswith('###'))
+        if group and (size >= _CHUNK_SOURCE_BYTES or (heading and size >= _SECTION_MIN_BYTES)):
+            sections.append(''.join(group))
+            group, size = [], 0
+        group.append(block)
+        size += len(block)
+    sections.append(''.join(group))
+    return sections
+
+class _ReadTrackingDict(dict):
+    """Dict that remembers the value each key had the first time `get` read it"""
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.reads = {}
+
+    def get(self, key, default=None):
+        if key not in self.reads:
+            self.reads[key] = dict.get(self, key)
+        return dict.get(self, key, default)
+
+# A rendered block plus the document state it read and changed. `fn_in` / `mermaid_in`
+# are None when the block's output does not depend on those counters
+_BlockRender = namedtuple('_BlockRender', 'html toc fn_in fn_delta mermaid_in mermaid_delta counts_read counts_delta notes_read')
+
+def _render_chunk(renderer, block):
+    # Joined like render_document joins the children of a whole document
+    return ''.join(f'{renderer.render(child)}\n' for child in _parse_document(block).children)
+
+def _render_block(renderer, block):
+    counts, notes = renderer.heading_counts, renderer.footnotes
+    counts.reads, notes.reads = {}, {}
+    fn_in, mermaid_in, toc_len = renderer.fn_counter, renderer.mermaid_counter, len(renderer.toc)
+    html = _render_chunk(renderer, block)
+    fn_delta, mermaid_delta = renderer.fn_counter - fn_in, renderer.mermaid_counter - mermaid_in
+    counts_read = tuple(counts.reads.items())
+    return _BlockRender(
+        html, tuple(renderer.toc[toc_len:]),
+        fn_in if fn_delta else None, fn_delta,
+        mermaid_in if mermaid_delta else None, mermaid_delta,
+        counts_read, tuple((k, dict.get(counts, k, 0) - (v or 0)) for k, v in counts_read),
+        tuple(notes.reads.items()),
+    )
+
+def _reuse_block(renderer, entry):
+    """Apply a cached block's effects if it was rendered from the current state; return its HTML or None"""
+    counts, notes = renderer.heading_counts, renderer.footnotes
+    if entry.fn_in is not None and entry.fn_in != renderer.fn_counter:
+        return None
+    if entry.mermaid_in is not None and entry.mermaid_in != renderer.mermaid_counter:
+        return None
+    if any(dict.get(counts, k) != v for k, v in entry.counts_read):
+        return None
+    if any(dict.get(notes, k) != v for k, v in entry.notes_read):
+        return None
+    for k, delta in entry.counts_delta:
+        counts[k] = dict.get(counts, k, 0) + delta
+    renderer.fn_counter += entry.fn_delta
+    renderer.mermaid_counter += entry.mermaid_delta
+    renderer.toc.extend(entry.toc)
+    return entry.html
+
+def _render_blocks(renderer, content, block_cache, current_path=None, img_dir=None):
+    """Render `content` one top-level chunk at a time, reusing cached chunks whose inputs are unchanged
+
+    A chunk is reused when its source is unchanged and the state it read when it was
+    rendered (sidenote and diagram counters, heading anchor counts, footnote
+    definitions) still matches, so its HTML is identical to a full render.
+    """
+    blocks = split_blocks(content)
+    if len(blocks) < 2:
+        return renderer.render(_parse_document(content))
+    renderer.heading_counts = _ReadTrackingDict(renderer.heading_counts)
+    renderer.footnotes = _ReadTrackingDict(renderer.footnotes)
+    variant = _render_variant()
+    # An embed's HTML comes from another file, which a block's source doesn't capture
+    embedding = ['embed-placeholder'] + [_tab_placeholder(tab_id) for tab_id, tabs in renderer.tab_data_store.items()
+                                         if any('embed-placeholder' in body for _, body in tabs)]
+    parts = []
+    for block in blocks:
+        if any(marker in block for marker in embedding):
+            parts.append(_render_chunk(renderer, block))
+            continue
+        images = _image_stamp(block, current_path, img_dir)
+        key = render_cache_key(block, current_path, img_dir, variant=f'{variant}+images-{images}' if images else variant)
+        entry = block_cache.get(key)
+        html = _reuse_block(renderer, entry) if entry is not None else None
+        if html is None:
+            entry = _render_block(renderer, block)
+            block_cache.set(key, entry)
+            html = entry.html
+        parts.append(html)
+    return ''.join(parts)
+
+def _content_tokens():
+    """Bloggy's span tokens, in the order they are registered with mistletoe"""
+    return (YoutubeEmbed, InlineCodeAttr, Strikethrough, FootnoteRef, Superscript, Subscript,
+            *((MathExpression,) if SERVER_MATH else ()))
+
+# mistletoe keeps parse state in module globals and token class attributes,
+# so documents are parsed one at a time; rendering the parsed tokens is not locked
+_parse_lock = threading.Lock()
+
+def _parse_document(content):
+    """Parse markdown into a mistletoe Document, holding the parse lock"""
+    with _parse_lock:
+        return mst.Document(content)
+
+_token_lock = threading.Lock()
+_token_types = None  # Copies of mistletoe's (block, span) token lists with Bloggy's tokens registered
+
+def _new_pooled_renderer():
+    """A ContentRenderer that uses Bloggy's tokens, registering them with mistletoe once per process
+
+    Renderers built with extras register them in mistletoe's global token
+    lists, and leaving a `with` block resets the lists. Pooled renderers
+    don't: the tokens are registered once and stay, and every renderer after
+    the first maps them to its render methods without touching the lists,
+    so threads never change the lists another thread is parsing with.
+    """
+    global _token_types
+    with _token_lock:
+        if _token_types is None:
+            renderer = ContentRenderer(*_content_tokens())
+            _token_types = tuple(mst.block_token._token_types), tuple(mst.span_token._token_types)
+            return renderer
+    renderer = ContentRenderer(process_html_tokens=False)
+    for token in (mst.block_token.HtmlBlock, mst.span_token.HtmlSpan, *_content_tokens()):
+        renderer.render_map[token.__name__] = getattr(renderer, renderer._cls_to_func(token.__name__))
+    return renderer
+
+class _RendererPool(threading.local):
+    def __init__(self):
+        self.idle = []
+
+_renderer_pool = _RendererPool()
+
+@contextmanager
+def pooled_renderer(img_dir=None, footnotes=None, current_path=None, tab_data_store=None):
+    """A ContentRenderer from this thread's pool, set up for a new document
+
+    Renderers are built once per thread and reset between documents instead
+    of being built, with their tokens registered, for every render. Nested
+    renders take another renderer from the pool.
+    """
+    if _token_types is not None and (tuple(mst.block_token._token_types), tuple(mst.span_token._token_types)) != _token_types:
+        # Another renderer changed mistletoe's token lists, e.g. by leaving a `with` block
+        mst.block_token._token_types, mst.span_token._token_types = map(list, _token_types)
+    idle = _renderer_pool.idle
+    renderer = idle.pop() if idle else _new_pooled_renderer()
+    renderer.begin_document(img_dir, footnotes, current_path, tab_data_store)
+    try:
+        yield renderer
+    finally:
+        idle.append(renderer)
+
+# Markdown source per streamed chunk; consecutive top-level blocks render together
+_CHUNK_SOURCE_BYTES = 32 * 1024
+# Smallest progressively loaded section that a heading starts a new one after
+_SECTION_MIN_BYTES = 4 * 1024
+
+@register_engine
+class MistletoeEngine(MarkdownEngine):
+    """The reference engine: mistletoe with Bloggy's span tokens and `ContentRenderer`"""
+    name = 'mistletoe'
+
+    def render(self, content, footnotes, tab_data_store, img_dir=None, current_path=None, block_cache=None):
+        # Tab groups render in place of their placeholders
+        with pooled_renderer(img_dir, footnotes, current_path, tab_data_store) as renderer:
+            if block_cache is None:
+                html = renderer.render(_parse_document(content))
+            else:
+                html = _render_blocks(renderer, content, block_cache, current_path, img_dir)
+        return html, renderer.toc
+
+    def render_chunks(self, content, footnotes, tab_data_store, img_dir=None, current_path=None):
+        with pooled_renderer(img_dir, footnotes, current_path, tab_data_store) as renderer:
+            blocks = split_blocks(content)
+            if len(blocks) < 2:
+                yield renderer.render(_parse_document(content)), renderer.toc
+                return
+            # The first block goes out alone; the rest are grouped so each chunk is worth sending
+            group, size = [], 0
+            for i, block in enumerate(blocks):
+                group.append(block)
+                size += len(block)
+                if i == 0 or size >= _CHUNK_SOURCE_BYTES or i == len(blocks) - 1:
+                    toc_len = len(renderer.toc)
+                    html = _render_chunk(renderer, ''.join(group))
+                    yield html, renderer.toc[toc_len:]
+                    group, size = [], 0
+
+    def split_sections(self, content):
+        with pooled_renderer():
+            return split_sections(content)
+
+    def render_sections(self, sections, footnotes, tab_data_store, state=None, img_dir=None, current_path=None):
+        with pooled_renderer(img_dir, footnotes, current_path, tab_data_store) as renderer:
+            if state is not None:
+                renderer.restore_document_state(state)
+            for section in sections:
+                html = _render_chunk(renderer, section)
+                yield html, renderer.document_state()
+
+_markdown_engine = None
+
+def get_markdown_engine():
+    """The engine selected by `markdown_engine`, falling back to mistletoe"""
+    global _markdown_engine
+    if _markdown_engine is None:
+        name = get_config().get_markdown_engine()
+        engine = get_engine(name)
+        if engine is None:
+            logger.warning(f"markdown_engine = {name!r} is unknown or not installed (choose from {', '.join(engine_names())}); using mistletoe")
+            engine = MistletoeEngine()
+        _markdown_engine = engine
+    return _markdown_engine
+
+def _render_md_html(content, img_dir=None, current_path=None, block_cache=None, engine=None):
+    """Run the full markdown pipeline and return the styled HTML and the TOC headings
+
+    With a `block_cache`, unchanged top-level blocks are reused instead of re-rendered.
+    `engine` overrides the configured markdown engine.
+    """
+    content, footnotes, tab_data_store = preprocess_markdown(content)
+    engine = engine or get_markdown_engine()
+    html, toc = engine.render(content, footnotes, tab_data_store, img_dir=img_dir, current_path=current_path, block_cache=block_cache)
+    if SERVER_MATH:
+        # No client-side pass restores escaped dollars when KaTeX isn't loaded
+        html = html.replace(_DOLLAR_PLACEHOLDER, '$')
     
-    def _protect_escaped_dollar(md):
-        import re
-        # Protect fenced code blocks first
-        code_blocks = []
-        def repl(m):
-            code_blocks.append(m.group(0))
-            return f"__BLOGGY_CODEBLOCK_{len(code_blocks)-1}__"
-        md = re.sub(r'(```+|~~~+)[\s\S]*?\1', repl, md)
-        # Protect inline code spans (including multi-backtick)
-        def repl_inline(m):
-            code_blocks.append(m.group(0))
-            return f"__BLOGGY_CODEBLOCK_{len(code_blocks)-1}__"
-        md = re.sub(r'(`+)([^`]*?)\1', repl_inline, md)
-        # Replace escaped dollars with a placeholder to avoid KaTeX auto-render
-        def replace_escaped_dollar(m):
-            slashes = m.group(1)
-            # Remove one escaping backslash, keep the rest literal
-            return '\\' * (len(slashes) - 1) + '@@BLOGGY_DOLLAR@@'
-        md = re.sub(r'(\\+)\$', replace_escaped_dollar, md)
-        # Restore code blocks/spans
-        for i, block in enumerate(code_blocks):
-            md = md.replace(f"__BLOGGY_CODEBLOCK_{i}__", block)
-        return md
-
-    content = _protect_escaped_dollar(content)
-    content, footnotes = extract_footnotes(content)
-    content = preprocess_super_sub(content)  # Preprocess superscript/subscript
-    content, tab_data_store = preprocess_tabs(content)  # Preprocess tabs and get tab data
-
-    # Preprocess: convert single newlines within paragraphs to '  \n' (markdown softbreak)
-    # This preserves double newlines (paragraphs) and code blocks
-    def _preserve_newlines(md):
-        import re
-        # Don't touch code blocks (fenced or indented)
-        code_block = re.compile(r'(```+|~~~+)[\s\S]*?\1', re.MULTILINE)
-        blocks = []
-        def repl(m):
-            blocks.append(m.group(0))
-            return f"__CODEBLOCK_{len(blocks)-1}__"
-        md = code_block.sub(repl, md)
-        # Replace single newlines not preceded/followed by another newline with '  \n'
-        md = re.sub(r'(?<!\n)\n(?!\n)', '  \n', md)
-        # Restore code blocks
-        for i, block in enumerate(blocks):
-            md = md.replace(f"__CODEBLOCK_{i}__", block)
-        return md
-    content = _preserve_newlines(content)
-
-    mods = {'pre': 'my-4', 'p': 'text-base leading-relaxed mb-6', 'li': 'text-base leading-relaxed',
-            'ul': 'uk-list uk-list-bullet space-y-2 mb-6 ml-6 text-base', 'ol': 'uk-list uk-list-decimal space-y-2 mb-6 ml-6 text-base', 
-            'hr': 'border-t border-border my-8', 'h1': 'text-3xl font-bold mb-6 mt-8', 'h2': 'text-2xl font-semibold mb-4 mt-6', 
-            'h3': 'text-xl font-semibold mb-3 mt-5', 'h4': 'text-lg font-semibold mb-2 mt-4',
-            'table': 'uk-table uk-table-striped uk-table-hover uk-table-divider uk-table-middle my-6'}
-    
-    # Register custom tokens with renderer context manager
-    with ContentRenderer(YoutubeEmbed, InlineCodeAttr, Strikethrough, FootnoteRef, Superscript, Subscript, img_dir=img_dir, footnotes=footnotes, current_path=current_path) as renderer:
-        doc = mst.Document(content)
-        html = renderer.render(doc)
-    
-    # Post-process: replace tab placeholders with rendered tabs
-    if tab_data_store:
-        html = postprocess_tabs(html, tab_data_store, img_dir, current_path, footnotes)
-    
-    return Div(Link(rel="stylesheet", href="/static/sidenote.css"), NotStr(apply_classes(html, class_map_mods=mods)), cls="w-full")
+    return html, toc
+
+def _iter_md_html(content, img_dir=None, current_path=None, engine=None):
+    """Like `_render_md_html`, but yield (html, toc) chunk by chunk as the document renders"""
+    content, footnotes, tab_data_store = preprocess_markdown(content)
+    engine = engine or get_markdown_engine()
+    for html, toc in engine.render_chunks(content, footnotes, tab_data_store, img_dir=img_dir, current_path=current_path):
+        if SERVER_MATH:
+            html = html.replace(_DOLLAR_PLACEHOLDER, '$')
+        yield html, toc
 
 # App configuration
 def get_root_folder(): return get_config().get_root_folder()
@@ -630,7 +1619,8 @@ def get_favicon_href():
     return "/static/favicon.png"
 
 hdrs = (
-    *Theme.slate.headers(highlightjs=True),
+    *Theme.slate.headers(highlightjs=not SERVER_HIGHLIGHTING),
+    *([Style(highlight_css())] if SERVER_HIGHLIGHTING else []),
     Link(rel="icon", href=get_favicon_href()),
     Script(src="https://unpkg.com/hyperscript.org@0.9.12"),
     Script(src="https://cdn.jsdelivr.net/npm/mermaid@11/dist/mermaid.esm.min.mjs", type="module"),
@@ -721,48 +1711,51 @@ hdrs = (
         });
     """),
     Script(src="/static/scripts.js", type='module'),
-    Link(rel="stylesheet", href="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.css"),
-    Script(src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.js"),
-    Script(src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/contrib/auto-render.min.js"),
-    Script("""
-        function replaceEscapedDollarPlaceholders(root) {
-            const placeholder = '@@BLOGGY_DOLLAR@@';
-            const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
-            const nodes = [];
-            let node;
-            while ((node = walker.nextNode())) {
-                if (node.nodeValue && node.nodeValue.includes(placeholder)) {
-                    nodes.push(node);
+    # KaTeX typesets math in the browser unless it is rendered to MathML server-side
+    *(() if SERVER_MATH else (
+        Link(rel="stylesheet", href="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.css"),
+        Script(src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.js"),
+        Script(src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/contrib/auto-render.min.js"),
+        Script("""
+            function replaceEscapedDollarPlaceholders(root) {
+                const placeholder = '@@BLOGGY_DOLLAR@@';
+                const walker = document.createTreeWalker(root, NodeFilter.SHOW_TEXT);
+                const nodes = [];
+                let node;
+                while ((node = walker.nextNode())) {
+                    if (node.nodeValue && node.nodeValue.includes(placeholder)) {
+                        nodes.push(node);
+                    }
                 }
+                nodes.forEach((textNode) => {
+                    textNode.nodeValue = textNode.nodeValue.split(placeholder).join('$');
+                });
             }
-            nodes.forEach((textNode) => {
-                textNode.nodeValue = textNode.nodeValue.split(placeholder).join('$');
-            });
-        }
 
-        document.addEventListener('DOMContentLoaded', function() {
-            renderMathInElement(document.body, {
-                delimiters: [
-                    {left: '$$', right: '$$', display: true},
-                    {left: '$', right: '$', display: false}
-                ],
-                throwOnError: false
+            document.addEventListener('DOMContentLoaded', function() {
+                renderMathInElement(document.body, {
+                    delimiters: [
+                        {left: '$$', right: '$$', display: true},
+                        {left: '$', right: '$', display: false}
+                    ],
+                    throwOnError: false
+                });
+                replaceEscapedDollarPlaceholders(document.body);
             });
-            replaceEscapedDollarPlaceholders(document.body);
-        });
         
-        // Re-render math after HTMX swaps
-        document.body.addEventListener('htmx:afterSwap', function(event) {
-            renderMathInElement(document.body, {
-                delimiters: [
-                    {left: '$$', right: '$$', display: true},
-                    {left: '$', right: '$', display: false}
-                ],
-                throwOnError: false
+            // Re-render math after HTMX swaps
+            document.body.addEventListener('htmx:afterSwap', function(event) {
+                renderMathInElement(document.body, {
+                    delimiters: [
+                        {left: '$$', right: '$$', display: true},
+                        {left: '$', right: '$', display: false}
+                    ],
+                    throwOnError: false
+                });
+                replaceEscapedDollarPlaceholders(event.target || document.body);
             });
-            replaceEscapedDollarPlaceholders(event.target || document.body);
-        });
-    """),
+        """),
+    )),
     Link(rel="preconnect", href="https://fonts.googleapis.com"), 
     Link(rel="preconnect", href="https://fonts.gstatic.com", crossorigin=""),
     Link(rel="stylesheet", href="https://fonts.googleapis.com/css2?family=IBM+Plex+Sans:wght@400;500;600;700&family=IBM+Plex+Mono&display=swap"),
@@ -927,9 +1920,61 @@ hdrs = (
             border-radius: 0.375rem;
             font-size: 0.875rem;
         }
-        .tab-panel code { 
+        .tab-panel code {
             font-family: 'IBM Plex Mono', monospace;
         }
+
+        /* Code block copy button */
+        .code-copy-button {
+            position: absolute;
+            top: 0.5rem;
+            right: 0.5rem;
+            display: inline-flex;
+            align-items: center;
+            justify-content: center;
+            border: 1px solid rgb(226 232 240);
+            border-radius: 0.25rem;
+            background: rgb(255 255 255 / 0.8);
+            color: rgb(71 85 105);
+            transition: color 0.15s ease, border-color 0.15s ease;
+        }
+        .code-copy-button:hover {
+            color: rgb(15 23 42);
+            border-color: rgb(203 213 225);
+        }
+        .dark .code-copy-button {
+            border-color: rgb(51 65 85);
+            background: rgb(15 23 42 / 0.7);
+            color: rgb(203 213 225);
+        }
+        .dark .code-copy-button:hover {
+            color: white;
+            border-color: rgb(100 116 139);
+        }
+
+        /* Mermaid diagram controls */
+        .mermaid-controls {
+            position: absolute;
+            top: 0.5rem;
+            right: 0.5rem;
+            z-index: 10;
+            display: flex;
+            gap: 0.25rem;
+            background: rgb(255 255 255 / 0.8);
+            backdrop-filter: blur(4px);
+            border-radius: 0.25rem;
+        }
+        .dark .mermaid-controls { background: rgb(30 41 59 / 0.8); }
+        .mermaid-controls button {
+            padding: 0.25rem 0.5rem;
+            font-size: 0.75rem;
+            line-height: 1rem;
+            border: 1px solid rgb(226 232 240);
+            border-radius: 0.25rem;
+        }
+        .dark .mermaid-controls button { border-color: rgb(51 65 85); }
+        .mermaid-controls button:hover { background: rgb(241 245 249); }
+        .dark .mermaid-controls button:hover { background: rgb(51 65 85); }
     """),
     # Custom table stripe styling for punchier colors
     Style("""
@@ -1018,10 +2063,24 @@ else:
 
 logger.info(f'{beforeware=}')
 
+def _start_site_index():
+    # Index the blog and start watching it before the first request comes in
+    index = get_site_index(get_root_folder())
+    index.watch()
+    site = index.snapshot()
+    logger.info(f"Site index: {len(site.mtimes)} posts in {len(site.children)} folders")
+
+def _open_render_cache():
+    # Opening the disk tier deletes stale versions and prunes it, which is better done before serving
+    get_render_cache()
+
+def _stop_site_index():
+    get_site_index(get_root_folder()).close()
+
 app = (
-    FastHTML(hdrs=hdrs, before=beforeware, exts="ws")
+    FastHTML(hdrs=hdrs, before=beforeware, exts="ws", on_startup=[_start_site_index, _open_render_cache], on_shutdown=[_stop_site_index])
     if beforeware
-    else FastHTML(hdrs=hdrs, exts="ws")
+    else FastHTML(hdrs=hdrs, exts="ws", on_startup=[_start_site_index, _open_render_cache], on_shutdown=[_stop_site_index])
 )
 
 def _load_pylogue_routes():
@@ -1070,7 +2129,7 @@ rt = app.route
 
 
 from starlette.requests import Request
-from starlette.responses import RedirectResponse, FileResponse, Response
+from starlette.responses import RedirectResponse, FileResponse, Response, StreamingResponse
 
 _pylogue_register, _PylogueResponder = _load_pylogue_routes()
 if _pylogue_register:
@@ -1137,15 +2196,100 @@ def posts_sidebar_lazy():
         id="posts-sidebar"
     )
 
+def _versioned_cache_control(v, version):
+    """Cache-Control of a response to a `?v=` URL: kept for a day only when `v` is the file's current `version`
+
+    With login enabled it is `private`, so shared caches never store posts.
+    """
+    if v != str(version):
+        return "no-cache"
+    return f"{'private' if beforeware else 'public'}, max-age=86400"
+
 # Route to serve raw markdown for LLM-friendly access
+# Versioned requests (`?v=<mtime>`, used by the post copy button) can be cached
+# by the browser; a new mtime on edit yields a new URL
 @rt("/posts/{path:path}.md")
-def serve_post_markdown(path: str):
+def serve_post_markdown(path: str, v: str = ""):
     from starlette.responses import FileResponse
     file_path = get_root_folder() / f'{path}.md'
     if file_path.exists():
-        return FileResponse(file_path, media_type="text/markdown; charset=utf-8")
+        cache_control = _versioned_cache_control(v, int(file_path.stat().st_mtime))
+        return FileResponse(file_path, media_type="text/markdown; charset=utf-8",
+                            headers={"Cache-Control": cache_control})
     return Response(status_code=404)
 
+def _sections_loader(path, start, version):
+    """Placeholder that fetches the sections of a post from `start` once it scrolls into view"""
+    src = f"/_sections/{quote(path)}?start={start}&v={version}"
+    return (f'<div class="post-sections-loader py-6 text-sm text-slate-500 dark:text-slate-400" '
+            f'hx-get="{src}" hx-trigger="revealed" hx-swap="outerHTML">Loading more…</div>')
+
+def _progressive_body(raw_content, path, start, version):
+    """HTML of the next sections of a progressively loaded post, ending in a loader for the rest"""
+    per_response = get_config().get_progressive_sections()
+    html, total = render_sections(raw_content, start, start + per_response, current_path=path)
+    if start + per_response < total:
+        html += _sections_loader(path, start + per_response, version)
+    return html
+
+# Later sections of progressively loaded posts, requested by their loaders.
+# Versioned like the raw markdown, so an edit yields new URLs
+@rt("/_sections/{path:path}")
+def post_sections(path: str, start: int = 0, v: str = ""):
+    file_path = get_root_folder() / f'{path}.md'
+    if not file_path.exists():
+        return Response(status_code=404)
+    _, raw_content = parse_frontmatter(file_path)
+    version = str(int(file_path.stat().st_mtime))
+    cache_control = _versioned_cache_control(v, version)
+    return Response(_progressive_body(raw_content, path, max(0, start), version),
+                    media_type="text/html; charset=utf-8", headers={"Cache-Control": cache_control})
+
+_render_executor = None
+
+def _render_api_map(fn, *iterables):
+    """`map` over a process-wide thread pool shared by batch render requests"""
+    global _render_executor
+    if _render_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _render_executor = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="bloggy-render")
+    return _render_executor.map(fn, *iterables)
+
+# Batch rendering for editors and CI (see `bloggy.batch`), enabled by `render_api`.
+# NDJSON requests stream one result line per document, in order, as each renders
+@rt("/_render", methods=["POST"])
+async def render_api(req):
+    config = get_config()
+    if not config.get_render_api():
+        return Response(status_code=404)
+    max_bytes, max_documents = config.get_render_api_max_bytes(), config.get_render_api_max_documents()
+    too_large = JSONResponse({"error": f"request body over {max_bytes} bytes"}, status_code=413)
+    try:
+        if int(req.headers.get('content-length') or 0) > max_bytes:
+            return too_large
+    except ValueError:
+        return JSONResponse({"error": "invalid Content-Length"}, status_code=400)
+    body = bytearray()
+    async for chunk in req.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            return too_large
+    try:
+        documents = parse_documents(body.decode('utf-8'))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    if len(documents) > max_documents:
+        return JSONResponse({"error": f"more than {max_documents} documents"}, status_code=413)
+    # Documents sent by clients stay out of the disk cache, which posts share
+    results = render_documents(documents, _render_api_map, persist=False)
+    if 'ndjson' in req.headers.get('content-type', '') or 'ndjson' in req.headers.get('accept', ''):
+        async def stream_results():
+            async with aclosing(_iter_in_thread(results)) as stream:
+                async for result in stream:
+                    yield ndjson_line(result)
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+    return JSONResponse(await asyncio.get_running_loop().run_in_executor(None, list, results))
+
 @rt("/search/gather")
 def gather_search_results(htmx, q: str = ""):
     import html
@@ -1215,14 +2359,34 @@ def gather_search_results(htmx, q: str = ""):
     )
     return layout(content, htmx=htmx, title="Search Results", show_sidebar=True)
 
-# Route to serve static files (images, SVGs, etc.) from blog posts
+# Route to serve static files (images, SVGs, etc.) from blog posts.
+# `?w=<width>` requests a resized variant from an image's srcset, and
+# `?preview=1` the first page of a PDF as an image, in the best format the
+# browser accepts; other widths get the original file
 @rt("/posts/{path:path}.{ext:static}")
-def serve_post_static(path: str, ext: str):
+def serve_post_static(path: str, ext: str, req, w: int = 0, v: str = "", preview: int = 0):
     from starlette.responses import FileResponse
     file_path = get_root_folder() / f'{path}.{ext}'
-    if file_path.exists():
-        return FileResponse(file_path)
-    return Response(status_code=404)
+    if not file_path.exists():
+        return Response(status_code=404)
+    if preview and ext == 'pdf':
+        fmt = negotiate_format(req.headers.get('accept', ''), False)
+        image = get_pdf_previews().get(file_path, fmt)
+        if image is None:
+            return Response(status_code=404)
+        cache_control = _versioned_cache_control(v, file_path.stat().st_mtime_ns)
+        return FileResponse(image, media_type=MEDIA_TYPES[fmt],
+                            headers={"Cache-Control": cache_control, "Vary": "Accept"})
+    if w and RESPONSIVE_IMAGES:
+        info = image_info(file_path)
+        if info is not None and w in variant_widths(info.width, get_config().get_image_widths()):
+            fmt = negotiate_format(req.headers.get('accept', ''), info.has_alpha)
+            variant = get_image_variants().get(file_path, w, fmt)
+            if variant is not None:
+                cache_control = _versioned_cache_control(v, info.mtime_ns)
+                return FileResponse(variant, media_type=MEDIA_TYPES[fmt],
+                                    headers={"Cache-Control": cache_control, "Vary": "Accept"})
+    return FileResponse(file_path)
 
 def theme_toggle():
     theme_script = """on load set franken to (localStorage's __FRANKEN__ or '{}') as Object
@@ -1281,12 +2445,12 @@ def navbar(show_mobile_menus=False):
     return Div(left_section, right_section,
                cls="flex items-center justify-between bg-slate-900 text-white p-4 my-4 rounded-lg shadow-md dark:bg-slate-800")
 
+def _site():
+    """Current snapshot of the blog's posts and folders (see `site_index`)"""
+    return get_site_index(get_root_folder()).snapshot()
+
 def _posts_sidebar_fingerprint():
-    root = get_root_folder()
-    try:
-        return max((p.stat().st_mtime for p in root.rglob("*.md")), default=0)
-    except Exception:
-        return 0
+    return _site().fingerprint
 
 def _normalize_search_text(text):
     text = (text or "").lower()
@@ -1319,15 +2483,17 @@ def _find_search_matches_uncached(query, limit=40):
         return [], ""
     regex, regex_error = _parse_search_query(trimmed)
     query_norm = _normalize_search_text(trimmed) if not regex else ""
-    root = get_root_folder()
-    index_file = find_index_file()
+    site = _site()
+    root = site.root
+    index_file = site.index_file
     results = []
-    for item in chain(root.rglob("*.md"), root.rglob("*.pdf")):
-        if any(part.startswith('.') for part in item.relative_to(root).parts):
+    # Markdown posts first, then PDFs
+    for item in sorted(site.posts(), key=lambda path: path.suffix == '.pdf'):
+        if item.suffix not in ('.md', '.pdf'):
             continue
-        if ".bloggy" in item.parts:
+        if any(part.startswith('.') for part in item.relative_to(root).parts):
             continue
-        if index_file and item.resolve() == index_file.resolve():
+        if index_file and item == index_file:
             continue
         rel = item.relative_to(root).with_suffix("")
         if regex:
@@ -1527,14 +2693,16 @@ def build_toc_items(headings):
     if not headings:
         return [Li("No headings found", cls="text-sm text-slate-500 dark:text-slate-400 py-1")]
     
+    import html
+    # Formatted directly: long documents have thousands of entries, and building
+    # them as FT components would take longer than rendering the post
     items = []
     for level, text, anchor in headings:
         indent = "ml-0" if level == 1 else f"ml-{(level-1)*3}"
-        items.append(Li(
-            A(text, href=f"#{anchor}", 
-              cls=f"toc-link block py-1 px-2 text-sm rounded hover:bg-slate-100 dark:hover:bg-slate-800 text-slate-700 dark:text-slate-300 hover:text-blue-600 transition-colors {indent}",
-              data_anchor=anchor),
-            cls="my-1"
+        items.append(NotStr(
+            f'<li class="my-1"><a href="#{anchor}" data-anchor="{anchor}" '
+            f'class="toc-link block py-1 px-2 text-sm rounded hover:bg-slate-100 dark:hover:bg-slate-800 text-slate-700 dark:text-slate-300 hover:text-blue-600 transition-colors {indent}">'
+            f'{html.escape(text, quote=False)}</a></li>'
         ))
     return items
 
@@ -1578,7 +2746,13 @@ def get_custom_css_links(current_path=None, section_class=None):
     
     return css_elements
 
-def layout(*content, htmx, title=None, show_sidebar=False, toc_content=None, current_path=None, show_toc=True):
+def _toc_items(toc_content, toc_headings=None):
+    """TOC entries for a page, preferring headings collected while rendering it"""
+    if not toc_content:
+        return []
+    return build_toc_items(toc_headings if toc_headings is not None else extract_toc(toc_content))
+
+def layout(*content, htmx, title=None, show_sidebar=False, toc_content=None, toc_headings=None, current_path=None, show_toc=True):
     import time
     layout_start_time = time.time()
     logger.debug("[LAYOUT] layout() start")
@@ -1596,7 +2770,7 @@ def layout(*content, htmx, title=None, show_sidebar=False, toc_content=None, cur
             toc_sidebar = None
             t_toc = t_section
             if show_toc:
-                toc_items = build_toc_items(extract_toc(toc_content)) if toc_content else []
+                toc_items = _toc_items(toc_content, toc_headings)
                 t_toc = time.time()
                 logger.debug(f"[LAYOUT] TOC built in {(t_toc - t_section)*1000:.2f}ms")
 
@@ -1658,7 +2832,7 @@ def layout(*content, htmx, title=None, show_sidebar=False, toc_content=None, cur
         toc_sidebar = None
         t_toc = t_section
         if show_toc:
-            toc_items = build_toc_items(extract_toc(toc_content)) if toc_content else []
+            toc_items = _toc_items(toc_content, toc_headings)
             t_toc = time.time()
             logger.debug(f"[LAYOUT] TOC built in {(t_toc - t_section)*1000:.2f}ms")
             # Right sidebar TOC component with out-of-band swap for HTMX
@@ -1798,30 +2972,27 @@ def layout(*content, htmx, title=None, show_sidebar=False, toc_content=None, cur
     logger.debug(f"[LAYOUT] FULL PAGE assembled in {(t_end - layout_start_time)*1000:.2f}ms")
     return tuple(result)
 
-def build_post_tree(folder):
+def build_post_tree(folder, site=None):
     import time
     start_time = time.time()
-    root = get_root_folder()
+    site = site or _site()
+    root = site.root
     items = []
     try:
-        index_file = find_index_file() if folder == root else None
+        index_file = site.index_file if folder == root else None
         entries = []
-        folder_note = find_folder_note_file(folder)
-        for item in folder.iterdir():
-            if item.name == ".bloggy":
-                continue
-            if item.is_dir():
-                if item.name.startswith('.'):
-                    continue
+        folder_note = site.folder_notes.get(folder)
+        for item in site.children.get(folder, ()):
+            if site.is_dir(item):
                 entries.append(item)
             elif item.suffix in ('.md', '.pdf'):
-                if folder_note and item.resolve() == folder_note.resolve():
+                if folder_note and item == folder_note:
                     continue
                 # Skip the file being used for home page (index.md takes precedence over readme.md)
-                if index_file and item.resolve() == index_file.resolve():
+                if index_file and item == index_file:
                     continue
                 entries.append(item)
-        config = get_bloggy_config(folder)
+        config = site.config(folder)
         entries = order_bloggy_entries(entries, config)
         abbreviations = _effective_abbreviations(root, folder)
         logger.debug(
@@ -1834,11 +3005,10 @@ def build_post_tree(folder):
         return items
     
     for item in entries:
-        if item.is_dir():
-            if item.name.startswith('.'): continue
-            sub_items = build_post_tree(item)
+        if site.is_dir(item):
+            sub_items = build_post_tree(item, site)
             folder_title = slug_to_title(item.name, abbreviations=abbreviations)
-            note_file = find_folder_note_file(item)
+            note_file = site.folder_notes.get(item)
             note_link = None
             note_slug = None
             if note_file:
@@ -1873,7 +3043,7 @@ def build_post_tree(folder):
         elif item.suffix == '.md':
             slug = str(item.relative_to(root).with_suffix(''))
             title_start = time.time()
-            title = get_post_title(item, abbreviations=abbreviations)
+            title = site.title(item, abbreviations=abbreviations)
             title_time = (time.time() - title_start) * 1000
             if title_time > 1:  # Only log if it takes more than 1ms
                 logger.debug(f"[DEBUG] Getting title for {item.name} took {title_time:.2f}ms")
@@ -1902,14 +3072,7 @@ def build_post_tree(folder):
     return items
 
 def _posts_tree_fingerprint():
-    root = get_root_folder()
-    try:
-        md_mtime = max((p.stat().st_mtime for p in root.rglob("*.md")), default=0)
-        pdf_mtime = max((p.stat().st_mtime for p in root.rglob("*.pdf")), default=0)
-        bloggy_mtime = max((p.stat().st_mtime for p in root.rglob(".bloggy")), default=0)
-        return max(md_mtime, pdf_mtime, bloggy_mtime)
-    except Exception:
-        return 0
+    return _site().fingerprint
 
 @lru_cache(maxsize=1)
 def _cached_build_post_tree(fingerprint):
@@ -1979,8 +3142,100 @@ def not_found(htmx=None):
     result = layout(content, htmx=htmx, title=f"404 - Page Not Found | {blog_title}", show_sidebar=True)
     return result
 
+# Stands in for the post body while the page around it is serialized for streaming
+_STREAM_MARKER = '@@BLOGGY_STREAM_BODY@@'
+
+async def _iter_in_thread(chunks, max_pending=4):
+    """Run a blocking chunk generator in a worker thread, yielding chunks as they arrive
+
+    The whole render stays on one thread, like a non-streamed one, instead of
+    resuming on a different thread for every chunk. The thread waits while
+    `max_pending` chunks are unsent, so a slow client doesn't make the whole
+    render pile up in memory, and stops once the consumer stops iterating
+    (e.g. the client disconnected), closing `chunks`. Use it with `aclosing`.
+    """
+    loop = asyncio.get_running_loop()
+    queue, done, stop = asyncio.Queue(maxsize=max_pending), object(), threading.Event()
+    def hand_over(item):
+        # Waits for room in the queue; False once the consumer is gone
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except concurrent.futures.TimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    return False
+    def produce():
+        try:
+            for chunk in chunks:
+                if stop.is_set() or not hand_over(chunk):
+                    return
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+            if not stop.is_set():
+                hand_over(done)
+    producer = loop.run_in_executor(None, produce)
+    try:
+        while (chunk := await queue.get()) is not done:
+            yield chunk
+        await producer
+    finally:
+        stop.set()
+
+def _streamed_page(req, page, chunks):
+    """Respond with `page`, streaming `chunks` in place of `_STREAM_MARKER`
+
+    Everything before the post body is sent before the first chunk renders.
+    """
+    head, tail = _xt_cts(req, page).split(_STREAM_MARKER, 1)
+    async def body():
+        yield head
+        async with aclosing(_iter_in_thread(chunks)) as stream:
+            async for chunk in stream:
+                yield chunk
+        yield tail
+    return StreamingResponse(body(), media_type="text/html; charset=utf-8",
+                             headers={"vary": "HX-Request, HX-History-Restore-Request"})
+
+def _pdf_viewer_html(pdf_src):
+    return (f'<object data="{pdf_src}" type="application/pdf" '
+            'class="pdf-viewer w-full h-[calc(100vh-14rem)] rounded-lg border border-slate-200 '
+            'dark:border-slate-700 bg-white dark:bg-slate-900">'
+            '<p class="p-4 text-sm text-slate-600 dark:text-slate-300">'
+            'PDF preview not available. '
+            f'<a href="{pdf_src}" class="text-blue-600 hover:underline">Download PDF</a>.'
+            '</p></object>')
+
+def _pdf_preview_html(pdf_path, pdf_src, title):
+    """First page, page count and size of a PDF; `scripts.js` swaps in the viewer when it is opened
+
+    Without JavaScript, opening the preview opens the PDF itself.
+    """
+    import html
+    info = pdf_info(pdf_path)
+    if info is None:
+        return _pdf_viewer_html(pdf_src)
+    details = [f"{info.pages} page{'s' if info.pages != 1 else ''}"] if info.pages else []
+    details.append(format_size(info.size))
+    picture = ''
+    if info.width and pdf_preview_available():
+        picture = (f'<img src="{pdf_src}?preview=1&amp;v={info.mtime_ns}" width="{info.width}" height="{info.height}" '
+                   f'alt="First page of {html.escape(title)}" decoding="async" '
+                   'class="block m-0 w-full h-auto bg-white">')
+    return (f'<div class="pdf-preview max-w-xl mx-auto">'
+            f'<a href="{pdf_src}" data-pdf-viewer-src="{pdf_src}" '
+            'class="pdf-preview-open group relative block rounded-lg overflow-hidden border border-slate-200 dark:border-slate-700">'
+            f'{picture}'
+            '<span class="flex items-center justify-center gap-2 py-3 text-sm font-medium bg-slate-50 dark:bg-slate-800 '
+            'group-hover:bg-slate-100 dark:group-hover:bg-slate-700 transition-colors">Open PDF</span></a>'
+            f'<p class="mt-2 text-sm text-center text-slate-500 dark:text-slate-400">{" · ".join(details)}</p></div>')
+
 @rt('/posts/{path:path}')
-def post_detail(path: str, htmx):
+def post_detail(path: str, htmx, req):
     import time
     request_start = time.time()
     logger.info(f"\n[DEBUG] ########## REQUEST START: /posts/{path} ##########")
@@ -2009,15 +3264,8 @@ def post_detail(path: str, htmx):
                     ),
                     cls="flex items-center justify-between gap-4 flex-wrap mb-6"
                 ),
-                NotStr(
-                    f'<object data="{pdf_src}" type="application/pdf" '
-                    'class="pdf-viewer w-full h-[calc(100vh-14rem)] rounded-lg border border-slate-200 '
-                    'dark:border-slate-700 bg-white dark:bg-slate-900">'
-                    '<p class="p-4 text-sm text-slate-600 dark:text-slate-300">'
-                    'PDF preview not available. '
-                    f'<a href="{pdf_src}" class="text-blue-600 hover:underline">Download PDF</a>.'
-                    '</p></object>'
-                )
+                NotStr(_pdf_preview_html(pdf_path, pdf_src, post_title) if get_config().get_pdf_preview()
+                       else _pdf_viewer_html(pdf_src))
             )
             return layout(pdf_content, htmx=htmx, title=f"{post_title} - {get_blog_title()}",
                           show_sidebar=True, toc_content=None, current_path=path, show_toc=False)
@@ -2028,17 +3276,34 @@ def post_detail(path: str, htmx):
     # Get title from frontmatter or filename
     post_title = metadata.get('title', slug_to_title(path.split('/')[-1], abbreviations=abbreviations))
     
-    # Render the markdown content with current path for relative link resolution
-    md_start = time.time()
-    content = from_md(raw_content, current_path=path)
-    md_time = (time.time() - md_start) * 1000
-    logger.debug(f"[DEBUG] Markdown rendering took {md_time:.2f}ms")
+    # Very large posts either arrive a few sections at a time as the reader scrolls,
+    # or, on full page loads, stream as they render. Either way the TOC comes from
+    # a scan of the source, as the page is sent before the whole body renders
+    config = get_config()
+    version = int(file_path.stat().st_mtime)
+    progressive_min, stream_min = config.get_progressive_min_bytes(), config.get_stream_min_bytes()
+    progressive = bool(progressive_min) and len(raw_content) >= progressive_min
+    stream = (not progressive and bool(stream_min) and len(raw_content) >= stream_min
+              and not (htmx and getattr(htmx, "request", None)))
+    if progressive:
+        content = _md_div(_progressive_body(raw_content, path, 0, version))
+        toc_headings = None
+    elif stream:
+        content, toc_headings = _md_div(_STREAM_MARKER), None
+    else:
+        # Render the markdown content with current path for relative link resolution
+        md_start = time.time()
+        content, toc_headings = from_md_with_toc(raw_content, current_path=path)
+        md_time = (time.time() - md_start) * 1000
+        logger.debug(f"[DEBUG] Markdown rendering took {md_time:.2f}ms")
     
+    # The raw markdown is fetched on click rather than embedded in the page
+    raw_md_src = f"/posts/{quote(path)}.md?v={version}"
     copy_button = Button(
         UkIcon("copy", cls="w-4 h-4"),
         type="button",
         title="Copy raw markdown",
-        onclick="(function(){const el=document.getElementById('raw-md-clipboard');const toast=document.getElementById('raw-md-toast');if(!el){return;}el.focus();el.select();const text=el.value;const done=()=>{if(!toast){return;}toast.classList.remove('opacity-0');toast.classList.add('opacity-100');setTimeout(()=>{toast.classList.remove('opacity-100');toast.classList.add('opacity-0');},1400);};if(navigator.clipboard&&window.isSecureContext){navigator.clipboard.writeText(text).then(done).catch(()=>{document.execCommand('copy');done();});}else{document.execCommand('copy');done();}})()",
+        data_raw_md_src=raw_md_src,
         cls="inline-flex items-center justify-center p-2 rounded-md border border-slate-200 dark:border-slate-700 text-slate-600 dark:text-slate-300 hover:text-slate-900 dark:hover:text-white hover:border-slate-300 dark:hover:border-slate-500 transition-colors"
     )
     post_content = Div(
@@ -2052,20 +3317,18 @@ def post_detail(path: str, htmx):
             id="raw-md-toast",
             cls="fixed top-6 right-6 bg-slate-900 text-white text-sm px-4 py-2 rounded shadow-lg opacity-0 transition-opacity duration-300"
         ),
-        Textarea(
-            raw_content,
-            id="raw-md-clipboard",
-            cls="absolute left-[-9999px] top-0 opacity-0 pointer-events-none"
-        ),
         content
     )
     
     # Always return complete layout with sidebar and TOC
     layout_start = time.time()
     result = layout(post_content, htmx=htmx, title=f"{post_title} - {get_blog_title()}", 
-                  show_sidebar=True, toc_content=raw_content, current_path=path)
+                  show_sidebar=True, toc_content=raw_content, toc_headings=toc_headings, current_path=path)
     layout_time = (time.time() - layout_start) * 1000
     logger.debug(f"[DEBUG] Layout generation took {layout_time:.2f}ms")
+    if stream:
+        logger.debug(f"[DEBUG] Streaming /posts/{path} ({len(raw_content)} bytes)")
+        return _streamed_page(req, result, iter_render_markdown(raw_content, current_path=path))
     
     total_time = (time.time() - request_start) * 1000
     logger.debug(f"[DEBUG] ########## REQUEST COMPLETE: {total_time:.2f}ms TOTAL ##########\n")
@@ -2074,19 +3337,7 @@ def post_detail(path: str, htmx):
 
 def find_index_file():
     """Find index.md or readme.md (case insensitive) in root folder"""
-    root = get_root_folder()
-    
-    # Try to find index.md first (case insensitive)
-    for file in root.iterdir():
-        if file.is_file() and file.suffix == '.md' and file.stem.lower() == 'index':
-            return file
-    
-    # Try to find readme.md (case insensitive)
-    for file in root.iterdir():
-        if file.is_file() and file.suffix == '.md' and file.stem.lower() == 'readme':
-            return file
-    
-    return None
+    return _site().index_file
 
 @rt
 def index(htmx):
@@ -2105,12 +3356,12 @@ def index(htmx):
         page_title = metadata.get('title', blog_title)
         # Use index file's relative path from root for link resolution
         index_path = str(index_file.relative_to(get_root_folder()).with_suffix(''))
-        content = from_md(raw_content, current_path=index_path)
+        content, toc_headings = from_md_with_toc(raw_content, current_path=index_path)
         page_content = Div(H1(page_title, cls="text-4xl font-bold mb-8"), content)
         
         layout_start = time.time()
         result = layout(page_content, htmx=htmx, title=f"{page_title} - {blog_title}", 
-                      show_sidebar=True, toc_content=raw_content, current_path=index_path)
+                      show_sidebar=True, toc_content=raw_content, toc_headings=toc_headings, current_path=index_path)
         layout_time = (time.time() - layout_start) * 1000
         logger.debug(f"[DEBUG] Layout generation took {layout_time:.2f}ms")
         
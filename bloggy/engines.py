@@ -0,0 +1,109 @@
+"""Markdown engines for Bloggy.
+
+An engine turns preprocessed post markdown into Bloggy's content HTML. The
+preprocessing (footnote extraction, :::tabs placeholders, ^sup^/~sub~, escaped
+dollars and line breaks) is shared, so an engine only parses the result and
+emits each element through `bloggy.core.ContentMarkup`, which keeps the HTML of
+sidenotes, tabs, YouTube embeds, mermaid diagrams, code blocks, links and
+headings the same whichever engine parsed them.
+
+mistletoe is the default and reference engine. `markdown-it` uses
+markdown-it-py, an optional dependency. Select one with `markdown_engine` in
+`.bloggy` or `BLOGGY_MARKDOWN_ENGINE`; `check_engines.py` at the repository
+root checks an engine's output against the reference over a folder of posts,
+and `tests/test_engines.py` checks every installed engine against a snapshot
+of the demo posts.
+"""
+
+from __future__ import annotations
+
+import importlib
+import inspect
+from abc import ABC, abstractmethod
+
+DEFAULT_ENGINE = "mistletoe"
+
+_ENGINES: dict[str, type[MarkdownEngine]] = {}
+
+# Built-in engines outside bloggy.core, imported the first time they are asked for
+_ENGINE_MODULES = {
+    "mistletoe": "bloggy.core",
+    "markdown-it": "bloggy.markdown_it_engine",
+}
+
+
+class MarkdownEngine(ABC):
+    """Renders preprocessed markdown to (html, toc)
+
+    Subclasses must implement `render`; the other entry points fall back to it.
+    """
+
+    name = ""
+
+    @classmethod
+    def available(cls) -> bool:
+        """Whether the engine's dependencies are installed"""
+        return True
+
+    @abstractmethod
+    def render(self, content, footnotes, tab_data_store, img_dir=None, current_path=None, block_cache=None):
+        """Render `content` and return its HTML and (level, text, anchor) headings
+
+        `footnotes` and `tab_data_store` come from `preprocess_markdown`.
+        `block_cache` is a `RenderCache` for top-level blocks, which engines
+        without incremental rendering ignore.
+        """
+
+    def render_chunks(self, content, footnotes, tab_data_store, img_dir=None, current_path=None):
+        """Yield (html, toc) for consecutive chunks of the document as they render
+
+        Joined, the chunks equal `render`. Engines that can't render part of a
+        document at a time yield it whole.
+        """
+        yield self.render(content, footnotes, tab_data_store, img_dir=img_dir, current_path=current_path)
+
+    def split_sections(self, content):
+        """Split a document into the sections `render_sections` renders, for progressive loading
+
+        Engines that can't render a document section by section return it whole.
+        """
+        return [content]
+
+    def render_sections(self, sections, footnotes, tab_data_store, state=None, img_dir=None, current_path=None):
+        """Yield (html, state) for each of `sections` of a document, in order
+
+        `state` is the `ContentMarkup.document_state` after the section before
+        the first one, or None at the start of the document, so a range of
+        sections renders exactly as it would in the whole document. Engines
+        that return documents whole from `split_sections` render their one
+        section with `render`, and no state follows it.
+        """
+        for section in sections:
+            html, _ = self.render(section, footnotes, tab_data_store, img_dir=img_dir, current_path=current_path)
+            yield html, None
+
+
+def register_engine(cls: type[MarkdownEngine]) -> type[MarkdownEngine]:
+    """Class decorator making an engine selectable by its `name`
+
+    Raises TypeError for an engine that leaves an abstract method unimplemented.
+    """
+    if inspect.isabstract(cls):
+        raise TypeError(f"engine {cls.name!r} does not implement {', '.join(sorted(cls.__abstractmethods__))}")
+    _ENGINES[cls.name] = cls
+    return cls
+
+
+def engine_names() -> list[str]:
+    """Names of the known engines, installed or not"""
+    return sorted(set(_ENGINES) | set(_ENGINE_MODULES))
+
+
+def get_engine(name: str) -> MarkdownEngine | None:
+    """Instantiate the engine called `name`, or return None if it is unknown or not installed"""
+    if name not in _ENGINES and name in _ENGINE_MODULES:
+        importlib.import_module(_ENGINE_MODULES[name])
+    cls = _ENGINES.get(name)
+    if cls is None or not cls.available():
+        return None
+    return cls()
@@ -79,7 +79,7 @@ def parse_frontmatter(file_path: str | Path):
             logger.debug(f"[DEBUG] parse_frontmatter READ FILE {file_path.name} ({elapsed:.2f}ms)")
             return result
     except Exception as e:
-        print(f"Error parsing frontmatter from {file_path}: {e}")
+        logger.warning(f"Error parsing frontmatter from {file_path}: {e}")
         return {}, open(file_path).read()
 
 def get_post_title(file_path: str | Path, abbreviations=None) -> str:
@@ -266,9 +266,16 @@ def list_bloggy_posts(root: Path, include_hidden: bool = False) -> list[dict]:
     posts: list[dict] = []
     abbreviations = _effective_abbreviations(root)
 
-    for path in sorted(root.rglob("*")):
-        if not path.is_file():
-            continue
+    # Hidden folders aren't in the site index, so listing them walks the tree
+    if include_hidden:
+        site = None
+        paths = (path for path in sorted(root.rglob("*")) if path.is_file())
+    else:
+        from .site_index import get_site_index
+        site = get_site_index(root).snapshot()
+        paths = site.posts()
+
+    for path in paths:
         rel_parts = path.parts[root_parts:]
         if not rel_parts:
             continue
@@ -280,7 +287,10 @@ def list_bloggy_posts(root: Path, include_hidden: bool = False) -> list[dict]:
         rel = Path(*rel_parts)
         slug = rel.with_suffix("").as_posix()
         if path.suffix.lower() == ".md":
-            title = get_post_title(path, abbreviations=abbreviations)
+            if site is not None:
+                title = site.title(path, abbreviations=abbreviations)
+            else:
+                title = get_post_title(path, abbreviations=abbreviations)
             kind = "md"
         else:
             title = slug_to_title(rel.stem, abbreviations=abbreviations)
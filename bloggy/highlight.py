@@ -0,0 +1,83 @@
+"""Server-side syntax highlighting for Bloggy.
+
+By default code blocks are highlighted in the browser by highlight.js. With
+`code_highlighting = "server"` they are highlighted with Pygments while the
+markdown renders instead, so pages arrive colored and HTMX swaps need no
+client-side pass. Pygments is an optional dependency; without it Bloggy keeps
+using highlight.js.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+from .render_cache import RenderCache, content_hash
+
+try:
+    from pygments import highlight as _pygments_highlight
+    from pygments.formatters import HtmlFormatter
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+except ImportError:  # pragma: no cover - depends on the environment
+    _pygments_highlight = None
+
+LIGHT_STYLE = "friendly"
+DARK_STYLE = "one-dark"
+# Class put on highlighted <code> elements; the token rules are scoped to it
+CSS_CLASS = "code-highlight"
+
+# The same snippet often appears in many posts (install commands, shared
+# examples), so highlighted output is cached independently of the page
+_highlight_cache = RenderCache(8 * 1024 * 1024)
+
+
+def pygments_available() -> bool:
+    return _pygments_highlight is not None
+
+
+@lru_cache(maxsize=256)
+def _lexer_for(lang: str):
+    try:
+        return get_lexer_by_name(lang, stripnl=False, ensurenl=False)
+    except ClassNotFound:
+        return None
+
+
+@lru_cache(maxsize=1)
+def _formatter():
+    return HtmlFormatter(nowrap=True)
+
+
+def highlight_code(code: str, lang: str) -> str | None:
+    """Return highlighted, HTML-escaped `code`, or None if `lang` has no lexer.
+
+    Results are cached by (language, code hash).
+    """
+    if not pygments_available() or not lang:
+        return None
+    lang = lang.lower()
+    lexer = _lexer_for(lang)
+    if lexer is None:
+        return None
+    key = (lang, content_hash(code))
+    html = _highlight_cache.get(key)
+    if html is None:
+        html = _pygments_highlight(code, lexer, _formatter())
+        _highlight_cache.set(key, html)
+    return html
+
+
+def _token_rules(style: str, scope: str) -> list[str]:
+    # Keep only the per-token color rules; the surrounding <pre> keeps the theme's background
+    rules = HtmlFormatter(style=style).get_style_defs(scope).splitlines()
+    return [rule for rule in rules if rule.startswith(f"{scope} .")]
+
+
+@lru_cache(maxsize=1)
+def highlight_css() -> str:
+    """Token color rules for light and dark mode, scoped to highlighted code"""
+    if not pygments_available():
+        return ""
+    # Scope each palette to its mode so tokens one style leaves uncolored never inherit the other's colors
+    scope = f".{CSS_CLASS}"
+    return "\n".join(_token_rules(LIGHT_STYLE, f"html:not(.dark) {scope}") + _token_rules(DARK_STYLE, f".dark {scope}"))
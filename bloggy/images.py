@@ -0,0 +1,186 @@
+"""Responsive images for Bloggy.
+
+Images in posts are usually screenshots and photos saved at full resolution.
+When Pillow is installed, `image_html` gives each local JPEG, PNG or WebP
+image a `srcset` of resized variants plus its intrinsic `width` and `height`.
+Browsers then download a copy sized for the screen and reserve the image's
+box before it arrives. `serve_post_static` creates a variant on its first
+request and keeps it on disk, keyed on the source's path, mtime and the width.
+Variants are WebP for browsers that accept it, and JPEG (PNG for images with
+transparency) otherwise. Without Pillow images are served as they are.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # pragma: no cover - depends on the environment
+    Image = None
+
+DEFAULT_WIDTHS = (480, 960, 1440, 1920)
+# Width of the post column: full width below the xl breakpoint, then bounded by the layout
+IMAGE_SIZES = "(min-width: 1280px) 880px, 100vw"
+RESIZABLE_SUFFIXES = frozenset({".jpg", ".jpeg", ".png", ".webp"})
+
+# EXIF orientations that swap width and height
+_TRANSPOSED_ORIENTATIONS = frozenset({5, 6, 7, 8})
+_SAVE_OPTIONS = {
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg", "png": "image/png"}
+
+ImageInfo = namedtuple("ImageInfo", "width height has_alpha mtime_ns")
+
+# Targets of inline images, `![alt](src "title")`, and of link reference
+# definitions, which reference-style images point at
+_IMAGE_SOURCE_RE = re.compile(r'!\[[^\]\n]*\]\(\s*<?([^\s<>)]+)|^ {0,3}\[[^\]\n]+\]:\s*<?([^\s<>]+)', re.MULTILINE)
+
+
+def pillow_available() -> bool:
+    return Image is not None
+
+
+@lru_cache(maxsize=1)
+def webp_available() -> bool:
+    return pillow_available() and features.check("webp")
+
+
+def _has_alpha(im) -> bool:
+    return im.mode in ("RGBA", "LA", "PA") or "transparency" in im.info
+
+
+@lru_cache(maxsize=4096)
+def _image_info(path: str, mtime_ns: int):
+    try:
+        with Image.open(path) as im:
+            width, height = im.size
+            if im.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+            return ImageInfo(width, height, _has_alpha(im), mtime_ns)
+    except Exception:
+        return None
+
+
+def image_info(path: Path):
+    """`ImageInfo` of the image at `path`, with its size as displayed, or None if it can't be read
+
+    Only the file header is read; results are memoized on path and mtime.
+    """
+    if not pillow_available() or path.suffix.lower() not in RESIZABLE_SUFFIXES:
+        return None
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    return _image_info(str(path), mtime_ns)
+
+
+def image_sources(content: str) -> tuple:
+    """`src` of every image markdown `content` may show, in order and without duplicates
+
+    Sources whose suffix can't be resized are left out, since their HTML never
+    depends on the file.
+    """
+    if '](' not in content and ']:' not in content:
+        return ()
+    sources = (inline or reference for inline, reference in _IMAGE_SOURCE_RE.findall(content))
+    return tuple(dict.fromkeys(src for src in sources
+                               if os.path.splitext(src.split('?', 1)[0].split('#', 1)[0])[1].lower() in RESIZABLE_SUFFIXES))
+
+
+def variant_widths(width: int, widths=DEFAULT_WIDTHS) -> list[int]:
+    """Widths offered in the `srcset` of an image `width` pixels wide
+
+    Configured widths below the image's own, plus its own width unless the
+    image is wider than every configured width. Images are never upscaled.
+    """
+    candidates = [w for w in sorted(set(widths)) if w < width]
+    if not candidates or width <= max(widths):
+        candidates.append(width)
+    return candidates
+
+
+def negotiate_format(accept: str, has_alpha: bool) -> str:
+    """Variant format for a request's `Accept` header"""
+    if webp_available() and "image/webp" in (accept or ""):
+        return "webp"
+    return "png" if has_alpha else "jpeg"
+
+
+class ImageVariants:
+    """Resized copies of post images, written once to `directory` and reused
+
+    File names hash the source path, its mtime, the width and the format, so
+    an edited image gets new variants. Files are written to a temporary name
+    and renamed into place, so several workers can share the directory.
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _path(self, source: Path, mtime_ns: int, width: int, fmt: str) -> Path:
+        key = f"{source.resolve()}\0{mtime_ns}\0{width}\0{fmt}"
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.{fmt}"
+
+    def get(self, source: Path, width: int, fmt: str) -> Path | None:
+        """Path of `source` resized to `width` pixels in `fmt`, created on first use"""
+        try:
+            mtime_ns = source.stat().st_mtime_ns
+        except OSError:
+            return None
+        path = self._path(source, mtime_ns, width, fmt)
+        if path.exists():
+            return path
+        # One encode per variant even when a page's images are requested at once
+        with self._locks_lock:
+            lock = self._locks.setdefault(path, threading.Lock())
+        try:
+            with lock:
+                if not path.exists():
+                    self._write(source, path, width, fmt)
+        finally:
+            with self._locks_lock:
+                self._locks.pop(path, None)
+        return path if path.exists() else None
+
+    def _write(self, source: Path, path: Path, width: int, fmt: str):
+        tmp_path = None
+        try:
+            with Image.open(source) as im:
+                transposed = im.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS
+                shown_width, shown_height = (im.height, im.width) if transposed else im.size
+                height = max(1, round(shown_height * width / shown_width))
+                # JPEG decoders can downscale while decoding, which is much cheaper than a full decode
+                im.draft("RGB", (height, width) if transposed else (width, height))
+                im = ImageOps.exif_transpose(im)
+                if im.width > width:
+                    im = im.resize((width, height), Image.Resampling.LANCZOS)
+                if fmt == "jpeg":
+                    im = im.convert("RGB")
+                elif im.mode not in ("RGB", "RGBA", "L", "LA"):
+                    im = im.convert("RGBA" if _has_alpha(im) else "RGB")
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=f".{fmt}")
+                with os.fdopen(fd, "wb") as f:
+                    im.save(f, format=fmt.upper(), **_SAVE_OPTIONS[fmt])
+            os.replace(tmp_path, path)
+        except Exception:
+            if tmp_path:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
@@ -3,8 +3,13 @@ import sys
 import os
 from .config import get_config, reload_config
 
-# Import app at module level, but config will be initialized before it's used
-from .core import app
+def __getattr__(name):
+    # `bloggy.main:app` for uvicorn. Imported on first use, so `bloggy render`
+    # can point the config at its --root before core reads it
+    if name == 'app':
+        from .core import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def build_command():
     """CLI entry point for bloggy build command"""
@@ -26,6 +31,74 @@ def build_command():
         traceback.print_exc()
         return 1
 
+def render_command():
+    """CLI entry point for bloggy render command"""
+    import argparse
+    import json
+    from .batch import parse_documents, render_documents, ndjson_line, load_renderer
+
+    parser = argparse.ArgumentParser(
+        prog='bloggy render',
+        description='Render markdown documents to body HTML and TOC, as NDJSON or JSON. '
+                    'Without files, documents are read from stdin as NDJSON or a JSON array.')
+    parser.add_argument('files', nargs='*', help='Markdown files to render (- for stdin)')
+    parser.add_argument('--root', help='Blog root that links, images and embeds resolve against (default: config or current directory)')
+    parser.add_argument('--format', choices=['ndjson', 'json'], default='ndjson', help='Output format (default: ndjson)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='Worker processes (default: CPU count)')
+
+    args = parser.parse_args(sys.argv[2:])  # Skip 'bloggy' and 'render'
+
+    if args.root:
+        os.environ['BLOGGY_ROOT'] = str(Path(args.root).resolve())
+    root = reload_config().get_root_folder()
+    load_renderer()  # Before worker processes start, so forked workers needn't import core again
+
+    if not args.files or args.files == ['-']:
+        try:
+            documents = parse_documents(sys.stdin.read())
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    else:
+        documents = []
+        for name in args.files:
+            file_path = Path(name).resolve()
+            try:
+                path = file_path.relative_to(root).with_suffix('').as_posix()
+            except ValueError:
+                path = None
+            try:
+                markdown = file_path.read_text(encoding='utf-8')
+            except (OSError, UnicodeDecodeError) as e:
+                documents.append({'id': name, 'error': str(e)})
+                continue
+            documents.append({'id': name, 'markdown': markdown, 'path': path})
+
+    failed = False
+    if args.jobs > 1 and len(documents) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=min(args.jobs, len(documents)))
+        chunksize = max(1, len(documents) // (args.jobs * 4))
+        results = render_documents(documents, lambda fn, *iterables: executor.map(fn, *iterables, chunksize=chunksize))
+    else:
+        executor = None
+        results = render_documents(documents)
+    try:
+        if args.format == 'ndjson':
+            for result in results:
+                failed |= 'error' in result
+                sys.stdout.write(ndjson_line(result))
+                sys.stdout.flush()
+        else:
+            results = list(results)
+            failed = any('error' in result for result in results)
+            json.dump(results, sys.stdout, ensure_ascii=False)
+            sys.stdout.write('\n')
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return 1 if failed else 0
+
 def cli():
     """CLI entry point for bloggy command
     
@@ -34,6 +107,7 @@ def cli():
         bloggy [directory] --host 0.0.0.0     # Run on all interfaces
         bloggy build [directory]              # Build static site
         bloggy build [directory] -o output    # Build to custom output directory
+        bloggy render [files...]              # Render markdown to body HTML + TOC as NDJSON
         
     Environment variables:
         BLOGGY_ROOT: Path to markdown files
@@ -49,6 +123,8 @@ def cli():
     # Check if first argument is 'build'
     if len(sys.argv) > 1 and sys.argv[1] == 'build':
         sys.exit(build_command())
+    if len(sys.argv) > 1 and sys.argv[1] == 'render':
+        sys.exit(render_command())
     
     parser = argparse.ArgumentParser(description='Run Bloggy server')
     parser.add_argument('directory', nargs='?', help='Path to markdown files directory')
@@ -0,0 +1,273 @@
+"""markdown-it-py engine for Bloggy.
+
+Parses posts with markdown-it-py (CommonMark plus tables and strikethrough)
+and adds Bloggy's inline syntax as inline rules: `[^note]` sidenotes,
+`[yt:id|caption]` embeds, `` `code`{.class} `` attributes, ^sup^ / ~sub~
+left in sidenote bodies, and $math$ when math is rendered server-side. Every
+element is emitted through `ContentMarkup`, so the HTML matches the mistletoe
+engine. markdown-it-py is an optional dependency.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+from functools import lru_cache
+from urllib.parse import quote
+
+from . import core
+from .core import CONTENT_CLASS_MAP, ContentMarkup, _MATH_PATTERN
+from .engines import MarkdownEngine, register_engine
+
+try:
+    from markdown_it import MarkdownIt
+    from markdown_it.common.utils import unescapeAll
+    from markdown_it.renderer import RendererHTML
+except ImportError:  # pragma: no cover - depends on the environment
+    MarkdownIt = None
+    RendererHTML = object
+
+# The same patterns as the span tokens in bloggy.core, matched at the parser's position
+_FOOTNOTE_REF_RE = re.compile(r'\[\^([^\]]+)\](?!:)')
+_YOUTUBE_RE = re.compile(r'\[yt:([a-zA-Z0-9_-]+)(?:\|(.+))?\]')
+_CODE_ATTR_RE = re.compile(r'`([^`]+)`\{([^\}]+)\}')
+_SUPERSCRIPT_RE = re.compile(r'\^([^\^]+?)\^')
+_SUBSCRIPT_RE = re.compile(r'~([^~]+?)~')
+_MATH_RE = re.compile(_MATH_PATTERN, re.DOTALL)
+_ALIGN_RE = re.compile(r'text-align:(\w+)')
+
+
+def _escape_text(text):
+    # Same escaping as mistletoe's text rendering: quotes stay as they are
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _inline_rule(name, marker, pattern, make_meta):
+    """Inline rule pushing a `name` token when `pattern`, which starts with `marker`, matches at the current position"""
+    def rule(state, silent):
+        if state.src[state.pos] != marker:
+            return False
+        match = pattern.match(state.src, state.pos)
+        if match is None or match.end() > state.posMax:
+            return False
+        if not silent:
+            token = state.push(name, '', 0)
+            token.meta = make_meta(match)
+        state.pos = match.end()
+        return True
+    rule.__name__ = name
+    return rule
+
+
+_math_match = _inline_rule('math', '$', _MATH_RE, lambda m: {'display': m.group(1) is not None, 'latex': m.group(1) if m.group(1) is not None else m.group(2)})
+
+
+def _math_rule(state, silent):
+    # Registered once; only active while math is rendered server-side
+    if not core.SERVER_MATH:
+        return False
+    return _math_match(state, silent)
+
+
+def _closing_index(tokens, start):
+    """Index of the token closing the one opened at `start`"""
+    level = tokens[start].level
+    for i in range(start + 1, len(tokens)):
+        if tokens[i].level == level and tokens[i].nesting == -1:
+            return i
+    return len(tokens) - 1
+
+
+class _BloggyRenderer(RendererHTML):
+    """markdown-it renderer that hands every element to the document's `ContentMarkup`"""
+
+    def render(self, tokens, options, env):
+        doc, parts, i = env['bloggy'], [], 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token.type == 'inline':
+                parts.append(self.renderInline(token.children or [], options, env))
+            elif token.type == 'heading_open':
+                inner = self.renderInline(tokens[i + 1].children or [], options, env)
+                parts.append(doc.heading_html(int(token.tag[1:]), inner) + '\n')
+                i += 3
+                continue
+            elif token.type == 'list_item_open':
+                # Task list items are recognized from the rendered contents of the item
+                close = _closing_index(tokens, i)
+                parts.append(doc.list_item_html(self.render(tokens[i + 1:close], options, env)))
+                i = close + 1
+                continue
+            elif token.type in self.rules:
+                parts.append(self.rules[token.type](tokens, i, options, env))
+            else:
+                parts.append(self.renderToken(tokens, i, options, env))
+            i += 1
+        return ''.join(parts)
+
+    def paragraph_open(self, tokens, idx, options, env):
+        # Paragraphs of tight lists are hidden, like mistletoe's suppressed <p> tags
+        return '' if tokens[idx].hidden else f'<p{env["bloggy"].tag_class("p")}>'
+
+    def paragraph_close(self, tokens, idx, options, env):
+        return '' if tokens[idx].hidden else '</p>\n'
+
+    def blockquote_open(self, tokens, idx, options, env):
+        return f'<blockquote{env["bloggy"].tag_class("blockquote")}>\n'
+
+    def blockquote_close(self, tokens, idx, options, env):
+        return '</blockquote>\n'
+
+    def bullet_list_open(self, tokens, idx, options, env):
+        return f'<ul{env["bloggy"].tag_class("ul")}>\n'
+
+    def bullet_list_close(self, tokens, idx, options, env):
+        return '</ul>\n'
+
+    def ordered_list_open(self, tokens, idx, options, env):
+        start = tokens[idx].attrGet('start')
+        attr = f' start="{start}"' if start not in (None, 1) else ''
+        return f'<ol{attr}{env["bloggy"].tag_class("ol")}>\n'
+
+    def ordered_list_close(self, tokens, idx, options, env):
+        return '</ol>\n'
+
+    def hr(self, tokens, idx, options, env):
+        return f'<hr{env["bloggy"].tag_class("hr")}>\n'
+
+    def table_open(self, tokens, idx, options, env):
+        return f'<table{env["bloggy"].tag_class("table")}>\n'
+
+    def th_open(self, tokens, idx, options, env):
+        return self._cell_open('th', tokens[idx], env)
+
+    def td_open(self, tokens, idx, options, env):
+        return self._cell_open('td', tokens[idx], env)
+
+    def _cell_open(self, tag, token, env):
+        align = _ALIGN_RE.search(token.attrGet('style') or '')
+        return f'<{tag} align="{align.group(1) if align else "left"}"{env["bloggy"].tag_class(tag)}>'
+
+    def th_close(self, tokens, idx, options, env):
+        return '</th>\n'
+
+    def td_close(self, tokens, idx, options, env):
+        return '</td>\n'
+
+    def fence(self, tokens, idx, options, env):
+        info = unescapeAll(tokens[idx].info).strip()
+        return env['bloggy'].code_block_html(tokens[idx].content, info.split(maxsplit=1)[0] if info else '') + '\n'
+
+    def code_block(self, tokens, idx, options, env):
+        return env['bloggy'].code_block_html(tokens[idx].content) + '\n'
+
+    def html_block(self, tokens, idx, options, env):
+        return env['bloggy'].block_placeholders_html(tokens[idx].content)
+
+    def html_inline(self, tokens, idx, options, env):
+        return tokens[idx].content
+
+    def text(self, tokens, idx, options, env):
+        return _escape_text(tokens[idx].content)
+
+    def code_inline(self, tokens, idx, options, env):
+        return f'<code{env["bloggy"].tag_class("code")}>{_escape_text(tokens[idx].content)}</code>'
+
+    def hardbreak(self, tokens, idx, options, env):
+        return '<br />\n'
+
+    def softbreak(self, tokens, idx, options, env):
+        return '\n'
+
+    def s_open(self, tokens, idx, options, env):
+        return '<del>'
+
+    def s_close(self, tokens, idx, options, env):
+        return '</del>'
+
+    def link_open(self, tokens, idx, options, env):
+        token, doc = tokens[idx], env['bloggy']
+        href = token.attrGet('href') or ''
+        if token.markup == 'autolink':
+            if not href.startswith('mailto:'):
+                href = html.escape(quote(href, safe='/#:()*?=%@+,&;'))
+            return f'<a href="{href}"{doc.tag_class("a")}>'
+        return doc.link_open_html(href, token.attrGet('title'))
+
+    def link_close(self, tokens, idx, options, env):
+        return '</a>'
+
+    def image(self, tokens, idx, options, env):
+        token = tokens[idx]
+        alt = token.children[0].content if token.children else ''
+        # mistletoe always emits the title attribute on images
+        return env['bloggy'].image_html(token.attrGet('src') or '', alt, token.attrGet('title') or '')
+
+    def footnote_ref(self, tokens, idx, options, env):
+        return env['bloggy'].sidenote_html(tokens[idx].meta['target'])
+
+    def youtube(self, tokens, idx, options, env):
+        meta = tokens[idx].meta
+        return env['bloggy'].youtube_html(meta['video_id'], meta['caption'])
+
+    def code_attr(self, tokens, idx, options, env):
+        meta = tokens[idx].meta
+        return env['bloggy'].inline_code_attr_html(meta['code'], meta['attrs'])
+
+    def sup(self, tokens, idx, options, env):
+        return f'<sup>{tokens[idx].meta["content"]}</sup>'
+
+    def sub(self, tokens, idx, options, env):
+        return f'<sub>{tokens[idx].meta["content"]}</sub>'
+
+    def math(self, tokens, idx, options, env):
+        meta = tokens[idx].meta
+        return env['bloggy'].math_html(meta['latex'], meta['display'])
+
+
+@lru_cache(maxsize=1)
+def _parser():
+    md = MarkdownIt('commonmark', {'html': True}, renderer_cls=_BloggyRenderer).enable(['table', 'strikethrough'])
+    # Link targets are used as written, like mistletoe; the engine's link markup resolves them
+    md.normalizeLink = lambda url: url
+    inline = md.inline.ruler
+    inline.before('backticks', 'code_attr', _inline_rule('code_attr', '`', _CODE_ATTR_RE, lambda m: {'code': m.group(1), 'attrs': m.group(2)}))
+    inline.before('backticks', 'math', _math_rule)
+    inline.before('link', 'footnote_ref', _inline_rule('footnote_ref', '[', _FOOTNOTE_REF_RE, lambda m: {'target': m.group(1)}))
+    inline.before('link', 'youtube', _inline_rule('youtube', '[', _YOUTUBE_RE, lambda m: {'video_id': m.group(1), 'caption': m.group(2) or None}))
+    inline.before('emphasis', 'sup', _inline_rule('sup', '^', _SUPERSCRIPT_RE, lambda m: {'content': m.group(1)}))
+    inline.after('strikethrough', 'sub', _inline_rule('sub', '~', _SUBSCRIPT_RE, lambda m: {'content': m.group(1)}))
+    return md
+
+
+class _MarkdownItDocument(ContentMarkup):
+    """Per-render document state for the markdown-it engine"""
+
+    def __init__(self, md, img_dir=None, footnotes=None, current_path=None, tab_data_store=None):
+        self.md = md
+        self.class_map = CONTENT_CLASS_MAP
+        self.img_dir = img_dir
+        self.footnotes = footnotes or {}
+        self.tab_data_store = tab_data_store or {}
+        self._open_footnotes = set()
+        self.current_path = current_path
+        self.toc = []
+        self.env = {'bloggy': self}
+        self.reset_document_state()
+
+    def render_fragment(self, content):
+        return self.md.renderer.render(self.md.parse(content, self.env), self.md.options, self.env)
+
+
+@register_engine
+class MarkdownItEngine(MarkdownEngine):
+    """markdown-it-py with Bloggy's syntax added as inline rules"""
+    name = 'markdown-it'
+
+    @classmethod
+    def available(cls):
+        return MarkdownIt is not None
+
+    def render(self, content, footnotes, tab_data_store, img_dir=None, current_path=None, block_cache=None):
+        doc = _MarkdownItDocument(_parser(), img_dir, footnotes, current_path, tab_data_store)
+        return doc.render_fragment(content), doc.toc
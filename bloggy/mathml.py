@@ -0,0 +1,40 @@
+"""Server-side math rendering for Bloggy.
+
+By default `$...$` and `$$...$$` are typeset in the browser by KaTeX
+auto-render, which scans the whole page on every load and HTMX swap. With
+`math_rendering = "server"` they are converted to MathML while the markdown
+renders instead. Expressions the converter cannot handle are left for KaTeX,
+which `scripts.js` then loads only on pages that contain them. latex2mathml is
+an optional dependency; without it Bloggy keeps rendering math in the browser.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+try:
+    from latex2mathml.converter import convert as _latex_to_mathml
+except ImportError:  # pragma: no cover - depends on the environment
+    _latex_to_mathml = None
+
+# Commands latex2mathml does not know come back as literal text such as <mi>\foo</mi>
+_UNCONVERTED_COMMAND_RE = re.compile(r'>\\[A-Za-z]')
+
+
+def mathml_available() -> bool:
+    return _latex_to_mathml is not None
+
+
+@lru_cache(maxsize=4096)
+def latex_to_mathml(latex: str, display: bool = False) -> str | None:
+    """Convert one TeX expression to MathML, or return None if it can't be converted faithfully"""
+    if not mathml_available():
+        return None
+    try:
+        mathml = _latex_to_mathml(latex, display="block" if display else "inline")
+    except Exception:
+        return None
+    if _UNCONVERTED_COMMAND_RE.search(mathml):
+        return None
+    return mathml
@@ -0,0 +1,148 @@
+"""First-page previews of PDFs in the blog.
+
+A PDF's page shows a picture of its first page, with its page count and file
+size, and loads the browser's PDF viewer only when the reader opens it. The
+picture is rendered with pypdfium2 the first time it is requested and kept on
+disk under a name hashed from the PDF's path and mtime, so an edited PDF gets
+a new one. pypdfium2 and Pillow are optional; without them the page shows the
+page count and size only when they can be read, and no picture.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+from .images import pillow_available
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # pragma: no cover - depends on the environment
+    pdfium = None
+
+# Width in pixels of rendered first pages; about twice the post column on phones
+PREVIEW_WIDTH = 800
+_SAVE_OPTIONS = {
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+}
+
+PdfInfo = namedtuple("PdfInfo", "pages width height size mtime_ns")
+
+# PDFium is not thread-safe, so every call into it holds this lock
+_pdfium_lock = threading.Lock()
+
+
+def preview_available() -> bool:
+    return pdfium is not None and pillow_available()
+
+
+@lru_cache(maxsize=1024)
+def _pdf_info(path: str, mtime_ns: int, size: int):
+    width = height = pages = None
+    if pdfium is not None:
+        try:
+            with _pdfium_lock:
+                pdf = pdfium.PdfDocument(path)
+                try:
+                    pages = len(pdf)
+                    if pages:
+                        page_width, page_height = pdf.get_page_size(0)
+                        # PDFium rounds rendered sizes up
+                        width, height = PREVIEW_WIDTH, max(1, math.ceil(page_height * PREVIEW_WIDTH / page_width))
+                finally:
+                    pdf.close()
+        except Exception:
+            width = height = pages = None
+    return PdfInfo(pages, width, height, size, mtime_ns)
+
+
+def pdf_info(path: Path):
+    """`PdfInfo` of the PDF at `path`, or None if it can't be read
+
+    `pages`, `width` and `height` (of the preview) are None without pypdfium2
+    or when the file doesn't parse. Results are memoized on path and mtime.
+    """
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return _pdf_info(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def format_size(size: int) -> str:
+    """`size` in bytes as a short human-readable string, e.g. `1.4 MB`"""
+    for unit in ("bytes", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class PdfPreviews:
+    """First pages of PDFs rendered to images, written once to `directory` and reused
+
+    Files are written to a temporary name and renamed into place, so several
+    workers can share the directory.
+    """
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _path(self, source: Path, mtime_ns: int, fmt: str) -> Path:
+        key = f"{source.resolve()}\0{mtime_ns}\0{PREVIEW_WIDTH}\0{fmt}"
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.{fmt}"
+
+    def get(self, source: Path, fmt: str) -> Path | None:
+        """Path of the first page of `source` rendered in `fmt`, created on first use"""
+        if not preview_available():
+            return None
+        try:
+            mtime_ns = source.stat().st_mtime_ns
+        except OSError:
+            return None
+        path = self._path(source, mtime_ns, fmt)
+        if path.exists():
+            return path
+        # One render per preview even when several readers open the PDF at once
+        with self._locks_lock:
+            lock = self._locks.setdefault(path, threading.Lock())
+        try:
+            with lock:
+                if not path.exists():
+                    self._write(source, path, fmt)
+        finally:
+            with self._locks_lock:
+                self._locks.pop(path, None)
+        return path if path.exists() else None
+
+    def _write(self, source: Path, path: Path, fmt: str):
+        tmp_path = None
+        try:
+            with _pdfium_lock:
+                pdf = pdfium.PdfDocument(str(source))
+                try:
+                    page = pdf[0]
+                    image = page.render(scale=PREVIEW_WIDTH / page.get_width()).to_pil()
+                    page.close()
+                finally:
+                    pdf.close()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=f".{fmt}")
+            with os.fdopen(fd, "wb") as f:
+                image.convert("RGB").save(f, format=fmt.upper(), **_SAVE_OPTIONS[fmt])
+            os.replace(tmp_path, path)
+        except Exception:
+            if tmp_path:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
@@ -0,0 +1,241 @@
+"""Rendered-markdown caching for Bloggy.
+
+`from_md()` is the most expensive step of serving a post. This module keeps
+its output in memory, keyed on the source content hash, the post path and a
+renderer version stamp, so repeat requests skip markdown rendering entirely.
+An optional on-disk tier lets restarted servers and sibling uvicorn workers
+reuse each other's renders.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from . import __version__
+
+# Bump when rendered output changes without a package version bump.
+RENDER_REVISION = 9
+RENDERER_VERSION = f"{__version__}+r{RENDER_REVISION}"
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DISK_MAX_BYTES = 512 * 1024 * 1024
+
+# Names of the per-version subdirectories `DiskRenderCache` writes to
+_VERSION_DIR_RE = re.compile(r"^\d+(\.\d+)*\+r\d+$")
+
+
+def content_hash(content: str) -> str:
+    """Stable digest of markdown source used in render cache keys."""
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def render_cache_key(content: str, current_path=None, img_dir=None, variant: str = "") -> tuple:
+    """`variant` names render options that change the output, e.g. server-side highlighting."""
+    return (content_hash(content), current_path or "", img_dir or "", variant, RENDERER_VERSION)
+
+
+def _entry_size(value) -> int:
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_entry_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class DiskRenderCache:
+    """Render cache persisted as one JSON file per entry, bounded by total bytes.
+
+    Writes go to a temporary file that is atomically renamed into place, so
+    concurrent workers never observe partial entries and the last writer wins.
+    Entries live under a per-version subdirectory; directories left behind by
+    older Bloggy versions are deleted when the cache is opened.
+
+    Reads bump an entry's access time. Once the entries add up to more than
+    `max_bytes` (0 for no limit), the least recently read are deleted until
+    they fit in three quarters of it. Each worker counts its own writes and
+    rescans the directory when pruning, so workers sharing it stay in bounds.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int = DEFAULT_DISK_MAX_BYTES):
+        self.directory = Path(directory) / RENDERER_VERSION
+        self.max_bytes = max(0, int(max_bytes))
+        self._prune_lock = threading.Lock()
+        self.remove_stale_versions()
+        self.total_bytes = sum(size for _, _, size in self._files())
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            self.prune()
+
+    def _path(self, key) -> Path:
+        digest = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.json"
+
+    def remove_stale_versions(self):
+        """Delete the subdirectories written by other renderer versions"""
+        try:
+            entries = list(os.scandir(self.directory.parent))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name != RENDERER_VERSION and _VERSION_DIR_RE.match(entry.name) and entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _files(self):
+        """(access time, path, size) of every entry"""
+        files = []
+        try:
+            shards = list(os.scandir(self.directory))
+        except OSError:
+            return files
+        for shard in shards:
+            if not shard.is_dir(follow_symlinks=False):
+                continue
+            try:
+                with os.scandir(shard.path) as it:
+                    for entry in it:
+                        if entry.name.endswith(".json") and not entry.name.startswith(".tmp-"):
+                            stat = entry.stat(follow_symlinks=False)
+                            files.append((stat.st_atime, entry.path, stat.st_size))
+            except OSError:
+                continue
+        return files
+
+    def prune(self):
+        """Delete the least recently read entries until the rest fit in three quarters of `max_bytes`"""
+        if not self._prune_lock.acquire(blocking=False):
+            return  # Another thread is pruning already
+        try:
+            files = sorted(self._files())
+            total = sum(size for _, _, size in files)
+            target = self.max_bytes * 3 // 4
+            for _, path, size in files:
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except OSError:
+                    continue
+                total -= size
+            self.total_bytes = total
+        finally:
+            self._prune_lock.release()
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            value = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        try:
+            # Mounts with relatime/noatime don't track reads, so record this one
+            os.utime(path, (time.time(), path.stat().st_mtime))
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp_path = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=".json")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+        self.total_bytes += size
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            self.prune()
+
+
+class RenderCache:
+    """Thread-safe LRU cache of rendered HTML, bounded by total bytes.
+
+    When a `DiskRenderCache` is attached, memory misses fall through to disk
+    and new entries are written through to it.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, disk: DiskRenderCache | None = None):
+        self.max_bytes = max(0, int(max_bytes))
+        self.disk = disk
+        self._entries: OrderedDict = OrderedDict()
+        self._sizes: dict = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._store(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value, persist: bool = True):
+        """Cache `value`; with `persist` off it stays out of the disk tier"""
+        self._store(key, value)
+        if persist and self.disk is not None:
+            self.disk.set(key, value)
+
+    def _store(self, key, value):
+        size = _entry_size(value)
+        # Entries larger than the whole budget would just evict everything else
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._sizes.pop(key)
+                del self._entries[key]
+            self._entries[key] = value
+            self._sizes[key] = size
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and self._entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self.total_bytes -= self._sizes.pop(old_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
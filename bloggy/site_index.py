@@ -0,0 +1,234 @@
+"""In-memory index of the blog's files for Bloggy.
+
+The sidebar, search, home page and post listings all need to know which
+posts exist. Rather than walking the blog root on each request, they read a
+`SiteSnapshot`: the posts (`.md` and `.pdf`) with their mtimes and frontmatter
+titles, each folder's entries and folder note, the home page file and the
+`.bloggy` folder configs.
+
+`SiteIndex` builds the snapshot once, then keeps it current with a watchfiles
+watcher thread, which the app starts from its startup hook. On each batch of
+changes it walks the tree again, reusing the titles and configs of files whose
+mtime didn't change, and publishes a new snapshot with a higher `version`.
+Outside the server (`bloggy build`, the agent tools), or when the watcher
+stops, every `snapshot()` call walks the tree once.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+from pathlib import Path
+
+import watchfiles
+from loguru import logger
+
+from .helpers import _cached_bloggy_config, _normalize_bloggy_config, parse_frontmatter
+
+POST_SUFFIXES = ('.md', '.pdf')
+
+
+def _is_relevant(path: str) -> bool:
+    """Whether a change to `path` can change the index: posts, `.bloggy` files and folders"""
+    name = os.path.basename(path)
+    return name == '.bloggy' or name.lower().endswith(POST_SUFFIXES) or '.' not in name
+
+
+class SiteSnapshot:
+    """The blog's posts and folders at one point in time. Never modified once built"""
+
+    def __init__(self, root: Path, version: int, previous: SiteSnapshot | None = None):
+        self.root = root
+        self.version = version
+        self.mtimes = {}       # post path -> mtime
+        self.titles = {}       # .md path -> frontmatter title or None
+        self.children = {}     # folder -> its visible subfolders and posts
+        self.folder_notes = {} # folder -> folder note file or None
+        self.configs = {}      # folder -> (mtime, normalized .bloggy config)
+        self._scan(previous)
+        # Changes when any post or .bloggy file is added, removed, renamed or modified
+        self.fingerprint = hash((frozenset(self.mtimes.items()),
+                                 frozenset((folder, mtime) for folder, (mtime, _) in self.configs.items())))
+
+    def _scan(self, previous):
+        # Hidden folders are skipped, like in the sidebar; hidden files are kept
+        # and filtered by the callers that hide them. Symlinked folders are
+        # followed once, so a link cycle can't loop forever
+        stack = [self.root]
+        seen = set()
+        while stack:
+            folder = stack.pop()
+            try:
+                real = os.path.realpath(folder)
+            except OSError:
+                continue
+            if real in seen:
+                self.children[folder] = ()
+                self.folder_notes[folder] = None
+                continue
+            seen.add(real)
+            entries = []
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        path = folder / entry.name
+                        if entry.name == '.bloggy':
+                            self._add_config(folder, path, previous)
+                        elif entry.is_dir():
+                            if not entry.name.startswith('.'):
+                                entries.append(path)
+                                stack.append(path)
+                        elif entry.name.lower().endswith(POST_SUFFIXES) and entry.is_file():
+                            entries.append(path)
+                            self._add_post(path, entry.stat().st_mtime, previous)
+            except OSError:
+                continue
+            self.children[folder] = tuple(entries)
+            self.folder_notes[folder] = self._find_folder_note(folder, entries)
+
+    def _add_post(self, path, mtime, previous):
+        self.mtimes[path] = mtime
+        if path.suffix.lower() != '.md':
+            return
+        if previous is not None and previous.mtimes.get(path) == mtime:
+            self.titles[path] = previous.titles.get(path)
+            return
+        try:
+            metadata, _ = parse_frontmatter(path)
+        except Exception:
+            metadata = {}
+        self.titles[path] = metadata.get('title')
+
+    def _add_config(self, folder, path, previous):
+        try:
+            mtime = path.stat().st_mtime
+        except OSError:
+            return
+        cached = previous.configs.get(folder) if previous is not None else None
+        if cached is not None and cached[0] == mtime:
+            self.configs[folder] = cached
+        else:
+            self.configs[folder] = (mtime, _normalize_bloggy_config(_cached_bloggy_config(str(path), mtime)))
+
+    @staticmethod
+    def _find_folder_note(folder, entries):
+        # Same preference as `find_folder_note_file`: index.md, then readme.md, then <folder>.md
+        notes = {}
+        for item in entries:
+            if item.suffix.lower() == '.md':
+                notes.setdefault(item.stem.lower(), item)
+        return notes.get('index') or notes.get('readme') or notes.get(folder.name.lower())
+
+    @property
+    def index_file(self) -> Path | None:
+        """The root's index.md, else its readme.md (case insensitive), used as the home page"""
+        posts = [item for item in self.children.get(self.root, ()) if item.suffix == '.md']
+        for stem in ('index', 'readme'):
+            for item in posts:
+                if item.stem.lower() == stem:
+                    return item
+        return None
+
+    def is_dir(self, path: Path) -> bool:
+        return path in self.children
+
+    def posts(self):
+        """Paths of every post, in a stable order"""
+        return sorted(self.mtimes)
+
+    def config(self, folder: Path) -> dict:
+        cached = self.configs.get(folder)
+        return cached[1] if cached is not None else _normalize_bloggy_config({})
+
+    def title(self, path: Path, abbreviations=None) -> str:
+        """Title of the post at `path`: its frontmatter title, else one derived from the file name"""
+        from .helpers import slug_to_title
+        title = self.titles.get(path)
+        return title if title is not None else slug_to_title(path.stem, abbreviations=abbreviations)
+
+
+class SiteIndex:
+    """The latest `SiteSnapshot` of the blog at `root`, kept current by a file watcher once `watch()` starts it"""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root).resolve()
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watching = False
+        self._watcher = None
+
+    def watch(self):
+        """Start the watcher thread, unless it is running already"""
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._stop = threading.Event()
+            self._watcher = threading.Thread(target=self._watch, args=(self._stop,), name='bloggy-site-index', daemon=True)
+            self._watching = True
+            self._watcher.start()
+
+    def snapshot(self) -> SiteSnapshot:
+        """The current snapshot; without a watcher, a fresh one"""
+        snapshot = self._snapshot
+        if snapshot is not None and self._watching:
+            return snapshot
+        return self.refresh(only_if_missing=self._watching)
+
+    def refresh(self, only_if_missing=False) -> SiteSnapshot:
+        """Walk the tree again and publish the result"""
+        with self._lock:
+            previous = self._snapshot
+            if only_if_missing and previous is not None:
+                return previous
+            version = previous.version + 1 if previous is not None else 1
+            snapshot = SiteSnapshot(self.root, version, previous)
+            self._snapshot = snapshot
+        return snapshot
+
+    def close(self):
+        """Stop the watcher; later snapshots walk the tree again"""
+        self._stop.set()
+        self._watching = False
+        if self._watcher is not None and self._watcher is not threading.current_thread():
+            self._watcher.join(timeout=1)
+
+    def _watch(self, stop):
+        ready = False
+        try:
+            # The first (possibly empty) batch arrives once the watcher is running.
+            # A snapshot built before then may have missed changes, so it is rebuilt
+            for changes in watchfiles.watch(self.root, watch_filter=lambda _, path: _is_relevant(path),
+                                            stop_event=stop, yield_on_timeout=True):
+                if changes or (not ready and self._snapshot is not None):
+                    logger.debug(f"[DEBUG] Site index: {len(changes)} change(s), rescanning")
+                    self.refresh()
+                ready = True
+        except Exception as e:
+            logger.warning(f"Site index watcher stopped ({e}); rescanning the blog on every request")
+        if stop is self._stop:
+            self._watching = False
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_site_index(root: str | Path) -> SiteIndex:
+    """Process-wide `SiteIndex` of the blog at `root`"""
+    root = Path(root).resolve()
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = SiteIndex(root)
+    return index
+
+
+@atexit.register
+def _close_indexes():
+    # The watcher threads run native code, which must stop before the interpreter shuts down
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.close()
@@ -46,10 +46,10 @@ function handleCodeCopyClick(event) {
     event.preventDefault();
     event.stopPropagation();
     const container = button.closest('.code-block') || button.closest('pre') || button.parentElement;
-    const textarea = container ? container.querySelector('textarea[id$="-clipboard"]') : null;
     let text = '';
-    if (textarea && textarea.value) {
-        text = textarea.value;
+    if (container && container.dataset.code !== undefined) {
+        // Blocks rendered as raw HTML carry their source in data-code
+        text = container.dataset.code;
     } else {
         const codeEl = (container && container.querySelector('pre > code')) ||
             (container && container.querySelector('code')) ||
@@ -104,6 +104,122 @@ function handleCodeCopyClick(event) {
 
 document.addEventListener('click', handleCodeCopyClick, true);
 
+// The post's "Copy raw markdown" button fetches the source on demand from the
+// versioned `/posts/{path}.md?v=<mtime>` URL, which the browser may cache.
+function showRawMarkdownToast() {
+    const toast = document.getElementById('raw-md-toast');
+    if (!toast) {
+        return;
+    }
+    toast.classList.remove('opacity-0');
+    toast.classList.add('opacity-100');
+    setTimeout(() => {
+        toast.classList.remove('opacity-100');
+        toast.classList.add('opacity-0');
+    }, 1400);
+}
+
+function fetchRawMarkdown(src) {
+    return fetch(src, { credentials: 'same-origin' }).then(response => {
+        if (!response.ok) {
+            throw new Error(`Failed to load ${src}: ${response.status}`);
+        }
+        return response.text();
+    });
+}
+
+function handleRawMarkdownCopyClick(event) {
+    const button = event.target.closest('[data-raw-md-src]');
+    if (!button) {
+        return;
+    }
+    event.preventDefault();
+    const src = button.dataset.rawMdSrc;
+    if (navigator.clipboard && window.isSecureContext && window.ClipboardItem) {
+        // Hand the pending fetch to the clipboard so the write keeps the click's user activation
+        const blob = fetchRawMarkdown(src).then(text => new Blob([text], { type: 'text/plain' }));
+        navigator.clipboard.write([new ClipboardItem({ 'text/plain': blob })])
+            .then(showRawMarkdownToast)
+            .catch(error => console.error('Copy raw markdown failed', error));
+        return;
+    }
+    fetchRawMarkdown(src).then(text => {
+        if (navigator.clipboard && window.isSecureContext) {
+            return navigator.clipboard.writeText(text);
+        }
+        const textarea = document.createElement('textarea');
+        textarea.value = text;
+        textarea.setAttribute('readonly', '');
+        textarea.style.position = 'absolute';
+        textarea.style.left = '-9999px';
+        document.body.appendChild(textarea);
+        textarea.select();
+        document.execCommand('copy');
+        document.body.removeChild(textarea);
+    }).then(showRawMarkdownToast).catch(error => console.error('Copy raw markdown failed', error));
+}
+
+document.addEventListener('click', handleRawMarkdownCopyClick);
+
+const MERMAID_ACTIONS = {
+    'fullscreen': id => window.openMermaidFullscreen(id),
+    'reset': id => window.resetMermaidZoom(id),
+    'zoom-in': id => window.zoomMermaidIn(id),
+    'zoom-out': id => window.zoomMermaidOut(id)
+};
+
+function handleMermaidControlClick(event) {
+    const button = event.target.closest('[data-mermaid-action]');
+    if (!button) {
+        return;
+    }
+    const controls = button.closest('[data-mermaid-target]');
+    const action = MERMAID_ACTIONS[button.dataset.mermaidAction];
+    if (!controls || !action) {
+        return;
+    }
+    event.preventDefault();
+    action(controls.dataset.mermaidTarget);
+}
+
+document.addEventListener('click', handleMermaidControlClick);
+
+// YouTube embeds arrive as a poster linking to the video; the player (and
+// YouTube's scripts) load only when the reader clicks it
+function handleYoutubeFacadeClick(event) {
+    const facade = event.target.closest('.youtube-facade[data-youtube-id]');
+    if (!facade) {
+        return;
+    }
+    event.preventDefault();
+    const iframe = document.createElement('iframe');
+    iframe.src = `https://www.youtube.com/embed/${encodeURIComponent(facade.dataset.youtubeId)}?autoplay=1`;
+    iframe.title = 'YouTube video';
+    iframe.allow = 'accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture';
+    iframe.allowFullscreen = true;
+    iframe.className = 'absolute inset-0 w-full h-full border-0';
+    facade.replaceWith(iframe);
+    iframe.focus();
+}
+
+document.addEventListener('click', handleYoutubeFacadeClick);
+
+// Diagram source is only sent once, inside <pre class="mermaid">. Keep an escaped
+// copy on the wrapper before mermaid replaces it with an SVG, for re-renders and fullscreen.
+function captureMermaidSources(rootElement = document) {
+    rootElement.querySelectorAll('.mermaid-wrapper').forEach(wrapper => {
+        if (wrapper.hasAttribute('data-mermaid-code')) {
+            return;
+        }
+        const pre = wrapper.querySelector('pre.mermaid');
+        if (!pre || pre.getAttribute('data-processed')) {
+            return;
+        }
+        const escaped = pre.textContent.replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+        wrapper.setAttribute('data-mermaid-code', escaped);
+    });
+}
+
 function initMermaidInteraction() {
     const wrappers = Array.from(document.querySelectorAll('.mermaid-wrapper'));
     if (mermaidDebugEnabled()) {
@@ -546,6 +662,7 @@ let isInitialLoad = true;
 // Initialize interaction after mermaid renders
 document.addEventListener('DOMContentLoaded', () => {
     mermaidDebugSnapshot('before mermaid.run (DOMContentLoaded)');
+    captureMermaidSources();
     mermaid.run().then(() => {
         mermaidDebugSnapshot('after mermaid.run (DOMContentLoaded)');
         console.log('Initial mermaid render complete');
@@ -991,6 +1108,7 @@ document.body.addEventListener('htmx:afterSwap', function(event) {
         delete mermaidStates[wrapper.id];
         delete wrapper.dataset.mermaidInteractive;
     });
+    captureMermaidSources();
     mermaid.run().then(() => {
         mermaidDebugSnapshot('after mermaid.run (htmx:afterSwap)');
         scheduleMermaidInteraction();
@@ -1151,13 +1269,48 @@ function ensurePdfFocusState() {
     syncPdfFocusButtons(document);
 }
 
+// PDF pages show a preview of the first page; the PDF itself downloads only
+// once the viewer is opened from it
+function openPdfViewer(preview) {
+    const link = preview.querySelector('[data-pdf-viewer-src]');
+    if (!link) {
+        return;
+    }
+    const src = link.dataset.pdfViewerSrc;
+    const viewer = document.createElement('object');
+    viewer.data = src;
+    viewer.type = 'application/pdf';
+    viewer.className = 'pdf-viewer w-full h-[calc(100vh-14rem)] rounded-lg border border-slate-200 dark:border-slate-700 bg-white dark:bg-slate-900';
+    const fallback = document.createElement('p');
+    fallback.className = 'p-4 text-sm text-slate-600 dark:text-slate-300';
+    fallback.append('PDF preview not available. ');
+    const download = document.createElement('a');
+    download.href = src;
+    download.className = 'text-blue-600 hover:underline';
+    download.textContent = 'Download PDF';
+    fallback.append(download, '.');
+    viewer.appendChild(fallback);
+    preview.replaceWith(viewer);
+}
+
 function initPdfFocusToggle() {
     document.addEventListener('click', (event) => {
+        const link = event.target.closest('.pdf-preview [data-pdf-viewer-src]');
+        if (link) {
+            event.preventDefault();
+            openPdfViewer(link.closest('.pdf-preview'));
+            return;
+        }
         const button = event.target.closest('[data-pdf-focus-toggle]');
         if (!button) {
             return;
         }
         event.preventDefault();
+        // Focus mode is for reading, so it opens the viewer too
+        const preview = document.querySelector('.pdf-preview');
+        if (preview && !document.body.classList.contains('pdf-focus')) {
+            openPdfViewer(preview);
+        }
         document.body.classList.toggle('pdf-focus');
         syncPdfFocusButtons(document);
     });
@@ -1174,6 +1327,48 @@ function initPdfFocusToggle() {
     });
 }
 
+// With server-side math, expressions the MathML converter could not handle are
+// left as .math-fallback spans; KaTeX is loaded only for pages that contain them.
+const KATEX_BASE = 'https://cdn.jsdelivr.net/npm/katex@0.16.9/dist';
+let katexLoading = null;
+
+function loadKatex() {
+    if (window.katex) {
+        return Promise.resolve();
+    }
+    if (!katexLoading) {
+        katexLoading = new Promise((resolve, reject) => {
+            const link = document.createElement('link');
+            link.rel = 'stylesheet';
+            link.href = `${KATEX_BASE}/katex.min.css`;
+            document.head.appendChild(link);
+            const script = document.createElement('script');
+            script.src = `${KATEX_BASE}/katex.min.js`;
+            script.onload = resolve;
+            script.onerror = reject;
+            document.head.appendChild(script);
+        });
+    }
+    return katexLoading;
+}
+
+function renderMathFallbacks(rootElement = document) {
+    const pending = rootElement.querySelectorAll('.math-fallback:not([data-math-rendered])');
+    if (!pending.length) {
+        return;
+    }
+    loadKatex().then(() => {
+        pending.forEach(el => {
+            const source = el.textContent;
+            el.setAttribute('data-math-rendered', 'true');
+            window.katex.render(source, el, {
+                displayMode: el.dataset.display === 'true',
+                throwOnError: false
+            });
+        });
+    }).catch(error => console.error('Failed to load KaTeX', error));
+}
+
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', () => {
     updateActivePostLink();
@@ -1187,6 +1382,7 @@ document.addEventListener('DOMContentLoaded', () => {
     initPostsSearchPersistence(document);
     initCodeBlockCopyButtons(document);
     initSearchClearButtons(document);
+    renderMathFallbacks(document);
     ensurePdfFocusState();
 });
 
@@ -1198,5 +1394,6 @@ document.body.addEventListener('htmx:afterSwap', (event) => {
     initPostsSearchPersistence(event.target);
     initCodeBlockCopyButtons(event.target);
     initSearchClearButtons(event.target);
+    renderMathFallbacks(event.target);
     ensurePdfFocusState();
 });
@@ -0,0 +1,172 @@
+"""Note transclusion for Bloggy.
+
+A line holding only `![[note]]` embeds another post, and `![[note#Heading]]`
+one section of it. `preprocess_markdown` swaps the line for a placeholder that
+`ContentMarkup` renders in place, like a :::tabs group.
+
+Rendered HTML then depends on files other than the post itself, so
+`EmbedGraph` records which posts embed which. `EmbedGraph.stamp()` summarizes
+the notes a post embeds, directly or through other embeds, with their mtimes.
+Render cache keys include it, so editing a note re-renders only the posts that
+embed it. The graph also remembers the images each note shows, whose files
+an embedding post's HTML depends on as well.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import html
+import posixpath
+import re
+import threading
+from collections import deque
+from pathlib import Path
+
+from .images import image_sources
+
+# Nested embeds deeper than this are shown as a link instead of rendered
+MAX_EMBED_DEPTH = 4
+
+EMBED_LINE_RE = re.compile(r'^ {0,3}!\[\[([^\[\]|\n]+)\]\]\s*$')
+EMBED_PLACEHOLDER_RE = re.compile(r'<div class="embed-placeholder" data-embed="([^"]*)"></div>')
+_EMBED_SCAN_RE = re.compile(r'^ {0,3}!\[\[([^\[\]|\n]+)\]\]\s*$', re.MULTILINE)
+_HEADING_RE = re.compile(r'^ {0,3}(#{1,6})\s+(.+?)\s*#*\s*$')
+_FENCE_RE = re.compile(r'^\s*(`{3,}|~{3,})')
+
+
+def embed_placeholder(target):
+    return f'<div class="embed-placeholder" data-embed="{html.escape(target)}"></div>'
+
+
+def split_target(target):
+    """(note, heading or None) of an embed target such as `note#Heading`"""
+    note, _, heading = html.unescape(target).partition('#')
+    return note.strip(), heading.strip() or None
+
+
+def resolve_note(root, current_path, note):
+    """Post path (relative to `root`, without `.md`) of `note` embedded in the post at `current_path`
+
+    `note` is looked up next to the embedding post first, then from the blog
+    root. Returns None when neither exists or the path leaves the root.
+    """
+    note = note.removesuffix('.md')
+    candidates = []
+    if current_path and not note.startswith('/'):
+        candidates.append(posixpath.join(posixpath.dirname(current_path), note))
+    candidates.append(note.lstrip('/'))
+    for candidate in candidates:
+        rel = posixpath.normpath(candidate)
+        if rel.startswith('..') or rel == '.':
+            continue
+        if (Path(root) / f'{rel}.md').is_file():
+            return rel
+    return None
+
+
+def extract_section(content, heading):
+    """The part of `content` under the heading whose text or anchor is `heading`, or None
+
+    The section runs to the next heading of the same or a higher level.
+    """
+    from .helpers import _strip_inline_markdown, text_to_anchor
+    wanted = text_to_anchor(heading)
+    lines = content.split('\n')
+    start = level = None
+    fence = None
+    for i, line in enumerate(lines):
+        fence_match = _FENCE_RE.match(line)
+        if fence is not None:
+            if line.strip().startswith(fence):
+                fence = None
+            continue
+        if fence_match:
+            fence = fence_match.group(1)
+            continue
+        match = _HEADING_RE.match(line)
+        if not match:
+            continue
+        if start is not None and len(match.group(1)) <= level:
+            return '\n'.join(lines[start:i])
+        if start is None and text_to_anchor(_strip_inline_markdown(match.group(2))) == wanted:
+            start, level = i, len(match.group(1))
+    return '\n'.join(lines[start:]) if start is not None else None
+
+
+class EmbedGraph:
+    """Which posts embed which, read from the `![[...]]` lines of their source
+
+    A post's embeds are rescanned when its mtime changes.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._edges = {}  # post path -> (mtime_ns, embedded post paths or unresolved notes, image sources)
+        self._lock = threading.Lock()
+
+    def _mtime_ns(self, path):
+        try:
+            return (self.root / f'{path}.md').stat().st_mtime_ns
+        except OSError:
+            return 0
+
+    def _edge(self, path):
+        mtime = self._mtime_ns(path)
+        with self._lock:
+            cached = self._edges.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached
+        try:
+            content = (self.root / f'{path}.md').read_text(encoding='utf-8')
+        except (OSError, UnicodeDecodeError):
+            content = ''
+        edge = (mtime, self.scan(content, path), image_sources(content))
+        with self._lock:
+            self._edges[path] = edge
+        return edge
+
+    def embeds(self, path):
+        """Notes the post at `path` embeds directly, as post paths when they resolve"""
+        return self._edge(path)[1]
+
+    def images(self, path):
+        """`src` of the images the post at `path` shows, as `image_sources` finds them"""
+        return self._edge(path)[2]
+
+    def scan(self, content, current_path):
+        """Notes embedded by markdown `content` of the post at `current_path`"""
+        if '![[' not in content:
+            return ()
+        targets = []
+        for match in _EMBED_SCAN_RE.finditer(content):
+            note, _ = split_target(match.group(1))
+            targets.append(resolve_note(self.root, current_path, note) or f'?{note}')
+        return tuple(dict.fromkeys(targets))
+
+    def dependencies(self, content, current_path):
+        """[(path, mtime_ns)] of every note `content` embeds, through other embeds too, up to `MAX_EMBED_DEPTH`"""
+        seen = {current_path} if current_path else set()
+        deps = []
+        # Breadth first, so each note is reached at the depth the renderer reaches it
+        frontier = deque((target, 1) for target in self.scan(content, current_path))
+        while frontier:
+            path, depth = frontier.popleft()
+            if path in seen:
+                continue
+            seen.add(path)
+            if path.startswith('?'):
+                # Unresolved notes count too: creating one changes the stamp
+                deps.append((path, 0))
+                continue
+            deps.append((path, self._mtime_ns(path)))
+            # Notes one level past the limit are linked, not rendered, but still looked up
+            if depth <= MAX_EMBED_DEPTH:
+                frontier.extend((target, depth + 1) for target in self.embeds(path))
+        return sorted(deps)
+
+    def stamp(self, content, current_path):
+        """Digest of `dependencies`, or '' when `content` embeds nothing"""
+        deps = self.dependencies(content, current_path)
+        if not deps:
+            return ''
+        return hashlib.blake2b(repr(deps).encode('utf-8'), digest_size=8).hexdigest()
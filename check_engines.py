@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""Conformance check of markdown engines against the mistletoe reference
+
+Renders every post under a folder with the reference engine and with each
+candidate engine, normalizes both (whitespace between tags, attribute order,
+entity spelling) and reports the posts whose HTML differs. It also checks
+that each engine renders every post the same through all the entry points
+Bloggy calls: whole (`render`), streamed (`render_chunks`) and section by
+section (`split_sections` and `render_sections`).
+
+Usage:
+    python check_engines.py                          # every installed engine over demo/
+    python check_engines.py markdown-it -v           # show the first difference per post
+    python check_engines.py --root "bloggy manual"
+    python check_engines.py --save golden.json       # snapshot the reference output
+    python check_engines.py --golden golden.json     # compare with a snapshot instead
+"""
+
+import argparse
+import json
+import sys
+from html.parser import HTMLParser
+from pathlib import Path
+
+# Add the current directory to path so we can import bloggy
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bloggy.core import _render_md_html, parse_frontmatter, preprocess_markdown
+from bloggy.engines import DEFAULT_ENGINE, engine_names, get_engine
+
+
+class _Normalizer(HTMLParser):
+    """Flatten HTML into comparable events, ignoring formatting-only differences"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+
+    def handle_starttag(self, tag, attrs):
+        self.events.append(('<', tag, tuple(sorted((k, ' '.join((v or '').split())) for k, v in attrs))))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.events.append(('>', tag))
+
+    def handle_data(self, data):
+        text = ' '.join(data.split())
+        if not text:
+            return
+        if self.events and self.events[-1][0] == 'text':
+            self.events[-1] = ('text', f'{self.events[-1][1]} {text}')
+        else:
+            self.events.append(('text', text))
+
+
+def normalize(html):
+    parser = _Normalizer()
+    parser.feed(html)
+    parser.close()
+    return parser.events
+
+
+def first_difference(expected, actual):
+    """Index and (expected, actual) events where two normalized documents diverge"""
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            return i, a, b
+    if len(expected) != len(actual):
+        i = min(len(expected), len(actual))
+        return i, expected[i] if i < len(expected) else None, actual[i] if i < len(actual) else None
+    return None
+
+
+def render_corpus(root, engine):
+    """{relative path: (html, toc)} for every markdown file under `root`"""
+    outputs = {}
+    for path in sorted(root.rglob('*.md')):
+        rel = path.relative_to(root).with_suffix('').as_posix()
+        _, content = parse_frontmatter(path)
+        html, toc = _render_md_html(content, None, rel, engine=engine)
+        outputs[rel] = (html, [list(heading) for heading in toc])
+    return outputs
+
+
+def entry_point_differences(content, rel, engine):
+    """(entry point, detail) for each way of rendering `content` whose output differs from `engine.render`"""
+    body, footnotes, tab_data_store = preprocess_markdown(content)
+    html, toc = engine.render(body, footnotes, tab_data_store, current_path=rel)
+    differences = []
+    chunks = list(engine.render_chunks(body, footnotes, tab_data_store, current_path=rel))
+    if ''.join(chunk for chunk, _ in chunks) != html:
+        differences.append(('render_chunks', f'{len(chunks)} chunks join into different HTML'))
+    elif [heading for _, headings in chunks for heading in headings] != list(toc):
+        differences.append(('render_chunks', 'chunk TOCs join into a different TOC'))
+    sections = engine.split_sections(body)
+    rendered = list(engine.render_sections(sections, footnotes, tab_data_store, current_path=rel))
+    if ''.join(section for section, _ in rendered) != html:
+        differences.append(('render_sections', f'{len(sections)} sections join into different HTML'))
+        return differences
+    # A later range of sections continues from the state the one before it ended in
+    for i in range(1, len(sections)):
+        tail = engine.render_sections(sections[i:], footnotes, tab_data_store, state=rendered[i - 1][1], current_path=rel)
+        if [section for section, _ in tail] != [section for section, _ in rendered[i:]]:
+            differences.append(('render_sections', f'sections from {i} differ when rendered on their own'))
+            break
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('engines', nargs='*', help='engines to check (default: every installed engine)')
+    parser.add_argument('--root', default='demo', help='folder of posts to render (default: demo)')
+    parser.add_argument('--golden', help='compare with a saved snapshot instead of rendering the reference')
+    parser.add_argument('--save', help='write the reference output to this snapshot file and exit')
+    parser.add_argument('-v', '--verbose', action='store_true', help='show the first difference per post')
+    args = parser.parse_args()
+
+    root = Path(args.root)
+    if args.golden:
+        reference = {rel: tuple(entry) for rel, entry in json.loads(Path(args.golden).read_text()).items()}
+    else:
+        reference = render_corpus(root, get_engine(DEFAULT_ENGINE))
+    if args.save:
+        Path(args.save).write_text(json.dumps(reference, indent=1, sort_keys=True))
+        print(f"Saved {len(reference)} posts to {args.save}")
+        return 0
+
+    names = args.engines or [name for name in engine_names() if name != DEFAULT_ENGINE or args.golden]
+    failed = False
+    for name in names:
+        engine = get_engine(name)
+        if engine is None:
+            print(f"{name}: not installed, skipped")
+            continue
+        outputs = render_corpus(root, engine)
+        mismatches = []
+        for rel, (html, toc) in reference.items():
+            if rel not in outputs:
+                mismatches.append((rel, 'missing'))
+                continue
+            actual_html, actual_toc = outputs[rel]
+            diff = first_difference(normalize(html), normalize(actual_html))
+            if diff is not None:
+                mismatches.append((rel, f'html event {diff[0]}: expected {diff[1]!r}, got {diff[2]!r}'))
+            elif [list(h) for h in toc] != actual_toc:
+                mismatches.append((rel, f'toc: expected {toc!r}, got {actual_toc!r}'))
+        print(f"{name}: {len(reference) - len(mismatches)}/{len(reference)} posts match the reference")
+        for rel, detail in mismatches:
+            print(f"  {rel}" + (f"\n    {detail[:300]}" if args.verbose else ''))
+        failed = failed or bool(mismatches)
+
+    for name in args.engines or engine_names():
+        engine = get_engine(name)
+        if engine is None:
+            continue
+        mismatches = []
+        for path in sorted(root.rglob('*.md')):
+            rel = path.relative_to(root).with_suffix('').as_posix()
+            _, content = parse_frontmatter(path)
+            mismatches.extend((rel, entry_point, detail) for entry_point, detail in entry_point_differences(content, rel, engine))
+        posts = len(list(root.rglob('*.md')))
+        print(f"{name}: {posts - len({rel for rel, _, _ in mismatches})}/{posts} posts render the same through every entry point")
+        for rel, entry_point, detail in mismatches:
+            print(f"  {rel}: {entry_point}" + (f"\n    {detail}" if args.verbose else ''))
+        failed = failed or bool(mismatches)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
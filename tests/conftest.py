@@ -0,0 +1,41 @@
+"""Shared setup for Bloggy's tests.
+
+Bloggy reads its configuration when `bloggy.core` is first imported, so the
+environment is fixed here, before any test module imports it: the demo blog
+is the root, and every render option that changes HTML is at its default.
+Responsive images are off, since their `srcset` carries file mtimes.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO = Path(__file__).resolve().parent.parent
+DEMO = REPO / "demo"
+
+os.environ["BLOGGY_ROOT"] = str(DEMO)
+os.environ["BLOGGY_RESPONSIVE_IMAGES"] = "false"
+for name in ("BLOGGY_RENDER_CACHE_DIR", "BLOGGY_MARKDOWN_ENGINE", "BLOGGY_CODE_HIGHLIGHTING", "BLOGGY_MATH_RENDERING"):
+    os.environ.pop(name, None)
+
+sys.path.insert(0, str(REPO))
+
+
+@pytest.fixture
+def blog(tmp_path, monkeypatch):
+    """An empty blog root in a temporary folder, used in place of the demo, with empty render caches"""
+    from bloggy import core
+    monkeypatch.setenv("BLOGGY_ROOT", str(tmp_path))
+    monkeypatch.setattr(core, "_render_cache", None)
+    monkeypatch.setattr(core, "_block_cache", None)
+    return tmp_path
+
+
+@pytest.fixture
+def client():
+    """A test client for the app; the startup hooks don't run, so no folder is watched"""
+    from starlette.testclient import TestClient
+    from bloggy.core import app
+    return TestClient(app)
@@ -0,0 +1,126 @@
+"""Rendering with the block cache must match a full render, however the post is edited."""
+
+import random
+
+import pytest
+
+from bloggy.core import _render_md_html
+from bloggy.render_cache import RenderCache
+
+from conftest import DEMO
+
+PATH = "fuzz/post"
+
+DOCUMENT = """\
+# Notes
+
+Intro with a sidenote[^a] and ^sup^ / ~sub~ text.
+
+## Setup
+
+Steps follow[^b].
+
+- one
+- two
+
+## Setup
+
+Same heading again, so its anchor gets a suffix.
+
+:::tabs
+::tab{title="Python"}
+```python
+print("hi")
+```
+::tab{title="Notes"}
+A tab citing a note[^a].
+:::
+
+```mermaid
+graph TD; A-->B
+```
+
+![[books/flat-land/chapter-01#Of the Nature of Flatland]]
+
+### Details
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+$$
+x^2 + y^2
+$$
+
+## Setup
+
+Closing paragraph[^c].
+
+[^a]: First note.
+[^b]: Second note
+  spanning lines.
+[^c]: Third note.
+"""
+
+# Lines inserted by the fuzzer: headings that collide, footnote references and
+# definitions, tab and fence markers, embeds, and blocks that merge with neighbours
+INSERTS = [
+    "", "# Setup", "## Setup", "Setup\n-----", "para [^a] x", "para [^new] y", "[^a]: Redefined.", "[^new]: New note.",
+    "- item", "1. one", "> quote", "    indented code", "```", "```js", "~~~", ":::tabs", '::tab{title="A"}', ":::",
+    "![[books/flat-land/chapter-02]]", "![[missing-note]]", "```mermaid", "graph LR; X-->Y", "$$", "---", "===",
+    "<div>", "</div>", "| a | b |", "text ^up^ ~down~",
+]
+
+
+def _edit(rng, lines):
+    lines = list(lines)
+    i = rng.randrange(len(lines) + 1)
+    op = rng.choice("cidm")
+    if op == "c" and i < len(lines):
+        lines[i] += rng.choice([" edited", " [^a]", " [^b]", "!"])
+    elif op == "d" and i < len(lines):
+        del lines[i]
+    elif op == "m" and i < len(lines):
+        j = rng.randrange(len(lines))
+        lines.insert(j, lines.pop(i))
+    else:
+        lines.insert(i, rng.choice(INSERTS))
+    return lines
+
+
+def _assert_matches_full_render(content, cache, path=PATH):
+    expected = _render_md_html(content, None, path)
+    assert _render_md_html(content, None, path, block_cache=cache) == expected
+
+
+def test_cold_and_warm_cache_match_full_render():
+    cache = RenderCache(1 << 26)
+    _assert_matches_full_render(DOCUMENT, cache)
+    _assert_matches_full_render(DOCUMENT, cache)
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_random_edits_match_full_render(seed):
+    rng = random.Random(seed)
+    cache = RenderCache(1 << 26)
+    lines = DOCUMENT.split("\n")
+    _assert_matches_full_render(DOCUMENT, cache)
+    # Edits accumulate, so later renders reuse blocks cached from earlier versions
+    for _ in range(40):
+        lines = _edit(rng, lines)
+        _assert_matches_full_render("\n".join(lines), cache)
+    assert cache.hits, "no block was ever reused"
+
+
+@pytest.mark.parametrize("post", sorted(DEMO.rglob("*.md")), ids=lambda p: p.relative_to(DEMO).as_posix())
+def test_demo_post_edits_match_full_render(post):
+    from bloggy.helpers import parse_frontmatter
+    _, content = parse_frontmatter(post)
+    path = post.relative_to(DEMO).with_suffix("").as_posix()
+    rng = random.Random(path)
+    cache = RenderCache(1 << 26)
+    _assert_matches_full_render(content, cache, path)
+    lines = content.split("\n")
+    for _ in range(10):
+        lines = _edit(rng, lines)
+        _assert_matches_full_render("\n".join(lines), cache, path)
@@ -0,0 +1,79 @@
+"""Golden snapshot of the demo posts, and conformance of every installed engine to it.
+
+`golden/demo.json` is the reference engine's HTML and TOC for each post under
+`demo/`. After a deliberate change to rendered output, regenerate it with
+
+    BLOGGY_ROOT=demo BLOGGY_RESPONSIVE_IMAGES=false python check_engines.py --save tests/golden/demo.json
+"""
+
+import json
+import re
+from pathlib import Path
+
+import pytest
+
+from bloggy.core import _render_md_html, parse_frontmatter
+from bloggy.engines import DEFAULT_ENGINE, MarkdownEngine, engine_names, get_engine, register_engine
+from check_engines import entry_point_differences, first_difference, normalize, render_corpus
+
+from conftest import DEMO
+from test_progressive import large_post
+
+SNAPSHOT = {rel: tuple(entry) for rel, entry in
+            json.loads((Path(__file__).parent / "golden" / "demo.json").read_text(encoding="utf-8")).items()}
+
+
+@pytest.fixture(scope="module", params=sorted(engine_names()))
+def outputs(request):
+    engine = get_engine(request.param)
+    if engine is None:
+        pytest.skip(f"{request.param} is not installed")
+    return request.param, render_corpus(DEMO, engine)
+
+
+def test_snapshot_covers_demo():
+    assert sorted(SNAPSHOT) == sorted(path.relative_to(DEMO).with_suffix("").as_posix() for path in DEMO.rglob("*.md"))
+
+
+@pytest.mark.parametrize("rel", sorted(SNAPSHOT))
+def test_engines_match_snapshot(outputs, rel):
+    name, rendered = outputs
+    html, toc = SNAPSHOT[rel]
+    actual_html, actual_toc = rendered[rel]
+    if name == DEFAULT_ENGINE:
+        # The reference engine must reproduce the snapshot exactly
+        assert actual_html == html
+    else:
+        assert first_difference(normalize(html), normalize(actual_html)) is None
+    assert actual_toc == toc
+
+
+@pytest.mark.parametrize("name", sorted(engine_names()))
+def test_repeated_embeds_get_unique_ids(name):
+    engine = get_engine(name)
+    if engine is None:
+        pytest.skip(f"{name} is not installed")
+    content = "# Twice\n\n![[books/flat-land/chapter-02]]\n\nBetween.\n\n![[books/flat-land/chapter-02]]\n"
+    html, _ = _render_md_html(content, None, "notes/twice", engine=engine)
+    ids = re.findall(r'\bid="([^"]+)"', html)
+    assert len(ids) > 2
+    assert sorted(set(ids)) == sorted(ids)
+
+
+@pytest.mark.parametrize("name", sorted(engine_names()))
+@pytest.mark.parametrize("rel", ["big", *sorted(SNAPSHOT)])
+def test_entry_points_match_render(name, rel):
+    """Streamed and sectioned renders join into the whole render; "big" is long enough for many sections"""
+    engine = get_engine(name)
+    if engine is None:
+        pytest.skip(f"{name} is not installed")
+    content = large_post() if rel == "big" else parse_frontmatter(DEMO / f"{rel}.md")[1]
+    assert entry_point_differences(content, rel, engine) == []
+
+
+def test_partial_engine_is_rejected():
+    with pytest.raises(TypeError, match="render"):
+        @register_engine
+        class Partial(MarkdownEngine):
+            name = "partial"
+    assert "partial" not in engine_names()
@@ -0,0 +1,29 @@
+"""Golden tests of `preprocess_markdown` against the regex pipeline it replaced.
+
+`golden/preprocess.json` holds, for each case, the markdown and the body,
+footnotes and tab groups `preprocess_markdown` returns for it. They were
+checked against the chain of regex passes `from_md` ran before the
+single-pass rewrite (escaped dollars, `extract_footnotes`,
+`preprocess_super_sub`, `preprocess_tabs`, newline preservation). Where
+that chain's output differs on purpose, the case records it under
+`baseline` with the reason.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from bloggy.core import preprocess_markdown
+
+GOLDEN = json.loads((Path(__file__).parent / "golden" / "preprocess.json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("name", sorted(GOLDEN))
+def test_preprocess_matches_golden(name):
+    case = GOLDEN[name]
+    body, footnotes, tab_data_store = preprocess_markdown(case["markdown"])
+    assert body == case["body"]
+    assert footnotes == case["footnotes"]
+    assert {tab_id: [list(tab) for tab in tabs] for tab_id, tabs in tab_data_store.items()} == case["tabs"]
+
@@ -0,0 +1,66 @@
+"""Progressively loaded posts: the first sections come with the page, the rest from `/_sections`."""
+
+import re
+
+import pytest
+
+from bloggy import core
+from bloggy.engines import engine_names, get_engine
+
+LOADER_RE = re.compile(r'<div class="post-sections-loader[^"]*" hx-get="([^"]+)" hx-trigger="revealed" hx-swap="outerHTML">Loading more…</div>')
+
+
+def large_post(sections=8):
+    """Markdown of a post with `sections` level 2 sections, each long enough to load on its own"""
+    parts = ["# Big post\n\nIntro with a sidenote[^intro].\n"]
+    for i in range(sections):
+        prose = " ".join(f"Sentence {j} of section {i}, with *emphasis* and `code`." for j in range(80))
+        parts.append(f"## Section\n\n{prose}[^n{i}]\n\n```mermaid\ngraph TD; A{i}-->B{i}\n```\n")
+        parts.append(f'## Part {i}\n\n:::tabs\n::tab{{title="One"}}\nTab {i}.\n::tab{{title="Two"}}\n- item\n:::\n')
+    parts.append("[^intro]: First note.\n")
+    parts.extend(f"[^n{i}]: Note {i}.\n" for i in range(sections))
+    return "\n".join(parts)
+
+
+@pytest.fixture(params=sorted(engine_names()))
+def engine(request, monkeypatch):
+    engine = get_engine(request.param)
+    if engine is None:
+        pytest.skip(f"{request.param} is not installed")
+    monkeypatch.setattr(core, "_markdown_engine", engine)
+    return engine
+
+
+@pytest.fixture
+def progressive(blog, monkeypatch):
+    monkeypatch.setenv("BLOGGY_PROGRESSIVE_MIN_KB", "1")
+    monkeypatch.setenv("BLOGGY_PROGRESSIVE_SECTIONS", "2")
+    (blog / "big.md").write_text(large_post(), encoding="utf-8")
+    return blog
+
+
+def test_large_post_renders_with_every_engine(engine, progressive, client):
+    page = client.get("/posts/big")
+    assert page.status_code == 200
+    assert "Sentence 0 of section 0" in page.text
+    rest = client.get("/_sections/big?start=0")
+    assert rest.status_code == 200
+    assert "Sentence 79 of section 0" in rest.text
+
+
+def test_sections_join_into_full_render(engine, progressive, client, monkeypatch):
+    page = client.get("/posts/big").text
+    loads = 0
+    while match := LOADER_RE.search(page):
+        src = match.group(1).replace("&amp;", "&")
+        assert f"start={2 * (loads + 1)}&" in src
+        rest = client.get(src)
+        assert rest.status_code == 200
+        page = page[:match.start()] + rest.text + page[match.end():]
+        loads += 1
+    if engine.name == "mistletoe":
+        assert loads >= 3
+    monkeypatch.setenv("BLOGGY_PROGRESSIVE_MIN_KB", "0")
+    monkeypatch.setattr(core, "_render_cache", None)
+    monkeypatch.setattr(core, "_block_cache", None)
+    assert page == client.get("/posts/big").text
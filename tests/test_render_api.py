@@ -0,0 +1,118 @@
+"""Batch rendering through `POST /_render` and `bloggy render`."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bloggy.core import from_md_with_toc
+from fasthtml.common import to_xml
+
+from conftest import REPO
+
+DOCUMENTS = [
+    {"id": "a", "markdown": "---\ntitle: A\n---\n# Hello\n\nText with a note[^n].\n\n[^n]: Note.\n"},
+    "## Just a string\n",
+    {"id": "bad", "markdown": 3},
+]
+
+
+def expected(markdown, path=None):
+    import frontmatter
+    body, toc = from_md_with_toc(frontmatter.loads(markdown).content, current_path=path)
+    return to_xml(body), [list(entry) for entry in toc]
+
+
+@pytest.fixture
+def api(blog, monkeypatch, client):
+    monkeypatch.setenv("BLOGGY_RENDER_API", "true")
+    return client
+
+
+def test_disabled_by_default(blog, client):
+    assert client.post("/_render", json=DOCUMENTS).status_code == 404
+
+
+def test_json_results_in_order(api):
+    response = api.post("/_render", json=DOCUMENTS)
+    assert response.status_code == 200
+    first, second, bad = response.json()
+    assert first["id"] == "a" and [first["html"], first["toc"]] == list(expected(DOCUMENTS[0]["markdown"]))
+    assert second["id"] == 1 and [second["html"], second["toc"]] == list(expected(DOCUMENTS[1]))
+    assert bad == {"id": "bad", "error": '"markdown" must be a string'}
+
+
+def test_ndjson_streams_the_same_results(api):
+    body = "".join(json.dumps(document) + "\n" for document in DOCUMENTS)
+    response = api.post("/_render", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == api.post("/_render", json=DOCUMENTS).json()
+
+
+def test_documents_object_and_path(api, blog):
+    (blog / "guides").mkdir()
+    markdown = "[next](setup)\n"
+    response = api.post("/_render", json={"documents": [{"markdown": markdown, "path": "guides/intro"}]})
+    assert response.json()[0]["html"] == expected(markdown, "guides/intro")[0]
+
+
+def test_bad_body_is_rejected(api):
+    response = api.post("/_render", content=b"not json\n{also not")
+    assert response.status_code == 200  # Each malformed NDJSON line is its own failed document
+    assert all("error" in result for result in response.json())
+    response = api.post("/_render", content=b"")
+    assert response.status_code == 400
+    assert "error" in response.json()
+    response = api.post("/_render", content=b"\xff\xfe")
+    assert response.status_code == 400
+
+
+def test_body_over_limit(api, monkeypatch):
+    monkeypatch.setenv("BLOGGY_RENDER_API_MAX_KB", "1")
+    response = api.post("/_render", json=["x" * 2048])
+    assert response.status_code == 413
+    # Without a Content-Length the body is counted as it arrives
+    response = api.post("/_render", content=iter([b'["', b"x" * 2048, b'"]']))
+    assert response.status_code == 413
+
+
+def test_too_many_documents(api, monkeypatch):
+    monkeypatch.setenv("BLOGGY_RENDER_API_MAX_DOCUMENTS", "2")
+    assert api.post("/_render", json=DOCUMENTS[:2]).status_code == 200
+    response = api.post("/_render", json=DOCUMENTS)
+    assert response.status_code == 413
+    assert response.json() == {"error": "more than 2 documents"}
+
+
+def bloggy_render(*args, stdin=""):
+    env = {**os.environ, "PYTHONPATH": str(REPO)}
+    return subprocess.run([sys.executable, "-c", "from bloggy.main import cli; cli()", "render", *args],
+                          input=stdin, capture_output=True, text=True, env=env, cwd=REPO, timeout=120)
+
+
+def test_cli_renders_files_as_ndjson(blog):
+    (blog / "guides").mkdir()
+    (blog / "guides" / "intro.md").write_text(DOCUMENTS[0]["markdown"], encoding="utf-8")
+    (blog / "other.md").write_text(DOCUMENTS[1], encoding="utf-8")
+    files = [str(blog / "guides" / "intro.md"), str(blog / "other.md")]
+    single, parallel = bloggy_render("--root", str(blog), "-j1", *files), bloggy_render("--root", str(blog), "-j2", *files)
+    assert single.returncode == parallel.returncode == 0
+    # Logging goes to stderr, so stdout holds the results alone
+    assert single.stdout == parallel.stdout
+    results = [json.loads(line) for line in single.stdout.splitlines()]
+    assert [result["id"] for result in results] == files
+    assert [results[0]["html"], results[0]["toc"]] == list(expected(DOCUMENTS[0]["markdown"], "guides/intro"))
+
+
+def test_cli_reads_stdin_and_reports_failures(blog):
+    result = bloggy_render("--root", str(blog), "--format", "json", stdin=json.dumps(DOCUMENTS))
+    assert result.returncode == 1
+    assert [item.get("error") for item in json.loads(result.stdout)] == [None, None, '"markdown" must be a string']
+    result = bloggy_render("--root", str(blog), stdin="")
+    assert result.returncode == 1
+    assert result.stdout == ""
+    assert "Error:" in result.stderr
@@ -0,0 +1,97 @@
+"""The in-memory render cache and its on-disk tier."""
+
+import os
+
+from bloggy import core
+from bloggy.render_cache import RENDERER_VERSION, DiskRenderCache, RenderCache, _entry_size, render_cache_key
+
+from test_progressive import large_post
+
+
+def test_memory_cache_evicts_least_recently_used_by_bytes():
+    value = "x" * 1000
+    cache = RenderCache(3 * _entry_size(value))
+    for key in "abc":
+        cache.set(key, value)
+    assert cache.get("a") == value  # Now the most recently used
+    cache.set("d", value)
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == [value] * 3
+    assert cache.total_bytes <= cache.max_bytes
+    assert cache.stats()["hits"] == 4 and cache.stats()["misses"] == 1
+    # An entry over the whole budget isn't kept, and evicts nothing
+    cache.set("huge", value * 4)
+    assert cache.get("huge") is None and len(cache) == 3
+
+
+def test_disk_round_trip_returns_lists(tmp_path):
+    key = render_cache_key("# Hi", "post", "", "")
+    DiskRenderCache(tmp_path).set(key, ("<h1>Hi</h1>", ((1, "Hi", "hi"),)))
+    # Another worker opening the same directory reads the entry back, as JSON
+    assert DiskRenderCache(tmp_path).get(key) == ["<h1>Hi</h1>", [[1, "Hi", "hi"]]]
+    assert (tmp_path / RENDERER_VERSION).is_dir()
+
+
+def test_memory_cache_falls_back_to_disk(tmp_path):
+    RenderCache(1 << 20, disk=DiskRenderCache(tmp_path)).set("key", ["html", []])
+    cache = RenderCache(1 << 20, disk=DiskRenderCache(tmp_path))
+    assert cache.get("key") == ["html", []]
+    assert cache.get("key") == ["html", []]
+    assert (cache.stats()["disk_hits"], cache.stats()["hits"]) == (1, 1)
+    cache.set("memory only", "html", persist=False)
+    assert DiskRenderCache(tmp_path).get("memory only") is None
+
+
+def _use_disk_cache(monkeypatch, cache_dir):
+    monkeypatch.setenv("BLOGGY_RENDER_CACHE_DIR", str(cache_dir))
+    monkeypatch.setattr(core, "_render_cache", None)
+    monkeypatch.setattr(core, "_block_cache", None)
+
+
+def test_renders_read_back_from_disk_match(blog, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    content = large_post()
+    _use_disk_cache(monkeypatch, cache_dir)
+    html, toc = core.render_markdown(content, current_path="big")
+    sections, total = core.render_sections(content, 0, 3, current_path="big")
+    assert total > 3
+    # A new process has an empty memory cache; its entries come from disk
+    _use_disk_cache(monkeypatch, cache_dir)
+    assert core.render_markdown(content, current_path="big") == (html, toc)
+    assert all(isinstance(heading, tuple) for heading in core.render_markdown(content, current_path="big")[1])
+    # Later sections continue from a section state read back from disk
+    rest, _ = core.render_sections(content, 3, total, current_path="big")
+    assert core.get_render_cache().stats()["disk_hits"]
+    assert sections + rest == html
+
+
+def test_disk_cache_prunes_least_recently_read(tmp_path):
+    cache = DiskRenderCache(tmp_path, max_bytes=0)
+    for i in range(10):
+        cache.set(f"key {i}", "x" * 1000)
+    files = {i: cache._path(f"key {i}") for i in range(10)}
+    size = files[0].stat().st_size
+    for i, path in files.items():
+        os.utime(path, (1_000_000 + i, 1_000_000))
+    os.utime(files[0], (2_000_000, 1_000_000))  # Read most recently, so it stays
+    cache = DiskRenderCache(tmp_path, max_bytes=8 * size)
+    remaining = [i for i, path in files.items() if path.exists()]
+    assert sum(files[i].stat().st_size for i in remaining) <= 8 * size * 3 // 4
+    assert remaining == [0, 5, 6, 7, 8, 9]
+    assert cache.total_bytes == 6 * size
+    # Writes past the limit prune again
+    for i in range(10, 13):
+        cache.set(f"key {i}", "x" * 1000)
+    assert cache.total_bytes <= 8 * size * 3 // 4 + size
+
+
+def test_stale_version_directories_are_removed(tmp_path):
+    stale = tmp_path / "0.1.0+r1"
+    (stale / "ab").mkdir(parents=True)
+    (stale / "ab" / "entry.json").write_text("[]")
+    unrelated = tmp_path / "notes"
+    unrelated.mkdir()
+    DiskRenderCache(tmp_path).set("key", "html")
+    assert not stale.exists()
+    assert unrelated.exists()
+    assert DiskRenderCache(tmp_path).get("key") == "html"
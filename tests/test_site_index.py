@@ -0,0 +1,106 @@
+"""The in-memory index of the blog's posts, folders and folder configs."""
+
+import os
+import time
+
+import pytest
+
+from bloggy import site_index
+from bloggy.site_index import SiteIndex
+
+
+def write(path, text, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def site(tmp_path):
+    write(tmp_path / "index.md", "# Home\n", 1_000)
+    write(tmp_path / "a.md", "---\ntitle: Alpha\n---\nA\n", 1_000)
+    write(tmp_path / "guides" / "Setup.MD", "Setup\n", 1_000)
+    write(tmp_path / "guides" / "manual.pdf", "%PDF-1.4\n", 1_000)
+    write(tmp_path / "guides" / ".bloggy", 'order = ["manual.pdf"]\n', 1_000)
+    write(tmp_path / ".hidden" / "secret.md", "Hidden\n", 1_000)
+    return tmp_path
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Counts of frontmatter and .bloggy reads by the index"""
+    calls = {"frontmatter": 0, "config": 0}
+    def parse_frontmatter(path):
+        calls["frontmatter"] += 1
+        return parse(path)
+    def cached_bloggy_config(path, mtime):
+        calls["config"] += 1
+        return config(path, mtime)
+    parse, config = site_index.parse_frontmatter, site_index._cached_bloggy_config
+    monkeypatch.setattr(site_index, "parse_frontmatter", parse_frontmatter)
+    monkeypatch.setattr(site_index, "_cached_bloggy_config", cached_bloggy_config)
+    return calls
+
+
+def test_snapshot_contents(site):
+    snapshot = SiteIndex(site).snapshot()
+    root = site.resolve()
+    assert snapshot.posts() == sorted([root / "index.md", root / "a.md", root / "guides" / "Setup.MD", root / "guides" / "manual.pdf"])
+    assert snapshot.index_file == root / "index.md"
+    assert snapshot.is_dir(root / "guides") and not snapshot.is_dir(root / ".hidden")
+    assert snapshot.title(root / "a.md") == "Alpha"
+    assert snapshot.title(root / "guides" / "Setup.MD") == "Setup"
+    assert snapshot.config(root / "guides")["order"] == ["manual.pdf"]
+
+
+def test_refresh_bumps_version(site):
+    index = SiteIndex(site)
+    first = index.refresh()
+    assert first.version == 1
+    assert index.refresh().version == 2
+    # Without a watcher every snapshot is a fresh walk
+    assert index.snapshot().version == 3
+    assert index.refresh(only_if_missing=True).version == 3
+
+
+def test_refresh_reuses_unchanged_titles_and_configs(site, counted):
+    index = SiteIndex(site)
+    first = index.refresh()
+    assert counted == {"frontmatter": 3, "config": 1}
+    second = index.refresh()
+    assert counted == {"frontmatter": 3, "config": 1}
+    assert second.titles == first.titles
+    assert second.configs[site.resolve() / "guides"] is first.configs[site.resolve() / "guides"]
+    assert second.fingerprint == first.fingerprint
+    # Only the edited post and config are read again
+    write(site / "a.md", "---\ntitle: Renamed\n---\nA\n", 2_000)
+    write(site / "guides" / ".bloggy", 'order = ["Setup.MD"]\n', 2_000)
+    third = index.refresh()
+    assert counted == {"frontmatter": 4, "config": 2}
+    assert third.title(site.resolve() / "a.md") == "Renamed"
+    assert third.config(site.resolve() / "guides")["order"] == ["Setup.MD"]
+    assert third.fingerprint != second.fingerprint
+
+
+def test_symlinked_folder_cycle_is_walked_once(site):
+    os.symlink(site / "guides", site / "guides" / "loop")
+    snapshot = SiteIndex(site).snapshot()
+    root = site.resolve()
+    assert snapshot.children[root / "guides" / "loop"] == ()
+    assert len(snapshot.posts()) == 4
+
+
+def test_watcher_publishes_changes(site):
+    index = SiteIndex(site)
+    index.watch()
+    try:
+        version = index.snapshot().version
+        write(site / "new.md", "# New\n")
+        deadline = time.monotonic() + 10
+        while site.resolve() / "new.md" not in index.snapshot().mtimes:
+            assert time.monotonic() < deadline, "the watcher never saw the new post"
+            time.sleep(0.05)
+        assert index.snapshot().version > version
+    finally:
+        index.close()
@@ -0,0 +1,98 @@
+"""Streamed responses: blocking renders handed to the event loop a chunk at a time."""
+
+import asyncio
+import threading
+from contextlib import aclosing
+
+from bloggy import core
+from bloggy.core import _iter_in_thread
+
+from test_progressive import large_post
+
+
+class Producer:
+    """A chunk generator that records how far it got and whether it was closed"""
+
+    def __init__(self, total=1000):
+        self.total, self.produced = total, 0
+        self.closed, self.finished = threading.Event(), False
+
+    def __iter__(self):
+        try:
+            for i in range(self.total):
+                self.produced += 1
+                yield f"chunk {i}\n"
+            self.finished = True
+        finally:
+            self.closed.set()
+
+
+def test_chunks_arrive_in_order():
+    async def consume():
+        async with aclosing(_iter_in_thread(iter(Producer(50)))) as stream:
+            return [chunk async for chunk in stream]
+    assert asyncio.run(consume()) == [f"chunk {i}\n" for i in range(50)]
+
+
+def test_producer_stops_when_the_stream_is_closed_early():
+    producer = Producer()
+    async def consume():
+        async with aclosing(_iter_in_thread(iter(producer), max_pending=2)) as stream:
+            async for chunk in stream:
+                if chunk == "chunk 3\n":
+                    break
+        # The worker thread notices within its polling interval
+        await asyncio.get_running_loop().run_in_executor(None, producer.closed.wait, 5)
+    asyncio.run(consume())
+    assert producer.closed.is_set()
+    assert not producer.finished
+    # Four chunks were sent; the producer ran at most a queue's worth ahead
+    assert producer.produced <= 4 + 2 + 1
+
+
+def test_slow_consumer_holds_the_producer_back():
+    producer = Producer()
+    async def consume():
+        async with aclosing(_iter_in_thread(iter(producer), max_pending=3)) as stream:
+            await stream.__anext__()
+            await asyncio.sleep(0.2)
+            return producer.produced
+    assert asyncio.run(consume()) <= 1 + 3 + 1
+
+
+def asgi_get(app, path):
+    """The ASGI messages `app` sends for a GET of `path`, one per streamed piece"""
+    messages = []
+    async def run():
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+                 "root_path": "", "headers": [(b"host", b"testserver")], "server": ("testserver", 80),
+                 "client": ("testclient", 50000)}
+        requested = False
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.Event().wait()  # The client never disconnects
+        async def send(message):
+            messages.append(message)
+        await app(scope, receive, send)
+    asyncio.run(run())
+    return messages
+
+
+def test_streamed_page_matches_full_render(blog, monkeypatch, client):
+    (blog / "big.md").write_text(large_post(), encoding="utf-8")
+    monkeypatch.setenv("BLOGGY_STREAM_MIN_KB", "1")
+    pieces = [m["body"].decode() for m in asgi_get(core.app, "/posts/big") if m["type"] == "http.response.body" and m.get("body")]
+    # Rendered afresh, not from what the stream cached
+    monkeypatch.setenv("BLOGGY_STREAM_MIN_KB", "0")
+    monkeypatch.setattr(core, "_render_cache", None)
+    monkeypatch.setattr(core, "_block_cache", None)
+    full = client.get("/posts/big").text
+    # The page shell, then the body in several chunks, then the rest of the page
+    assert len(pieces) > 3
+    assert "".join(pieces) == full
+    assert 'href="/static/sidenote.css"' in pieces[0]
+    assert 'id="big-post"' not in pieces[0] and 'id="big-post"' in pieces[1]
@@ -0,0 +1,87 @@
+"""Note embeds: the graph behind their cache stamps, and how deep they render."""
+
+import os
+
+from bloggy.core import _render_md_html
+from bloggy.transclusion import MAX_EMBED_DEPTH, EmbedGraph
+
+
+def write(root, path, text, mtime_ns=None):
+    file = root / f"{path}.md"
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(text, encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(file, ns=(mtime_ns, mtime_ns))
+
+
+def touch(root, path, mtime_ns):
+    os.utime(root / f"{path}.md", ns=(mtime_ns, mtime_ns))
+
+
+def test_stamp_follows_embedded_notes(tmp_path):
+    write(tmp_path, "post", "![[a]]\n")
+    write(tmp_path, "a", "# A\n\n![[notes/b]]\n", 1_000)
+    write(tmp_path, "notes/b", "# B\n", 1_000)
+    write(tmp_path, "other", "# Other\n", 1_000)
+    graph = EmbedGraph(tmp_path)
+    content = (tmp_path / "post.md").read_text()
+    assert graph.stamp("No embeds here.\n", "post") == ""
+    stamp = graph.stamp(content, "post")
+    assert stamp and graph.stamp(content, "post") == stamp
+    touch(tmp_path, "other", 2_000)
+    assert graph.stamp(content, "post") == stamp
+    # A note embedded through another one counts as well
+    touch(tmp_path, "notes/b", 2_000)
+    nested = graph.stamp(content, "post")
+    assert nested != stamp
+    # Adding an embed to a note is picked up on its next mtime
+    write(tmp_path, "c", "# C\n", 1_000)
+    write(tmp_path, "a", "# A\n\n![[notes/b]]\n\n![[c]]\n", 3_000)
+    assert graph.embeds("a") == ("notes/b", "c")
+    assert graph.stamp(content, "post") != nested
+
+
+def test_missing_note_is_stamped_until_it_exists(tmp_path):
+    graph = EmbedGraph(tmp_path)
+    content = "![[later]]\n"
+    missing = graph.stamp(content, "post")
+    assert missing and graph.dependencies(content, "post") == [("?later", 0)]
+    write(tmp_path, "later", "# Later\n")
+    assert graph.stamp(content, "post") != missing
+
+
+def test_depth_is_bounded(tmp_path):
+    chain = [f"n{i}" for i in range(MAX_EMBED_DEPTH + 4)]
+    for note, target in zip(chain, chain[1:] + [None]):
+        write(tmp_path, note, f"# {note}\n\n![[{target}]]\n" if target else f"# {note}\n", 1_000)
+    graph = EmbedGraph(tmp_path)
+    content = (tmp_path / "n0.md").read_text()
+    # Notes one past the limit are only linked, but a stamp still covers them
+    reached = [path for path, _ in graph.dependencies(content, "n0")]
+    assert reached == chain[1:MAX_EMBED_DEPTH + 2]
+    stamp = graph.stamp(content, "n0")
+    touch(tmp_path, chain[MAX_EMBED_DEPTH + 2], 2_000)
+    assert graph.stamp(content, "n0") == stamp
+
+
+def test_cycles_end(tmp_path):
+    write(tmp_path, "a", "# A\n\n![[b]]\n")
+    write(tmp_path, "b", "# B\n\n![[a]]\n\n![[b]]\n")
+    graph = EmbedGraph(tmp_path)
+    assert [path for path, _ in graph.dependencies("![[b]]\n", "a")] == ["b"]
+    assert [path for path, _ in graph.dependencies("![[a]]\n", None)] == ["a", "b"]
+
+
+def test_rendered_depth_and_cycles_are_bounded(blog):
+    chain = [f"n{i}" for i in range(MAX_EMBED_DEPTH + 4)]
+    for note, target in zip(chain, chain[1:] + [None]):
+        write(blog, note, f"# {note}\n\n![[{target}]]\n" if target else f"# {note}\n")
+    html, _ = _render_md_html((blog / "n0.md").read_text(), None, "n0")
+    # Embeds nest MAX_EMBED_DEPTH deep; the next note is linked instead
+    assert html.count('class="embed my-6') == MAX_EMBED_DEPTH
+    assert html.count('embed-skipped') == 1
+    write(blog, "a", "# A\n\n![[b]]\n")
+    write(blog, "b", "# B\n\n![[a]]\n")
+    html, _ = _render_md_html("![[b]]\n", None, "a")
+    assert html.count('class="embed my-6') == 1
+    assert 'embed-skipped' in html and 'href="/posts/a"' in html